@@ -4,7 +4,7 @@ def clean_up_image_folder():
     """
     Clean up the image folders except .gitkeep file
     """
-    for folder in ['uploads', 'compressed', 'watermarked', 'modified']:
+    for folder in ['uploads', 'compressed', 'watermarked', 'modified', 'result_cache', 'renditions', 'tiles', 'upload_sessions', 'blobs', 'metadata', 'previews', 'logos']:
         for filename in os.listdir(folder):
             if filename != '.gitkeep':
                 os.remove(os.path.join(folder, filename))
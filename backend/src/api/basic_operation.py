@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from services.basic_operation_service import basic_operation
+from services.job_service import submit_job
+from utils.cancellation import ABORT_STATUS_CODES, INVALID_TIMEOUT_MESSAGE, is_valid_timeout
+from utils.encoder_settings import INTERACTIVE_ENCODER_TIER
 
 basic_operation_bp = Blueprint('basic_operation', __name__)
 
@@ -12,12 +15,30 @@ def apply_basic_operation():
     data = request.get_json()
     image_id = data.get('image_id')
     operations = data.get('operations')
+    encoder_tier = data.get('encoder_tier', INTERACTIVE_ENCODER_TIER)
+    timeout_ms = data.get('timeout_ms')
+    dry_run = bool(data.get('dry_run'))
+
+    if not is_valid_timeout(timeout_ms):
+        return jsonify({
+            'success': False,
+            'message': INVALID_TIMEOUT_MESSAGE
+        }), 400
 
     if not all([image_id, operations]):
         return jsonify({'success': False, 'message': 'Missing required parameters'}), 400
 
-    result = basic_operation(image_id, operations)
+    # Queue the operations for a background worker when requested
+    if data.get('async') and not dry_run:
+        result = submit_job(image_id, 'basic_operation', {
+            'operations': operations,
+            'encoder_tier': encoder_tier,
+            'timeout_ms': timeout_ms
+        })
+        return jsonify(result), 202 if result['success'] else 500
+
+    result = basic_operation(image_id, operations, encoder_tier, timeout_ms, dry_run)
     if not result['success']:
-        return jsonify(result), 400
+        return jsonify(result), ABORT_STATUS_CODES.get(result.get('error'), 400)
 
     return jsonify(result)
@@ -0,0 +1,31 @@
+from flask import Blueprint, jsonify
+
+from utils.blob_store import blob_store_stats
+from utils.image_cache import decoded_image_cache_stats
+from utils.result_cache import get_result_cache
+from utils.single_flight import single_flight_stats
+from utils.speculative import get_speculative_pool
+from utils.step_cache import get_step_cache
+from utils.watermark_image import logo_overlay_cache_stats, pattern_layer_cache_stats, text_sprite_cache_stats
+
+cache_bp = Blueprint('cache', __name__)
+
+
+@cache_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Report the statistics of the caches, request coalescing, speculative precompute and upload storage
+    :return: JSON with entry counts, sizes, hit rates and bytes saved
+    """
+    return jsonify({
+        'success': True,
+        'result_cache': get_result_cache().stats(),
+        'decoded_image_cache': decoded_image_cache_stats(),
+        'step_cache': get_step_cache().stats(),
+        'single_flight': single_flight_stats(),
+        'speculative': get_speculative_pool().stats(),
+        'watermark_sprites': text_sprite_cache_stats(),
+        'watermark_logos': logo_overlay_cache_stats(),
+        'watermark_patterns': pattern_layer_cache_stats(),
+        'blob_store': blob_store_stats()
+    })
@@ -1,6 +1,11 @@
-from flask import Blueprint, request, jsonify
+import json
 
-from services.compress_service import compress_image
+from flask import Blueprint, Response, request, jsonify
+
+from services.compress_service import compress_image, compress_images
+from services.job_service import submit_job
+from utils.cancellation import ABORT_STATUS_CODES, INVALID_TIMEOUT_MESSAGE, is_valid_timeout
+from utils.encoder_settings import FINAL_ENCODER_TIER
 
 compress_bp = Blueprint('compress', __name__)
 
@@ -14,6 +19,8 @@ def compress():
     image_id = data.get('image_id')
     compression_format = data.get('compression_format')
     compression_quality = data.get('compression_quality')
+    encoder_tier = data.get('encoder_tier', FINAL_ENCODER_TIER)
+    timeout_ms = data.get('timeout_ms')
 
     # Validate input
     if not all([image_id, compression_format, compression_quality]):
@@ -22,7 +29,85 @@ def compress():
             'message': 'Missing required parameters'
         }), 400
 
+    if not is_valid_timeout(timeout_ms):
+        return jsonify({
+            'success': False,
+            'message': INVALID_TIMEOUT_MESSAGE
+        }), 400
+
+    # Queue the compression for a background worker when requested
+    if data.get('async'):
+        result = submit_job(image_id, 'compress', {
+            'compression_format': compression_format,
+            'compression_quality': compression_quality,
+            'encoder_tier': encoder_tier,
+            'timeout_ms': timeout_ms
+        })
+        return jsonify(result), 202 if result['success'] else 500
+
     # Compress image
-    result = compress_image(image_id, compression_format, compression_quality)
-    
+    result = compress_image(image_id, compression_format, compression_quality, encoder_tier, timeout_ms)
+
+    # Report timeouts and cancellations with their own status codes
+    if result.get('error') in ABORT_STATUS_CODES:
+        return jsonify(result), ABORT_STATUS_CODES[result['error']]
+
     return jsonify(result)
+
+
+@compress_bp.route('/compress/batch', methods=['POST'])
+def compress_batch():
+    """
+    Compress several images in parallel
+    :return: NDJSON stream with one compression result per line, in completion order
+    """
+    data = request.get_json()
+    compression_format = data.get('compression_format')
+    compression_quality = data.get('compression_quality')
+    encoder_tier = data.get('encoder_tier', FINAL_ENCODER_TIER)
+    timeout_ms = data.get('timeout_ms')
+
+    if not is_valid_timeout(timeout_ms):
+        return jsonify({
+            'success': False,
+            'message': INVALID_TIMEOUT_MESSAGE
+        }), 400
+
+    # Items may override the shared format and quality
+    items = data.get('items') or [{'image_id': image_id} for image_id in data.get('image_ids', [])]
+    if not isinstance(items, list) or not all(
+        isinstance(item, dict) and isinstance(item.get('image_id'), str) for item in items
+    ):
+        return jsonify({
+            'success': False,
+            'message': 'Batch items must be objects with an image ID'
+        }), 400
+    items = [
+        {
+            'image_id': item.get('image_id'),
+            'compression_format': item.get('compression_format', compression_format),
+            'compression_quality': item.get('compression_quality', compression_quality)
+        }
+        for item in items
+    ]
+
+    # Validate input
+    if not items:
+        return jsonify({
+            'success': False,
+            'message': 'No images to compress'
+        }), 400
+
+    # A newer compression of an image cancels the running one, so an image can appear only once
+    image_ids = [item['image_id'] for item in items]
+    if len(set(image_ids)) != len(image_ids):
+        return jsonify({
+            'success': False,
+            'message': 'Duplicate image IDs in batch'
+        }), 400
+
+    def generate_results():
+        for result in compress_images(items, encoder_tier, timeout_ms):
+            yield json.dumps(result) + '\n'
+
+    return Response(generate_results(), mimetype='application/x-ndjson')
@@ -11,12 +11,20 @@ def get_base64_image(image_id):
     :return: JSON with base64 encoded image or error message
     """
     image_type = request.args.get('type', 'original')
-    result = get_image_base64(image_id, image_type)
-    
+    size = request.args.get('size', 'full')
+    if size not in ('full', 'preview'):
+        return jsonify({
+            'success': False,
+            'message': 'Invalid image size'
+        }), 400
+
+    result = get_image_base64(image_id, image_type, size)
+
     if not result['success']:
         return jsonify(result), 404
 
     return jsonify({
         'success': True,
-        'image_base64': result['image_base64']
+        'image_base64': result['image_base64'],
+        'mimetype': result['mimetype']
     })
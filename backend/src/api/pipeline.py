@@ -0,0 +1,40 @@
+from flask import Blueprint, request, jsonify
+
+from services.pipeline_service import run_pipeline
+from utils.cancellation import ABORT_STATUS_CODES, INVALID_TIMEOUT_MESSAGE, is_valid_timeout
+
+pipeline_bp = Blueprint('pipeline', __name__)
+
+@pipeline_bp.route('/pipeline', methods=['POST'])
+def pipeline():
+    """
+    Run several operations on an image in one decode/encode pass
+    :return: JSON response with the output image and per-stage timings
+    """
+    data = request.get_json()
+    image_id = data.get('image_id')
+    steps = data.get('steps')
+    encoder_tier = data.get('encoder_tier')
+    timeout_ms = data.get('timeout_ms')
+
+    # Validate input
+    if not all([image_id, steps]):
+        return jsonify({
+            'success': False,
+            'message': 'Missing required parameters'
+        }), 400
+
+    if not is_valid_timeout(timeout_ms):
+        return jsonify({
+            'success': False,
+            'message': INVALID_TIMEOUT_MESSAGE
+        }), 400
+
+    # Run the pipeline
+    result = run_pipeline(image_id, steps, encoder_tier, timeout_ms)
+
+    # Report timeouts and cancellations with their own status codes
+    if result.get('error') in ABORT_STATUS_CODES:
+        return jsonify(result), ABORT_STATUS_CODES[result['error']]
+
+    return jsonify(result)
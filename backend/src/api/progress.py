@@ -0,0 +1,76 @@
+import json
+import time
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from services.job_service import has_pending_jobs
+from services.status_service import get_image_status
+from utils.cancellation import is_operation_registered
+from utils.progress import get_progress, wait_for_progress
+
+progress_bp = Blueprint('progress', __name__)
+
+# Seconds between keep-alive comments while no progress is reported
+KEEP_ALIVE_INTERVAL = 15
+
+# Seconds without any progress after which the stream is closed
+IDLE_TIMEOUT = 300
+
+
+@progress_bp.route('/progress/<image_id>', methods=['GET'])
+def progress(image_id):
+    """
+    Stream the processing progress of an image as Server-Sent Events
+    :param image_id: Unique identifier for the image
+    :return: text/event-stream response, closed once an operation is done or failed
+    """
+    # Progress is kept per operation; without one the stream follows every operation on the image
+    operation = request.args.get('operation')
+    current = get_progress(image_id, operation)
+    pending = has_pending_jobs(image_id, operation) or is_operation_registered(image_id, operation)
+
+    # Nothing will ever be reported for an unknown image
+    if current is None and not pending and not get_image_status(image_id)['success']:
+        return jsonify({
+            'success': False,
+            'message': 'Image not found'
+        }), 404
+
+    # An uploaded image without progress waits for its first operation, so a client can
+    # subscribe before starting it; a finished operation with nothing pending is reported once
+    finished = current is not None and current['status'] != 'running' and not pending
+
+    def generate_events():
+        if finished:
+            yield f'data: {json.dumps(current)}\n\n'
+            return
+
+        last_version = current['version'] if current else 0
+        # Something is sent at once so the client knows the subscription is open
+        if current and current['status'] == 'running':
+            yield f'data: {json.dumps(current)}\n\n'
+        else:
+            yield ': keep-alive\n\n'
+        last_change = time.monotonic()
+
+        while time.monotonic() - last_change < IDLE_TIMEOUT:
+            state = wait_for_progress(image_id, last_version, KEEP_ALIVE_INTERVAL, operation)
+            if state is None:
+                yield ': keep-alive\n\n'
+                continue
+
+            last_version = state['version']
+            last_change = time.monotonic()
+            yield f'data: {json.dumps(state)}\n\n'
+
+            if state['status'] in ('done', 'failed'):
+                break
+
+    return Response(
+        stream_with_context(generate_events()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
@@ -0,0 +1,41 @@
+from flask import Blueprint, request, jsonify
+
+from services.rendition_service import DEFAULT_RENDITION_QUALITY, create_renditions
+from utils.cancellation import ABORT_STATUS_CODES, INVALID_TIMEOUT_MESSAGE, is_valid_timeout
+from utils.encoder_settings import FINAL_ENCODER_TIER
+
+rendition_bp = Blueprint('rendition', __name__)
+
+@rendition_bp.route('/renditions', methods=['POST'])
+def renditions():
+    """
+    Build responsive renditions of an image in several widths
+    :return: JSON response with the rendition manifest
+    """
+    data = request.get_json()
+    image_id = data.get('image_id')
+
+    if not image_id:
+        return jsonify({
+            'success': False,
+            'message': 'Image ID is required'
+        }), 400
+
+    if not is_valid_timeout(data.get('timeout_ms')):
+        return jsonify({
+            'success': False,
+            'message': INVALID_TIMEOUT_MESSAGE
+        }), 400
+
+    result = create_renditions(
+        image_id,
+        data.get('widths'),
+        data.get('format', 'webp'),
+        data.get('quality', DEFAULT_RENDITION_QUALITY),
+        data.get('encoder_tier', FINAL_ENCODER_TIER),
+        data.get('timeout_ms')
+    )
+    if not result['success']:
+        return jsonify(result), ABORT_STATUS_CODES.get(result.get('error'), 400)
+
+    return jsonify(result)
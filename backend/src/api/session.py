@@ -0,0 +1,88 @@
+from flask import Blueprint, request, jsonify
+
+from services.session_service import (
+    SESSION_NOT_FOUND_MESSAGE,
+    close_session,
+    commit_session,
+    create_session,
+    render_preview
+)
+from utils.cancellation import ABORT_STATUS_CODES, INVALID_TIMEOUT_MESSAGE, is_valid_timeout
+
+session_bp = Blueprint('session', __name__)
+
+@session_bp.route('/session', methods=['POST'])
+def create():
+    """
+    Open an editing session rendering previews on a downscaled proxy
+    :return: JSON response with the session details
+    """
+    data = request.get_json()
+    image_id = data.get('image_id')
+
+    if not image_id:
+        return jsonify({
+            'success': False,
+            'message': 'Image ID is required'
+        }), 400
+
+    result = create_session(image_id, data.get('viewport_width'), data.get('viewport_height'))
+    if not result['success']:
+        return jsonify(result), 404 if result['message'] == 'Image not found' else 400
+
+    return jsonify(result)
+
+
+@session_bp.route('/session/<session_id>/preview', methods=['POST'])
+def preview(session_id):
+    """
+    Render a preview of pipeline steps on the session proxy
+    :param session_id: Session ID
+    :return: JSON response with the base64 encoded preview
+    """
+    data = request.get_json()
+
+    result = render_preview(session_id, data.get('steps'))
+    if not result['success']:
+        return jsonify(result), 404 if result['message'] == SESSION_NOT_FOUND_MESSAGE else 400
+
+    return jsonify(result)
+
+
+@session_bp.route('/session/<session_id>/commit', methods=['POST'])
+def commit(session_id):
+    """
+    Render pipeline steps at full resolution
+    :param session_id: Session ID
+    :return: JSON response with the output image and per-stage timings
+    """
+    data = request.get_json()
+    timeout_ms = data.get('timeout_ms')
+
+    if not is_valid_timeout(timeout_ms):
+        return jsonify({
+            'success': False,
+            'message': INVALID_TIMEOUT_MESSAGE
+        }), 400
+
+    result = commit_session(session_id, data.get('steps'), data.get('encoder_tier'), timeout_ms)
+    if not result['success']:
+        if result['message'] == SESSION_NOT_FOUND_MESSAGE:
+            return jsonify(result), 404
+        return jsonify(result), ABORT_STATUS_CODES.get(result.get('error'), 400)
+
+    return jsonify(result)
+
+
+@session_bp.route('/session/<session_id>', methods=['DELETE'])
+def close(session_id):
+    """
+    Close an editing session
+    :param session_id: Session ID
+    :return: JSON response with the close status
+    """
+    result = close_session(session_id)
+    if not result['success']:
+        return jsonify(result), 404
+
+    return jsonify(result)
@@ -0,0 +1,49 @@
+from flask import Blueprint, Response, request, jsonify
+
+from services.tile_service import build_tile_pyramid, get_tile
+
+tile_bp = Blueprint('tile', __name__)
+
+# Tiles of an image ID never change, so clients may keep them for as long as they like
+TILE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+@tile_bp.route('/tiles', methods=['POST'])
+def build_tiles():
+    """
+    Build the tile pyramid of an image
+    :return: JSON response with the pyramid size, tile size, format and level count
+    """
+    data = request.get_json()
+    image_id = data.get('image_id')
+
+    if not image_id:
+        return jsonify({
+            'success': False,
+            'message': 'Image ID is required'
+        }), 400
+
+    result = build_tile_pyramid(image_id)
+    if not result['success']:
+        return jsonify(result), 404 if result['message'] == 'Image not found' else 500
+
+    return jsonify(result)
+
+
+@tile_bp.route('/tiles/<image_id>/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def tile(image_id, z, x, y):
+    """
+    Serve one tile of the pyramid of an image
+    :param image_id: Unique identifier for the image
+    :param z: Pyramid level, 0 being the smallest
+    :param x: Tile column
+    :param y: Tile row
+    :return: Tile image or error message
+    """
+    result = get_tile(image_id, z, x, y)
+    if not result['success']:
+        return jsonify(result), 404
+
+    response = Response(result['data'], mimetype=result['mimetype'])
+    response.headers['Cache-Control'] = TILE_CACHE_CONTROL
+    response.set_etag(result['etag'])
+    return response.make_conditional(request)
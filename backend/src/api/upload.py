@@ -1,5 +1,13 @@
 from flask import Blueprint, request, jsonify
 
+from services.chunked_upload_service import (
+    UPLOAD_NOT_FOUND_MESSAGE,
+    abort_chunked_upload,
+    create_chunked_upload,
+    finalize_chunked_upload,
+    get_chunked_upload,
+    write_upload_chunk
+)
 from services.upload_service import upload_image
 
 upload_bp = Blueprint('upload', __name__)
@@ -18,7 +26,84 @@ def upload():
         }), 400
     
     # Use upload service to process the image
-    result = upload_image(request.files['file'])
+    precompute = request.form.get('precompute')
+    if precompute is not None:
+        precompute = precompute.lower() in ('1', 'true')
+    result = upload_image(request.files['file'], precompute)
     
     return jsonify(result)
 
+
+
+@upload_bp.route('/upload/chunked', methods=['POST'])
+def create_upload():
+    """
+    Start a chunked, resumable upload
+    :return: JSON response with the upload ID
+    """
+    data = request.get_json(silent=True) or {}
+    result = create_chunked_upload(data.get('filename'), data.get('size'))
+    return jsonify(result), 201 if result['success'] else 400
+
+
+@upload_bp.route('/upload/chunked/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """
+    Write the request body at the offset given by the 'offset' query parameter
+    :param upload_id: Unique identifier for the upload
+    :return: JSON response with the ranges received so far
+    """
+    offset = request.args.get('offset', type=int)
+    if offset is None or request.content_length is None:
+        return jsonify({
+            'success': False,
+            'message': 'Offset and Content-Length are required'
+        }), 400
+
+    # The body is streamed to disk, never buffered whole
+    result = write_upload_chunk(upload_id, offset, request.stream, request.content_length)
+    if not result['success']:
+        return jsonify(result), 404 if result['message'] == UPLOAD_NOT_FOUND_MESSAGE else 400
+
+    return jsonify(result)
+
+
+@upload_bp.route('/upload/chunked/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """
+    Report the ranges received so far, for resuming an interrupted upload
+    :param upload_id: Unique identifier for the upload
+    :return: JSON response with the size and received ranges
+    """
+    result = get_chunked_upload(upload_id)
+    return jsonify(result), 200 if result['success'] else 404
+
+
+@upload_bp.route('/upload/chunked/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """
+    Complete a chunked upload
+    :param upload_id: Unique identifier for the upload
+    :return: JSON response with upload details
+    """
+    data = request.get_json(silent=True) or {}
+    precompute = data.get('precompute')
+    if precompute is not None:
+        precompute = bool(precompute)
+
+    result = finalize_chunked_upload(upload_id, precompute)
+    if not result['success']:
+        return jsonify(result), 404 if result['message'] == UPLOAD_NOT_FOUND_MESSAGE else 409
+
+    return jsonify(result)
+
+
+@upload_bp.route('/upload/chunked/<upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    """
+    Cancel a chunked upload
+    :param upload_id: Unique identifier for the upload
+    :return: JSON response with deletion status
+    """
+    result = abort_chunked_upload(upload_id)
+    return jsonify(result), 200 if result['success'] else 404
@@ -1,6 +1,12 @@
-from flask import Blueprint, request, jsonify
+import json
 
-from services.watermark_service import add_watermark
+from flask import Blueprint, Response, request, jsonify
+
+from services.job_service import submit_job
+from services.logo_service import upload_logo
+from services.watermark_service import add_watermark, add_watermarks, build_watermark_config
+from utils.cancellation import ABORT_STATUS_CODES, INVALID_TIMEOUT_MESSAGE, is_valid_timeout
+from utils.encoder_settings import INTERACTIVE_ENCODER_TIER
 
 watermark_bp = Blueprint('watermark', __name__)
 
@@ -14,18 +20,17 @@ def watermark():
     image_id = data.get('image_id')
     watermark_text = data.get('watermark_text', 'Watermarked')
     position = data.get('position', 'bottom-right')
+    encoder_tier = data.get('encoder_tier', INTERACTIVE_ENCODER_TIER)
+    timeout_ms = data.get('timeout_ms')
     
     # Get additional watermark configuration
-    watermark_config = {
-        'fontSize': data.get('fontSize'),
-        'color': data.get('color'),
-        'rotation': data.get('rotation'),
-        'opacity': data.get('opacity'),
-        'position': data.get('customPosition')  # 使用 customPosition 來傳遞百分比位置
-    }
-    
-    # Remove None values from config
-    watermark_config = {k: v for k, v in watermark_config.items() if v is not None}
+    watermark_config = build_watermark_config(data)
+
+    if not is_valid_timeout(timeout_ms):
+        return jsonify({
+            'success': False,
+            'message': INVALID_TIMEOUT_MESSAGE
+        }), 400
 
     # Validate input
     if not image_id:
@@ -41,7 +46,96 @@ def watermark():
         'config': watermark_config
     })
 
+    # Queue the watermark for a background worker when requested
+    if data.get('async'):
+        result = submit_job(image_id, 'watermark', {
+            'watermark_text': watermark_text,
+            'position': position,
+            'config': watermark_config,
+            'encoder_tier': encoder_tier,
+            'timeout_ms': timeout_ms
+        })
+        return jsonify(result), 202 if result['success'] else 500
+
     # Add watermark
-    result = add_watermark(image_id, watermark_text, position, watermark_config)
-    
-    return jsonify(result)
\ No newline at end of file
+    result = add_watermark(image_id, watermark_text, position, watermark_config, encoder_tier, timeout_ms)
+
+    # Report timeouts and cancellations with their own status codes
+    if result.get('error') in ABORT_STATUS_CODES:
+        return jsonify(result), ABORT_STATUS_CODES[result['error']]
+
+    return jsonify(result)
+
+@watermark_bp.route('/watermark/batch', methods=['POST'])
+def watermark_batch():
+    """
+    Watermark several images with one configuration in parallel
+    :return: NDJSON stream with one watermark result per line, in completion order
+    """
+    data = request.get_json()
+    watermark_text = data.get('watermark_text', 'Watermarked')
+    position = data.get('position', 'bottom-right')
+    encoder_tier = data.get('encoder_tier', INTERACTIVE_ENCODER_TIER)
+    timeout_ms = data.get('timeout_ms')
+    watermark_config = build_watermark_config(data)
+
+    if not is_valid_timeout(timeout_ms):
+        return jsonify({
+            'success': False,
+            'message': INVALID_TIMEOUT_MESSAGE
+        }), 400
+
+    # Items may override the shared text and position
+    items = data.get('items') or [{'image_id': image_id} for image_id in data.get('image_ids', [])]
+    if not isinstance(items, list) or not all(
+        isinstance(item, dict) and isinstance(item.get('image_id'), str) for item in items
+    ):
+        return jsonify({
+            'success': False,
+            'message': 'Batch items must be objects with an image ID'
+        }), 400
+    items = [
+        {
+            'image_id': item.get('image_id'),
+            'watermark_text': item.get('watermark_text', watermark_text),
+            'position': item.get('position', position)
+        }
+        for item in items
+    ]
+
+    # Validate input
+    if not items:
+        return jsonify({
+            'success': False,
+            'message': 'No images to watermark'
+        }), 400
+
+    # A newer watermark of an image cancels the running one, so an image can appear only once
+    image_ids = [item['image_id'] for item in items]
+    if len(set(image_ids)) != len(image_ids):
+        return jsonify({
+            'success': False,
+            'message': 'Duplicate image IDs in batch'
+        }), 400
+
+    def generate_results():
+        for result in add_watermarks(items, watermark_config, encoder_tier, timeout_ms):
+            yield json.dumps(result) + '\n'
+
+    return Response(generate_results(), mimetype='application/x-ndjson')
+
+
+@watermark_bp.route('/watermark/logo', methods=['POST'])
+def watermark_logo():
+    """
+    Upload a logo for watermarks, referenced by logo_id in later watermark requests
+    :return: JSON response with the logo ID and dimensions
+    """
+    if 'file' not in request.files:
+        return jsonify({
+            'success': False,
+            'message': 'No file uploaded'
+        }), 400
+
+    result = upload_logo(request.files['file'])
+    return jsonify(result), 200 if result['success'] else 400
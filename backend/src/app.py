@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, g, request
 from flask_cors import CORS
 import threading
 import time
@@ -11,7 +11,17 @@ from api.image import image_bp
 from api.download import download_bp
 from api.delete import delete_bp
 from api.basic_operation import basic_operation_bp
+from api.progress import progress_bp
+from api.cache import cache_bp
+from api.pipeline import pipeline_bp
+from api.session import session_bp
+from api.rendition import rendition_bp
+from api.tile import tile_bp
+from services.job_service import get_job_queue, prune_jobs
 from utils.image_cleanup import cleanup_images
+from utils.job_queue import JOB_PRUNE_INTERVAL
+from utils.progress import expire_progress
+from utils.speculative import get_speculative_pool
 
 def create_app():
     api_app = Flask(__name__)
@@ -26,21 +36,56 @@ def create_app():
     api_app.register_blueprint(download_bp, url_prefix='/api')
     api_app.register_blueprint(delete_bp, url_prefix='/api')
     api_app.register_blueprint(basic_operation_bp, url_prefix='/api')
+    api_app.register_blueprint(progress_bp, url_prefix='/api')
+    api_app.register_blueprint(cache_bp, url_prefix='/api')
+    api_app.register_blueprint(pipeline_bp, url_prefix='/api')
+    api_app.register_blueprint(session_bp, url_prefix='/api')
+    api_app.register_blueprint(rendition_bp, url_prefix='/api')
+    api_app.register_blueprint(tile_bp, url_prefix='/api')
 
     
     def start_cleanup_task():
         def run_cleanup_task():
+            # Pruning jobs scans the database, so it runs far less often than the file cleanup
+            last_prune = None
             while True:
                 cleanup_images(180)
+                expire_progress(180)
+                if last_prune is None or time.monotonic() - last_prune >= JOB_PRUNE_INTERVAL:
+                    prune_jobs()
+                    last_prune = time.monotonic()
                 time.sleep(1)
 
         cleanup_thread = threading.Thread(target=run_cleanup_task, daemon=True)
         cleanup_thread.start()
     
+    background_tasks_started = threading.Event()
+    background_tasks_lock = threading.Lock()
+
+    @api_app.before_request
+    def start_background_tasks():
+        # Runs before every request but starts the tasks once; a hook must not unregister itself,
+        # as Flask would then skip the hook after it
+        if background_tasks_started.is_set():
+            return
+        with background_tasks_lock:
+            if not background_tasks_started.is_set():
+                start_cleanup_task()
+                # Start the job workers, requeuing jobs left running by a crashed process
+                get_job_queue()
+                background_tasks_started.set()
+
     @api_app.before_request
-    def before_request_func():
-        api_app.before_request_funcs[None].remove(before_request_func)
-        start_cleanup_task()
+    def begin_foreground_request():
+        # Speculative precompute yields to requests doing image work
+        if request.method == 'POST':
+            g.foreground_request = True
+            get_speculative_pool().begin_foreground()
+
+    @api_app.teardown_request
+    def end_foreground_request(error=None):
+        if g.pop('foreground_request', False):
+            get_speculative_pool().end_foreground()
     
     return api_app
 
@@ -1,21 +1,202 @@
 import os
-from datetime import datetime
+import time
+from typing import Callable
 
 from PIL import Image
 
-from utils.image_cleanup import load_image_timestamps, save_image_timestamps
+from services.preview_service import schedule_preview
+from utils.cancellation import (
+    CancellationToken,
+    OperationAbortedError,
+    abort_result,
+    register_operation,
+    release_operation
+)
+from utils.content_hash import file_content_hash
+from utils.encoder_settings import INTERACTIVE_ENCODER_TIER, is_valid_encoder_tier, save_image
+from utils.image_cache import open_image, open_image_for_size, peek_decoded_size, read_only_view
+from utils.image_cleanup import record_image_timestamp
+from utils.operation_planner import execute_plan, get_plan_output, plan_operations
+from utils.progress import finish_progress, start_progress, update_progress
+from utils.single_flight import coalesce
+from utils.step_cache import get_step_cache
 
-# This is for working with the PIL library older
-if not hasattr(Image, 'Transpose'):
-    Image.Transpose = Image
 
-def basic_operation(image_id: str, operations: dict) -> dict:
+def get_decode_size(operations: dict) -> tuple:
+    """
+    Get the size an image can be decoded at for a list of operations
+    :param operations: Dictionary of operations with their parameters, applied in order
+    :return: Target (width, height) when the operations start with a resize, None otherwise
+    """
+    if not operations:
+        return None
+
+    operation, params = next(iter(operations.items()))
+    if operation != 'resize' or not params.get('width') or not params.get('height'):
+        return None
+
+    return int(params['width']), int(params['height'])
+
+
+def open_image_for_operations(image_path: str, operations: dict) -> Image.Image:
+    """
+    Open an image, decoding it at a reduced resolution when the operations start with a downscale
+    :param image_path: Path of the image file
+    :param operations: Dictionary of operations with their parameters, applied in order
+    :return: Decoded image
+    """
+    decode_size = get_decode_size(operations)
+    if decode_size is None:
+        return open_image(image_path)
+    return open_image_for_size(image_path, decode_size)
+
+
+def apply_operations(
+    img: Image.Image,
+    operations: dict,
+    cancel_token: 'CancellationToken' = None,
+    progress_callback: Callable[[int, int], None] = None
+) -> Image.Image:
+    """
+    Apply basic image operations to an in-memory image
+    :param img: Input image
+    :param operations: Dictionary of operations with their parameters, applied in order
+    :param cancel_token: Optional token checked between operations
+    :param progress_callback: Optional function called with (plan steps done, total plan steps)
+    :return: Resulting image
+    """
+    # Fuse the operations into as few full-frame passes as possible
+    plan = plan_operations(operations, img.size, img.mode)
+    return execute_plan(img, plan, cancel_token, progress_callback)
+
+
+def _plan_segments(steps: list, done: int, size: tuple, mode: str) -> list:
+    # Plan the operations after the reused prefix as (end, plan) segments, each cached once it
+    # ran; the last operation, the one the next request most likely changes, gets a segment of its
+    # own unless the planner fuses it with the operations before
+    if done >= len(steps):
+        return []
+
+    plan = plan_operations(dict(steps[done:]), size, mode)
+    if len(steps) - done < 2:
+        return [(len(steps), plan)]
+
+    head = plan_operations(dict(steps[done:-1]), size, mode)
+    tail = plan_operations(dict(steps[-1:]), *get_plan_output(head, size, mode))
+    if head + tail != plan:
+        return [(len(steps), plan)]
+    return [(len(steps) - 1, head), (len(steps), tail)]
+
+
+def _chain_keys(image_path: str, operations: dict) -> tuple:
+    # Step cache key of the source pixels and the chain of operations
+    source_key = [file_content_hash(image_path), get_decode_size(operations)]
+    steps = [[operation, params] for operation, params in operations.items()]
+    return source_key, steps
+
+
+def plan_operations_incremental(image_path: str, operations: dict) -> tuple:
+    """
+    Plan basic image operations the way apply_operations_incremental runs them, without decoding
+    :param image_path: Path of the source image
+    :param operations: Dictionary of operations with their parameters, applied in order
+    :return: (number of operations served from the step cache, plan steps run after them)
+    """
+    source_key, steps = _chain_keys(image_path, operations)
+    reused, img, _ = get_step_cache().lookup(source_key, steps)
+    if img is not None:
+        size, mode = img.size, img.mode
+    else:
+        size, mode = peek_decoded_size(image_path, get_decode_size(operations))
+
+    segments = _plan_segments(steps, reused, size, mode)
+    return reused, [step for _, plan in segments for step in plan]
+
+
+def apply_operations_incremental(
+    image_path: str,
+    operations: dict,
+    cancel_token: 'CancellationToken' = None,
+    progress_callback: Callable[[int, int], None] = None
+) -> tuple:
+    """
+    Apply basic image operations, resuming from the longest cached prefix of the chain
+    :param image_path: Path of the source image
+    :param operations: Dictionary of operations with their parameters, applied in order
+    :param cancel_token: Optional token checked between operations
+    :param progress_callback: Optional function called with (operations done, total operations)
+    :return: (resulting image, step cache details)
+    """
+    step_cache = get_step_cache()
+    source_key, steps = _chain_keys(image_path, operations)
+
+    reused, img, time_saved_ms = step_cache.lookup(source_key, steps)
+    elapsed_ms = time_saved_ms
+    started = time.perf_counter()
+    if img is None:
+        img = open_image_for_operations(image_path, operations)
+
+    done = reused
+    for end, plan in _plan_segments(steps, reused, img.size, img.mode):
+        if progress_callback is not None:
+            progress_callback(done, len(steps))
+
+        img = execute_plan(img, plan, cancel_token)
+        elapsed_ms += (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+
+        step_cache.store(source_key, steps[:end], img, elapsed_ms)
+        img = read_only_view(img)
+        done = end
+
+    step_cache.record(reused, time_saved_ms)
+    return img, {
+        'reused_operations': reused,
+        'recomputed_operations': len(steps) - reused,
+        'time_saved_ms': round(time_saved_ms, 2),
+        'hit_rate': step_cache.stats()['hit_rate']
+    }
+
+
+def basic_operation(
+    image_id: str,
+    operations: dict,
+    encoder_tier: str = INTERACTIVE_ENCODER_TIER,
+    timeout_ms: int = None,
+    dry_run: bool = False
+) -> dict:
     """
     Apply basic image operations (resize, rotate, crop, flip, grayscale).
     :param image_id: Unique identifier for the image
     :param operations: Dictionary of operations with their parameters
+    :param encoder_tier: Encoder effort tier ('fast', 'balanced' or 'smallest')
+    :param timeout_ms: Maximum runtime in milliseconds, None for no deadline
+    :param dry_run: Return the execution plan without applying it
     :return: Operation result details
     """
+    return coalesce(image_id, 'basic_operation', {
+        # The order of the operations matters, so they are kept as a list
+        'operations': list(operations.items()),
+        'encoder_tier': encoder_tier,
+        'timeout_ms': timeout_ms,
+        'dry_run': dry_run
+    }, lambda: _basic_operation(image_id, operations, encoder_tier, timeout_ms, dry_run))
+
+
+def _basic_operation(
+    image_id: str,
+    operations: dict,
+    encoder_tier: str,
+    timeout_ms: int,
+    dry_run: bool
+) -> dict:
+    # Apply basic operations; identical concurrent calls are coalesced by basic_operation
+    if not is_valid_encoder_tier(encoder_tier):
+        return {
+            'success': False,
+            'message': 'Invalid encoder tier'
+        }
+
     upload_folder = 'uploads'
     compressed_folder = 'compressed'
     image_path = None
@@ -39,54 +220,62 @@ def basic_operation(image_id: str, operations: dict) -> dict:
             'message': 'Image not found'
         }
 
+    # Only the header or the cached prefix is needed to plan the operations
+    if dry_run:
+        reused, plan = plan_operations_incremental(image_path, operations)
+        return {
+            'success': True,
+            'message': 'Operation plan created',
+            'plan': plan,
+            'operation_count': len(operations),
+            'reused_operations': reused,
+            'pass_count': len(plan)
+        }
+
+    # A newer basic operation request on the same image cancels this one
+    cancel_token = register_operation(image_id, 'basic_operation', timeout_ms)
+    start_progress(image_id, 'basic_operation')
+
+    # One step per operation plus saving the result
+    total_steps = len(operations) + 1
+
     try:
-        with Image.open(image_path) as img:
-            for operation, params in operations.items():
-                if operation == 'resize':
-                    width = params.get('width')
-                    height = params.get('height')
-                    if width and height:
-                         img = img.resize((int(width), int(height)))
-                elif operation == 'rotate':
-                    angle = params.get('angle')
-                    if angle:
-                        img = img.rotate(int(angle))
-                elif operation == 'crop':
-                    left = params.get('left')
-                    top = params.get('top')
-                    right = params.get('right')
-                    bottom = params.get('bottom')
-                    if all([left, top, right, bottom]):
-                        img = img.crop((int(left), int(top), int(right), int(bottom)))
-                elif operation == 'flip':
-                    direction = params.get('direction')
-                    if direction == 'horizontal':
-                        img = img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
-                    elif direction == 'vertical':
-                        img = img.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
-                elif operation == 'grayscale':
-                    img = img.convert('L')
-
-            # Save the modified image
-            modified_folder = 'modified'
-            os.makedirs(modified_folder, exist_ok=True)
-            modified_filename = f'{image_id}_modified.png'
-            modified_path = os.path.join(modified_folder, modified_filename)
-            img.save(modified_path)
-
-            # Record operation timestamp
-            timestamps = load_image_timestamps()
-            timestamps[modified_path] = str(datetime.now())
-            save_image_timestamps(timestamps)
-
-            return {
-                'success': True,
-                'message': 'Image operations applied successfully',
-                'modified_image_url': modified_path
-            }
+        img, step_cache_info = apply_operations_incremental(
+            image_path,
+            operations,
+            cancel_token,
+            lambda done, total: update_progress(image_id, 'basic_operation', done, total_steps)
+        )
+
+        # Save the modified image
+        cancel_token.check()
+        update_progress(image_id, 'basic_operation', total_steps - 1, total_steps)
+        modified_folder = 'modified'
+        os.makedirs(modified_folder, exist_ok=True)
+        modified_filename = f'{image_id}_modified.png'
+        modified_path = os.path.join(modified_folder, modified_filename)
+        save_image(img, modified_path, 'png', encoder_tier)
+
+        # Record operation timestamp
+        record_image_timestamp(modified_path)
+        schedule_preview(image_id, modified_path)
+        finish_progress(image_id, 'basic_operation', True, 'Image operations applied successfully')
+
+        return {
+            'success': True,
+            'message': 'Image operations applied successfully',
+            'modified_image_url': modified_path,
+            'step_cache': step_cache_info
+        }
 
+    except OperationAbortedError as e:
+        finish_progress(image_id, 'basic_operation', False, str(e))
+        return abort_result(e, 'Image operations')
     except Exception as e:
+        finish_progress(image_id, 'basic_operation', False, str(e))
         return {
             'success': False,
             'message': f'Image operations failed: {str(e)}'
         }
+    finally:
+        release_operation(image_id, 'basic_operation', cancel_token)
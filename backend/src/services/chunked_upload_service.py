@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from typing import BinaryIO
+
+from werkzeug.exceptions import ClientDisconnected
+
+from services.upload_service import UPLOAD_FOLDER, allowed_file, new_upload_path, register_upload
+from utils.blob_store import store_file
+from utils.image_cleanup import record_image_timestamp
+
+UPLOAD_SESSION_FOLDER = 'upload_sessions'
+
+# Largest file accepted by a chunked upload
+MAX_CHUNKED_UPLOAD_SIZE = int(os.environ.get('MAX_CHUNKED_UPLOAD_SIZE', 1024 * 1024 * 1024))
+
+# Bytes read from the request body per write, so memory does not grow with the chunk size
+CHUNK_WRITE_BUFFER_SIZE = 1024 * 1024
+
+UPLOAD_NOT_FOUND_MESSAGE = 'Upload not found'
+
+_UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Serializes updates of the received ranges between concurrent chunks
+_sessions_lock = threading.Lock()
+
+# Running SHA-256 of the bytes received in order, keyed by upload ID; an upload whose chunks
+# arrive in order is not read again to hash it when it is finalized
+_upload_digests = {}
+
+
+def _part_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_SESSION_FOLDER, f'{upload_id}.part')
+
+
+def _session_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_SESSION_FOLDER, f'{upload_id}.json')
+
+
+def _load_session(upload_id: str) -> dict:
+    if not isinstance(upload_id, str) or not _UPLOAD_ID_PATTERN.match(upload_id):
+        return None
+    try:
+        with open(_session_path(upload_id), 'r') as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # The cleanup task may have expired the data of an abandoned upload
+    return session if os.path.exists(_part_path(upload_id)) else None
+
+
+def _save_session(upload_id: str, session: dict):
+    # Write to a temporary file first so a crash never leaves a partial session file
+    session_path = _session_path(upload_id)
+    with open(f'{session_path}.tmp', 'w') as f:
+        json.dump(session, f)
+    os.replace(f'{session_path}.tmp', session_path)
+
+
+def _merge_range(ranges: list, start: int, end: int) -> list:
+    # Add [start, end) to sorted, disjoint ranges, joining the ones it touches
+    merged = []
+    for range_start, range_end in sorted(ranges + [[start, end]]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
+
+
+def _status(upload_id: str, session: dict) -> dict:
+    received = sum(end - start for start, end in session['ranges'])
+    return {
+        'success': True,
+        'upload_id': upload_id,
+        'filename': session['filename'],
+        'size': session['size'],
+        'received_ranges': session['ranges'],
+        'bytes_received': received,
+        'complete': received == session['size']
+    }
+
+
+def create_chunked_upload(filename: str, size: int) -> dict:
+    """
+    Start a chunked upload
+    :param filename: Name of the file being uploaded
+    :param size: Total size of the file in bytes
+    :return: Dictionary with the upload ID
+    """
+    if not filename or not allowed_file(filename):
+        return {
+            'success': False,
+            'message': 'Invalid file type'
+        }
+
+    if not isinstance(size, int) or isinstance(size, bool) or not 0 < size <= MAX_CHUNKED_UPLOAD_SIZE:
+        return {
+            'success': False,
+            'message': 'Invalid file size'
+        }
+
+    os.makedirs(UPLOAD_SESSION_FOLDER, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+
+    # Chunks are written in place at their offsets, in any order
+    part_path = _part_path(upload_id)
+    with open(part_path, 'wb') as part:
+        part.truncate(size)
+    _save_session(upload_id, {'filename': filename, 'size': size, 'ranges': []})
+
+    with _sessions_lock:
+        _upload_digests[upload_id] = {'hashed': 0, 'digest': hashlib.sha256(), 'writing': 0}
+
+    # Abandoned uploads expire like any other file
+    record_image_timestamp(part_path)
+    record_image_timestamp(_session_path(upload_id))
+
+    return dict(_status(upload_id, _load_session(upload_id)), message='Upload created successfully')
+
+
+def write_upload_chunk(upload_id: str, offset: int, stream: 'BinaryIO', length: int) -> dict:
+    """
+    Write one chunk of a chunked upload at its offset
+    :param upload_id: Unique identifier for the upload
+    :param offset: Position of the chunk in the file
+    :param stream: Request body holding the chunk
+    :param length: Size of the chunk in bytes
+    :return: Dictionary with the ranges received so far
+    """
+    session = _load_session(upload_id)
+    if session is None:
+        return {
+            'success': False,
+            'message': UPLOAD_NOT_FOUND_MESSAGE
+        }
+
+    if offset < 0 or length <= 0 or offset + length > session['size']:
+        return {
+            'success': False,
+            'message': 'Chunk is outside the file'
+        }
+
+    # The chunk continuing the bytes hashed so far feeds the running digest; a chunk rewriting
+    # hashed bytes, or bytes being hashed, drops it and the upload is hashed again when finalized
+    digest = None
+    with _sessions_lock:
+        running = _upload_digests.get(upload_id)
+        if running is not None:
+            if offset < running['hashed'] + running['writing']:
+                del _upload_digests[upload_id]
+            elif offset == running['hashed']:
+                running['writing'] = length
+                digest = running['digest']
+
+    # Stream the body to its position, one buffer at a time
+    written = 0
+    part_path = _part_path(upload_id)
+    with open(part_path, 'r+b') as part:
+        part.seek(offset)
+        while written < length:
+            try:
+                block = stream.read(min(CHUNK_WRITE_BUFFER_SIZE, length - written))
+            except (ClientDisconnected, OSError):
+                # The connection dropped; the bytes written so far are still recorded
+                break
+            if not block:
+                break
+            part.write(block)
+            if digest is not None:
+                digest.update(block)
+            written += len(block)
+
+    with _sessions_lock:
+        session = _load_session(upload_id)
+        if session is None:
+            _upload_digests.pop(upload_id, None)
+            return {
+                'success': False,
+                'message': UPLOAD_NOT_FOUND_MESSAGE
+            }
+        # The digest may have been dropped by a chunk rewriting these bytes meanwhile
+        running = _upload_digests.get(upload_id)
+        if digest is not None and running is not None and running['digest'] is digest:
+            running['hashed'] += written
+            running['writing'] = 0
+        # A dropped connection keeps the bytes that arrived; the client resumes from the ranges
+        if written:
+            session['ranges'] = _merge_range(session['ranges'], offset, offset + written)
+            _save_session(upload_id, session)
+    record_image_timestamp(part_path)
+    record_image_timestamp(_session_path(upload_id))
+
+    return _status(upload_id, session)
+
+
+def get_chunked_upload(upload_id: str) -> dict:
+    """
+    Get the progress of a chunked upload
+    :param upload_id: Unique identifier for the upload
+    :return: Dictionary with the size and the ranges received so far
+    """
+    session = _load_session(upload_id)
+    if session is None:
+        return {
+            'success': False,
+            'message': UPLOAD_NOT_FOUND_MESSAGE
+        }
+    return _status(upload_id, session)
+
+
+def finalize_chunked_upload(upload_id: str, precompute: bool = None) -> dict:
+    """
+    Turn a fully received chunked upload into an uploaded image
+    :param upload_id: Unique identifier for the upload
+    :param precompute: Precompute the likely outputs in the background, defaults to SPECULATIVE_PRECOMPUTE
+    :return: Dictionary with an upload result, as returned by upload_image
+    """
+    with _sessions_lock:
+        session = _load_session(upload_id)
+        if session is None:
+            return {
+                'success': False,
+                'message': UPLOAD_NOT_FOUND_MESSAGE
+            }
+
+        status = _status(upload_id, session)
+        if not status['complete']:
+            return dict(status, success=False, message='Upload is incomplete')
+
+        # Without a running digest covering the whole file, store_file reads it again to hash it
+        running = _upload_digests.pop(upload_id, None)
+        content_hash = None
+        if running is not None and running['hashed'] == session['size']:
+            content_hash = running['digest'].hexdigest()
+
+        # The file is moved into the blob store, never copied, and the upload links to it
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        filepath = new_upload_path(session['filename'])
+        content_hash, deduplicated = store_file(_part_path(upload_id), filepath, content_hash)
+        os.remove(_session_path(upload_id))
+
+    result = register_upload(filepath, precompute)
+    if not result['success']:
+        return result
+    return dict(result, content_hash=content_hash, deduplicated=deduplicated)
+
+
+def abort_chunked_upload(upload_id: str) -> dict:
+    """
+    Cancel a chunked upload and delete the received data
+    :param upload_id: Unique identifier for the upload
+    :return: Dictionary with deletion status
+    """
+    with _sessions_lock:
+        if _load_session(upload_id) is None:
+            return {
+                'success': False,
+                'message': UPLOAD_NOT_FOUND_MESSAGE
+            }
+        _upload_digests.pop(upload_id, None)
+        os.remove(_part_path(upload_id))
+        os.remove(_session_path(upload_id))
+
+    return {
+        'success': True,
+        'message': 'Upload cancelled'
+    }
@@ -1,20 +1,131 @@
 import os
-from datetime import datetime
+import tempfile
+from typing import Callable, Iterator
 
 from PIL import Image
 
-from utils.image_cleanup import load_image_timestamps, save_image_timestamps
+from services.preview_service import schedule_preview
+from utils.cancellation import (
+    CancellationToken,
+    OperationAbortedError,
+    abort_result,
+    check_cancelled,
+    register_operation,
+    release_operation
+)
+from utils.content_hash import file_content_hash
+from utils.encoder_settings import FINAL_ENCODER_TIER, is_valid_encoder_tier, normalize_format, save_image
+from utils.image_cache import open_image
+from utils.image_cleanup import record_image_timestamp
 from utils.jpeg_compression import jpeg_compression
+from utils.parallel import run_parallel
+from utils.progress import finish_progress, make_progress_callback, start_progress
+from utils.result_cache import get_result_cache
+from utils.single_flight import coalesce
+from utils.speculative import get_speculative_pool
 
+# Bump when the compression pipeline changes so stale cached results are not served
+COMPRESSION_ENGINE_VERSION = 1
 
-def compress_image(image_id: str, compression_format: str, compression_quality: int) -> dict:
+
+def encode_compressed_image(
+    img: Image.Image,
+    compressed_path: str,
+    compression_format: str,
+    compression_quality: float,
+    encoder_tier: str = FINAL_ENCODER_TIER,
+    cancel_token: 'CancellationToken' = None,
+    progress_callback: Callable[[int, int], None] = None
+):
+    """
+    Compress an in-memory image and write it to a file
+    :param img: Input image
+    :param compressed_path: Output path
+    :param compression_format: Target compression format
+    :param compression_quality: Compression quality level
+    :param encoder_tier: Encoder effort tier ('fast', 'balanced' or 'smallest')
+    :param cancel_token: Optional token checked during the compression
+    :param progress_callback: Optional function called with (units done, total units)
+    """
+    if compression_format == 'jpeg':
+        # The JPEG engine works on color images only
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGB')
+
+        compressed = jpeg_compression(img, int(compression_quality * 100), cancel_token, progress_callback)
+        check_cancelled(cancel_token)
+        save_image(compressed, compressed_path, compression_format, encoder_tier)
+    else:
+        # The encoder runs as a single call, so only its start and end are reported
+        if progress_callback is not None:
+            progress_callback(0, 1)
+        check_cancelled(cancel_token)
+        save_image(img, compressed_path, compression_format, encoder_tier, quality=compression_quality)
+        if progress_callback is not None:
+            progress_callback(1, 1)
+
+
+def get_compression_cache_key(
+    image_path: str,
+    compression_format: str,
+    compression_quality: float,
+    encoder_tier: str
+) -> str:
+    """
+    Build the result cache key of a compression
+    :param image_path: Path of the source image
+    :param compression_format: Target compression format
+    :param compression_quality: Compression quality level
+    :param encoder_tier: Encoder effort tier
+    :return: Result cache key
+    """
+    return get_result_cache().make_key(
+        content_hash=file_content_hash(image_path),
+        compression_format=compression_format,
+        compression_quality=compression_quality,
+        encoder_tier=encoder_tier,
+        engine_version=COMPRESSION_ENGINE_VERSION
+    )
+
+
+def compress_image(
+    image_id: str,
+    compression_format: str,
+    compression_quality: int,
+    encoder_tier: str = FINAL_ENCODER_TIER,
+    timeout_ms: int = None
+) -> dict:
     """
     Compress an image with specified parameters
     :param image_id: Unique identifier for the image
     :param compression_format: Target compression format
     :param compression_quality: Compression quality level
+    :param encoder_tier: Encoder effort tier ('fast', 'balanced' or 'smallest')
+    :param timeout_ms: Maximum runtime in milliseconds, None for no deadline
     :return: Compression result details
     """
+    return coalesce(image_id, 'compress', {
+        'compression_format': normalize_format(compression_format),
+        'compression_quality': compression_quality,
+        'encoder_tier': encoder_tier,
+        'timeout_ms': timeout_ms
+    }, lambda: _compress_image(image_id, compression_format, compression_quality, encoder_tier, timeout_ms))
+
+
+def _compress_image(
+    image_id: str,
+    compression_format: str,
+    compression_quality: int,
+    encoder_tier: str,
+    timeout_ms: int
+) -> dict:
+    # Compress an image; identical concurrent calls are coalesced by compress_image
+    if not is_valid_encoder_tier(encoder_tier):
+        return {
+            'success': False,
+            'message': 'Invalid encoder tier'
+        }
+
     # Locate the original image
     upload_folder = 'uploads'
     original_image_path = None
@@ -35,29 +146,124 @@ def compress_image(image_id: str, compression_format: str, compression_quality:
     compressed_filename = f'{image_id}_compressed.{compression_format}'
     compressed_path = os.path.join(compressed_folder, compressed_filename)
 
+    # A newer compression of the same image cancels this one
+    cancel_token = register_operation(image_id, 'compress', timeout_ms)
+    start_progress(image_id, 'compress')
+
     try:
-        # Open and compress image
-        with Image.open(original_image_path) as img:
-            if compression_format == 'jpeg':
-                jpeg_compression(
-                    img,
-                    int(compression_quality * 100)
-                ).save(compressed_path)
-            else:
-                img.save(compressed_path, format=compression_format, quality=compression_quality)
+        # Serve an identical earlier output from the result cache without decoding
+        result_cache = get_result_cache()
+        cache_key = get_compression_cache_key(original_image_path, compression_format, compression_quality, encoder_tier)
+        cache_hit = result_cache.get(cache_key, compressed_path)
+        if cache_hit:
+            get_speculative_pool().record_hit(cache_key)
+
+        if not cache_hit:
+            # Open and compress image
+            encode_compressed_image(
+                open_image(original_image_path),
+                compressed_path,
+                compression_format,
+                compression_quality,
+                encoder_tier,
+                cancel_token,
+                make_progress_callback(image_id, 'compress')
+            )
+            result_cache.put(cache_key, compressed_path)
 
         # Record compression timestamp
-        timestamps = load_image_timestamps()
-        timestamps[compressed_path] = str(datetime.now())
-        save_image_timestamps(timestamps)
+        record_image_timestamp(compressed_path)
+        schedule_preview(image_id, compressed_path)
+        finish_progress(image_id, 'compress', True, 'Image compressed successfully')
 
         return {
             'success': True,
             'message': 'Image compressed successfully',
-            'compressed_image_url': compressed_path
+            'compressed_image_url': compressed_path,
+            'cache_hit': cache_hit
         }
+    except OperationAbortedError as e:
+        finish_progress(image_id, 'compress', False, str(e))
+        return abort_result(e, 'Compression')
     except Exception as e:
+        finish_progress(image_id, 'compress', False, str(e))
         return {
             'success': False,
             'message': f'Compression failed: {str(e)}'
         }
+    finally:
+        release_operation(image_id, 'compress', cancel_token)
+
+
+def precompute_compression(
+    image_id: str,
+    compression_format: str,
+    compression_quality: float,
+    encoder_tier: str = FINAL_ENCODER_TIER,
+    cancel_token: 'CancellationToken' = None
+) -> str:
+    """
+    Compress an image into the result cache only, so a later identical compress_image is a cache hit
+    :param image_id: Unique identifier for the image
+    :param compression_format: Target compression format
+    :param compression_quality: Compression quality level
+    :param encoder_tier: Encoder effort tier ('fast', 'balanced' or 'smallest')
+    :param cancel_token: Optional token checked during the compression
+    :return: Result cache key of the output, None if it was already cached or the image is gone
+    """
+    upload_folder = 'uploads'
+    original_image_path = None
+    for filename in os.listdir(upload_folder):
+        if filename.startswith(image_id):
+            original_image_path = os.path.join(upload_folder, filename)
+            break
+
+    if not original_image_path:
+        return None
+
+    result_cache = get_result_cache()
+    cache_key = get_compression_cache_key(original_image_path, compression_format, compression_quality, encoder_tier)
+    if cache_key in result_cache:
+        return None
+
+    # The output folders are left untouched; other services treat their files as user results
+    with tempfile.TemporaryDirectory() as temp_folder:
+        temp_path = os.path.join(temp_folder, f'{image_id}.{compression_format}')
+        encode_compressed_image(
+            open_image(original_image_path),
+            temp_path,
+            compression_format,
+            compression_quality,
+            encoder_tier,
+            cancel_token
+        )
+        result_cache.put(cache_key, temp_path)
+
+    return cache_key
+
+
+def compress_images(items: list, encoder_tier: str = FINAL_ENCODER_TIER, timeout_ms: int = None) -> Iterator[dict]:
+    """
+    Compress several images in parallel on the shared worker pool
+    :param items: Dictionaries with image_id, compression_format and compression_quality
+    :param encoder_tier: Encoder effort tier ('fast', 'balanced' or 'smallest')
+    :param timeout_ms: Maximum runtime of each compression in milliseconds
+    :return: Iterator of per-image results in completion order
+    """
+    def compress_item(item: dict) -> dict:
+        if not all([item.get('image_id'), item.get('compression_format'), item.get('compression_quality')]):
+            return {
+                'success': False,
+                'message': 'Missing required parameters'
+            }
+
+        return compress_image(
+            item['image_id'],
+            item['compression_format'],
+            item['compression_quality'],
+            encoder_tier,
+            timeout_ms
+        )
+
+    for index, result in run_parallel(compress_item, items):
+        yield dict(result, index=index, image_id=items[index].get('image_id'))
@@ -1,5 +1,8 @@
 import os
 
+from utils.blob_store import remove_file
+from utils.progress import clear_progress
+
 
 def delete_image(image_id: str) -> dict:
     """
@@ -8,7 +11,7 @@ def delete_image(image_id: str) -> dict:
     :return: Dictionary with deletion status
     """
     # Directories to search for image files
-    directories = ['uploads', 'compressed', 'watermarked']
+    directories = ['uploads', 'compressed', 'watermarked', 'renditions', 'tiles', 'metadata', 'previews']
     
     # Track if any files were deleted
     files_deleted = False
@@ -24,7 +27,8 @@ def delete_image(image_id: str) -> dict:
             if filename.startswith(image_id):
                 filepath = os.path.join(directory, filename)
                 try:
-                    os.remove(filepath)
+                    # Uploads are links to shared content, kept while other images refer to it
+                    remove_file(filepath)
                     files_deleted = True
                 except Exception as e:
                     return {
@@ -32,6 +36,9 @@ def delete_image(image_id: str) -> dict:
                         'message': f'Failed to delete file {filename}: {str(e)}'
                     }
 
+    # Forget any progress reported for the image
+    clear_progress(image_id)
+
     # Return result
     if files_deleted:
         return {
@@ -1,5 +1,8 @@
 import os
 import base64
+import mimetypes
+
+from services.preview_service import PREVIEW_MIME_TYPE, get_preview
 
 def get_downloadable_image(image_id: str, image_type: str='original') -> dict:
     """
@@ -59,12 +62,13 @@ def get_downloadable_image(image_id: str, image_type: str='original') -> dict:
     }
 
 
-def get_image_base64(image_id: str, image_type: str='original') -> dict:
+def get_image_base64(image_id: str, image_type: str='original', size: str='full') -> dict:
     """
     Convert image to base64 string for transmission
     :param image_id: Unique identifier for the image
     :param image_type: Type of image
-    :return: Dictionary with base64 encoded image data
+    :param size: 'full' for the image itself, 'preview' for a small WebP preview of it
+    :return: Dictionary with base64 encoded image data and its MIME type
     """
     result = get_downloadable_image(image_id, image_type)
     if not result['success']:
@@ -72,11 +76,18 @@ def get_image_base64(image_id: str, image_type: str='original') -> dict:
 
     filepath = result['filepath']
     try:
+        if size == 'preview':
+            filepath = get_preview(filepath)
+            mimetype = PREVIEW_MIME_TYPE
+        else:
+            mimetype = mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
+
         with open(filepath, "rb") as image_file:
             encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
         return {
             'success': True,
-            'image_base64': encoded_string
+            'image_base64': encoded_string,
+            'mimetype': mimetype
         }
     except Exception as e:
         return {
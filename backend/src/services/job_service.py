@@ -0,0 +1,85 @@
+import os
+import threading
+
+from services.basic_operation_service import basic_operation
+from services.compress_service import compress_image
+from services.watermark_service import add_watermark
+from utils.job_queue import JobQueue
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', os.cpu_count() or 2))
+
+# Service functions executed by the job workers, called as handler(image_id, **params)
+JOB_HANDLERS = {
+    'compress': compress_image,
+    'watermark': add_watermark,
+    'basic_operation': basic_operation
+}
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue(start: bool = True) -> JobQueue:
+    """
+    Get the process-wide job queue, creating it on first use
+    :param start: Start the worker threads if they are not running yet
+    :return: The shared JobQueue
+    """
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(JOB_HANDLERS, workers=JOB_WORKERS)
+    if start:
+        _job_queue.start()
+    return _job_queue
+
+
+def submit_job(image_id: str, operation: str, params: dict) -> dict:
+    """
+    Queue an operation to run in the background
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name ('compress', 'watermark' or 'basic_operation')
+    :param params: Keyword arguments of the service function
+    :return: Dictionary with the job ID
+    """
+    try:
+        job_id = get_job_queue().enqueue(image_id, operation, params)
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Failed to queue job: {str(e)}'
+        }
+
+    return {
+        'success': True,
+        'message': 'Job queued successfully',
+        'job_id': job_id,
+        'status': 'queued'
+    }
+
+
+def get_image_jobs(image_id: str) -> list:
+    """
+    Get the recent background jobs of an image with their timings
+    :param image_id: Unique identifier for the image
+    :return: List of job details, newest first
+    """
+    # Reading the database does not need the workers
+    return get_job_queue(start=False).get_jobs_for_image(image_id)
+
+
+def has_pending_jobs(image_id: str, operation: str = None) -> bool:
+    """
+    Check whether an image has background jobs that have not finished
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name, None for any operation
+    :return: True if a job is queued or running
+    """
+    return get_job_queue(start=False).has_pending_jobs(image_id, operation)
+
+
+def prune_jobs():
+    """
+    Delete the finished jobs older than FINISHED_JOB_RETENTION
+    """
+    get_job_queue(start=False).prune_finished_jobs()
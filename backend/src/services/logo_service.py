@@ -0,0 +1,93 @@
+import os
+import re
+import uuid
+
+from PIL import Image, UnidentifiedImageError
+from werkzeug.datastructures import FileStorage
+
+from services.upload_service import allowed_file
+from utils.encoder_settings import FINAL_ENCODER_TIER, save_image
+from utils.image_cleanup import record_image_timestamp
+from utils.image_metadata import read_image_header
+
+LOGO_FOLDER = 'logos'
+
+# Logos larger than this are scaled down once at upload, never at stamping time
+MAX_LOGO_DIMENSION = 4096
+
+_LOGO_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def upload_logo(file: 'FileStorage') -> dict:
+    """
+    Store a logo for watermarking, referenced afterwards by its ID
+    :param file: File object from request
+    :return: Dictionary with the logo ID and dimensions
+    """
+    if not file or not allowed_file(file.filename):
+        return {
+            'success': False,
+            'message': 'Invalid file type'
+        }
+
+    os.makedirs(LOGO_FOLDER, exist_ok=True)
+    logo_id = uuid.uuid4().hex
+    upload_path = f'{get_logo_path(logo_id)}.upload.tmp'
+    try:
+        file.save(upload_path)
+
+        # Oversized and corrupt logos are rejected from their header, before any decode
+        try:
+            read_image_header(upload_path)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e)
+            }
+
+        try:
+            with Image.open(upload_path) as logo:
+                logo = logo.convert('RGBA')
+        except (UnidentifiedImageError, OSError):
+            return {
+                'success': False,
+                'message': 'Invalid image file'
+            }
+    finally:
+        os.remove(upload_path)
+    logo.thumbnail((MAX_LOGO_DIMENSION, MAX_LOGO_DIMENSION))
+
+    # Logos are kept as RGBA PNGs so stamping only ever decodes one format
+    logo_path = get_logo_path(logo_id)
+    save_image(logo, logo_path, 'png', FINAL_ENCODER_TIER)
+    # Logos expire like the images they are stamped on
+    record_image_timestamp(logo_path)
+
+    return {
+        'success': True,
+        'message': 'Logo uploaded successfully',
+        'logo_id': logo_id,
+        'width': logo.width,
+        'height': logo.height
+    }
+
+
+def get_logo_path(logo_id: str) -> str:
+    """
+    Get the path of a stored logo
+    :param logo_id: Unique identifier for the logo
+    :return: Path of the logo file
+    """
+    return os.path.join(LOGO_FOLDER, f'{logo_id}.png')
+
+
+def find_logo(logo_id: str) -> str:
+    """
+    Locate a stored logo
+    :param logo_id: Unique identifier for the logo
+    :return: Path of the logo file, None if there is no such logo
+    """
+    if not isinstance(logo_id, str) or not _LOGO_ID_PATTERN.match(logo_id):
+        return None
+    path = get_logo_path(logo_id)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,188 @@
+import os
+import time
+
+from PIL import Image
+
+from services.basic_operation_service import apply_operations, open_image_for_operations
+from services.compress_service import encode_compressed_image
+from services.preview_service import schedule_preview
+from services.watermark_service import apply_watermark, build_watermark_config, normalize_watermark_config
+from utils.cancellation import (
+    CancellationToken,
+    OperationAbortedError,
+    abort_result,
+    register_operation,
+    release_operation
+)
+from utils.encoder_settings import FINAL_ENCODER_TIER, INTERACTIVE_ENCODER_TIER, is_valid_encoder_tier, save_image
+from utils.image_cache import open_image
+from utils.image_cleanup import record_image_timestamp
+from utils.progress import finish_progress, start_progress, update_progress
+
+PIPELINE_STEP_TYPES = {'basic_operation', 'watermark', 'compress'}
+
+
+def validate_pipeline_steps(steps: list) -> str:
+    """
+    Check that the pipeline steps can be executed
+    :param steps: Ordered list of pipeline steps
+    :return: Error message, None if the steps are valid
+    """
+    if not isinstance(steps, list) or not steps:
+        return 'Pipeline steps are required'
+
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict) or step.get('type') not in PIPELINE_STEP_TYPES:
+            return f'Invalid pipeline step at index {index}'
+
+        if step['type'] == 'basic_operation' and not isinstance(step.get('operations'), dict):
+            return f'Missing operations for pipeline step at index {index}'
+
+        if step['type'] == 'compress':
+            if index != len(steps) - 1:
+                return 'Compress must be the last pipeline step'
+            if not all([step.get('compression_format'), step.get('compression_quality')]):
+                return f'Missing compression parameters for pipeline step at index {index}'
+
+    return None
+
+
+def _get_output_path(image_id: str, last_step: dict) -> tuple:
+    # The output goes where the single-step endpoint of the last step writes it
+    if last_step['type'] == 'compress':
+        return 'compressed', f"{image_id}_compressed.{last_step['compression_format']}", 'compressed_image_url'
+    if last_step['type'] == 'watermark':
+        return 'watermarked', f'{image_id}_watermarked.png', 'watermarked_image_url'
+    return 'modified', f'{image_id}_modified.png', 'modified_image_url'
+
+
+def apply_edit_step(img: Image.Image, step: dict, cancel_token: 'CancellationToken' = None) -> Image.Image:
+    """
+    Apply a basic_operation or watermark pipeline step to an in-memory image
+    :param img: Input image
+    :param step: Pipeline step
+    :param cancel_token: Optional token checked during the step
+    :return: Resulting image
+    """
+    if step['type'] == 'basic_operation':
+        return apply_operations(img, step['operations'], cancel_token)
+
+    return apply_watermark(
+        img,
+        step.get('watermark_text', 'Watermarked'),
+        step.get('position', 'bottom-right'),
+        normalize_watermark_config(build_watermark_config(step)),
+        cancel_token
+    )
+
+
+def run_pipeline(image_id: str, steps: list, encoder_tier: str = None, timeout_ms: int = None) -> dict:
+    """
+    Run basic operations, watermark and compress steps on one in-memory image
+    :param image_id: Unique identifier for the image
+    :param steps: Ordered list of steps, each with a 'type' and the parameters of that step
+    :param encoder_tier: Encoder effort tier, defaults to the tier of the last step's endpoint
+    :param timeout_ms: Maximum runtime in milliseconds, None for no deadline
+    :return: Pipeline result details with per-stage timings
+    """
+    error = validate_pipeline_steps(steps)
+    if error:
+        return {
+            'success': False,
+            'message': error
+        }
+
+    if encoder_tier is None:
+        encoder_tier = FINAL_ENCODER_TIER if steps[-1]['type'] == 'compress' else INTERACTIVE_ENCODER_TIER
+
+    if not is_valid_encoder_tier(encoder_tier):
+        return {
+            'success': False,
+            'message': 'Invalid encoder tier'
+        }
+
+    # Locate the original image
+    upload_folder = 'uploads'
+    original_image_path = None
+    for filename in os.listdir(upload_folder):
+        if filename.startswith(image_id):
+            original_image_path = os.path.join(upload_folder, filename)
+            break
+
+    if not original_image_path:
+        return {
+            'success': False,
+            'message': 'Image not found'
+        }
+
+    # Only the output of the last step is written
+    output_folder, output_filename, output_key = _get_output_path(image_id, steps[-1])
+    os.makedirs(output_folder, exist_ok=True)
+    output_path = os.path.join(output_folder, output_filename)
+
+    # A newer pipeline request on the same image cancels this one
+    cancel_token = register_operation(image_id, 'pipeline', timeout_ms)
+    start_progress(image_id, 'pipeline')
+
+    timings = []
+
+    def record_stage(stage: str, started: float):
+        timings.append({'stage': stage, 'ms': round((time.perf_counter() - started) * 1000, 2)})
+
+    try:
+        started = time.perf_counter()
+        # A pipeline starting with a downscale can decode the source at a reduced resolution
+        if steps[0]['type'] == 'basic_operation':
+            img = open_image_for_operations(original_image_path, steps[0]['operations'])
+        else:
+            img = open_image(original_image_path)
+        record_stage('decode', started)
+
+        for index, step in enumerate(steps):
+            cancel_token.check()
+            update_progress(image_id, 'pipeline', index, len(steps))
+            started = time.perf_counter()
+
+            if step['type'] == 'compress':
+                encode_compressed_image(
+                    img,
+                    output_path,
+                    step['compression_format'],
+                    step['compression_quality'],
+                    encoder_tier,
+                    cancel_token
+                )
+            else:
+                img = apply_edit_step(img, step, cancel_token)
+
+            record_stage(step['type'], started)
+
+        # Compress steps already wrote the encoded output
+        if steps[-1]['type'] != 'compress':
+            cancel_token.check()
+            started = time.perf_counter()
+            save_image(img, output_path, 'png', encoder_tier)
+            record_stage('encode', started)
+
+        record_image_timestamp(output_path)
+        schedule_preview(image_id, output_path)
+        finish_progress(image_id, 'pipeline', True, 'Pipeline completed successfully')
+
+        return {
+            'success': True,
+            'message': 'Pipeline completed successfully',
+            output_key: output_path,
+            'timings': timings,
+            'total_ms': round(sum(timing['ms'] for timing in timings), 2)
+        }
+    except OperationAbortedError as e:
+        finish_progress(image_id, 'pipeline', False, str(e))
+        return abort_result(e, 'Pipeline')
+    except Exception as e:
+        finish_progress(image_id, 'pipeline', False, str(e))
+        return {
+            'success': False,
+            'message': f'Pipeline failed: {str(e)}'
+        }
+    finally:
+        release_operation(image_id, 'pipeline', cancel_token)
@@ -0,0 +1,105 @@
+import functools
+import os
+import uuid
+from typing import Optional
+
+from PIL import Image
+
+from utils.cancellation import CancellationToken, check_cancelled
+from utils.encoder_settings import INTERACTIVE_ENCODER_TIER, save_image
+from utils.image_cache import open_image_for_size
+from utils.image_cleanup import record_image_timestamp
+from utils.operation_planner import RESIZE_REDUCING_GAP
+from utils.speculative import get_speculative_pool
+
+PREVIEW_FOLDER = 'previews'
+
+# Longest side of a preview in pixels; smaller images keep their size
+PREVIEW_MAX_SIZE = 512
+
+# Encoder quality (0-100) of the WebP previews
+PREVIEW_QUALITY = 75
+
+PREVIEW_MIME_TYPE = 'image/webp'
+
+
+def get_preview_path(source_path: str) -> str:
+    """
+    Get the path of the preview of an image file
+    :param source_path: Path of the uploaded or processed image
+    :return: Path of its preview; file names start with the image ID like their source
+    """
+    return os.path.join(PREVIEW_FOLDER, f'{os.path.basename(source_path)}.webp')
+
+
+def _is_fresh(preview_path: str, source_path: str) -> bool:
+    # Processed outputs are rewritten in place; a preview carries the modification time of the
+    # source it was made from, so any other time means it shows stale pixels
+    try:
+        return os.stat(preview_path).st_mtime_ns == os.stat(source_path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def create_preview(source_path: str, cancel_token: 'CancellationToken' = None) -> str:
+    """
+    Write a small WebP preview of an image file
+    :param source_path: Path of the uploaded or processed image
+    :param cancel_token: Optional token checked between the decode, resize and encode
+    :return: Path of the preview
+    """
+    # Stat before decoding, so a source rewritten meanwhile leaves the preview stale
+    source_mtime_ns = os.stat(source_path).st_mtime_ns
+    with Image.open(source_path) as img:
+        source_size = img.size
+    scale = min(1.0, PREVIEW_MAX_SIZE / max(source_size))
+    preview_size = (max(1, round(source_size[0] * scale)), max(1, round(source_size[1] * scale)))
+
+    # JPEG sources are decoded directly at a reduced resolution
+    img = open_image_for_size(source_path, preview_size)
+    check_cancelled(cancel_token)
+    if img.mode not in ('RGB', 'RGBA'):
+        has_alpha = img.mode in ('LA', 'PA') or 'transparency' in img.info
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+    if img.size != preview_size:
+        img = img.resize(preview_size, reducing_gap=RESIZE_REDUCING_GAP)
+    check_cancelled(cancel_token)
+
+    os.makedirs(PREVIEW_FOLDER, exist_ok=True)
+    preview_path = get_preview_path(source_path)
+    temp_path = f'{preview_path}.{uuid.uuid4().hex}.tmp'
+    save_image(img, temp_path, 'webp', INTERACTIVE_ENCODER_TIER, quality=PREVIEW_QUALITY)
+    os.utime(temp_path, ns=(source_mtime_ns, source_mtime_ns))
+    os.replace(temp_path, preview_path)
+    record_image_timestamp(preview_path)
+    return preview_path
+
+
+def _precompute_preview(source_path: str, cancel_token: 'CancellationToken') -> Optional[str]:
+    # Speculative task: nothing to do when the source is gone or already has a current preview
+    if not os.path.exists(source_path) or _is_fresh(get_preview_path(source_path), source_path):
+        return None
+    return create_preview(source_path, cancel_token)
+
+
+def schedule_preview(image_id: str, source_path: str):
+    """
+    Generate the preview of a newly written image on the low-priority speculative pool
+    :param image_id: Unique identifier for the image
+    :param source_path: Path of the uploaded or processed image
+    """
+    # The pool passes the cancellation token as the last argument
+    get_speculative_pool().submit(image_id, 'preview', functools.partial(_precompute_preview, source_path))
+
+
+def get_preview(source_path: str) -> str:
+    """
+    Get the preview of an image file, generating it now if the background task has not
+    :param source_path: Path of the uploaded or processed image
+    :return: Path of the preview
+    """
+    preview_path = get_preview_path(source_path)
+    if _is_fresh(preview_path, source_path):
+        get_speculative_pool().record_hit(preview_path)
+        return preview_path
+    return create_preview(source_path)
@@ -0,0 +1,198 @@
+import os
+import time
+
+from PIL import Image
+
+from utils.cancellation import (
+    CancellationToken,
+    OperationAbortedError,
+    abort_result,
+    check_cancelled,
+    register_operation,
+    release_operation
+)
+from utils.encoder_settings import FINAL_ENCODER_TIER, is_valid_encoder_tier, normalize_format, save_image
+from utils.image_cache import open_image_for_size
+from utils.image_cleanup import record_image_timestamp
+from utils.image_metadata import get_image_metadata
+from utils.operation_planner import RESIZE_REDUCING_GAP
+from utils.parallel import run_parallel
+from utils.progress import finish_progress, start_progress, update_progress
+
+RENDITION_FOLDER = 'renditions'
+
+# Widths generated when the request does not list any, for responsive srcset delivery
+DEFAULT_RENDITION_WIDTHS = [320, 640, 1280, 2560]
+
+RENDITION_FORMATS = {'webp', 'jpeg', 'png'}
+
+# Encoder quality (0-100) used by the lossy formats when the request does not set one
+DEFAULT_RENDITION_QUALITY = 80
+
+
+def build_rendition_cascade(
+    img: Image.Image,
+    sizes: list,
+    cancel_token: 'CancellationToken' = None
+) -> list:
+    """
+    Downscale an image to several sizes, each one from the next larger rendition
+    :param img: Decoded source image
+    :param sizes: Target (width, height) sizes
+    :param cancel_token: Optional token checked between renditions
+    :return: (size, image) pairs from the largest to the smallest size
+    """
+    renditions = []
+    current = img
+    for size in sorted(sizes, reverse=True):
+        check_cancelled(cancel_token)
+        if current.size != size:
+            current = current.resize(size, reducing_gap=RESIZE_REDUCING_GAP)
+        renditions.append((size, current))
+    return renditions
+
+
+def create_renditions(
+    image_id: str,
+    widths: list = None,
+    rendition_format: str = 'webp',
+    quality: int = DEFAULT_RENDITION_QUALITY,
+    encoder_tier: str = FINAL_ENCODER_TIER,
+    timeout_ms: int = None
+) -> dict:
+    """
+    Build several widths of an image from a single decode and encode them in parallel
+    :param image_id: Unique identifier for the image
+    :param widths: Rendition widths in pixels, widths above the source width are skipped
+    :param rendition_format: Output format ('webp', 'jpeg' or 'png')
+    :param quality: Encoder quality (0-100) of the lossy formats
+    :param encoder_tier: Encoder effort tier ('fast', 'balanced' or 'smallest')
+    :param timeout_ms: Maximum runtime in milliseconds, None for no deadline
+    :return: Rendition manifest with paths, dimensions and byte sizes
+    """
+    rendition_format = normalize_format(rendition_format)
+    if rendition_format not in RENDITION_FORMATS:
+        return {
+            'success': False,
+            'message': 'Invalid rendition format'
+        }
+
+    if not is_valid_encoder_tier(encoder_tier):
+        return {
+            'success': False,
+            'message': 'Invalid encoder tier'
+        }
+
+    try:
+        widths = sorted({int(width) for width in (widths or DEFAULT_RENDITION_WIDTHS)}, reverse=True)
+    except (TypeError, ValueError):
+        widths = []
+    if not widths or widths[-1] <= 0:
+        return {
+            'success': False,
+            'message': 'Invalid rendition widths'
+        }
+
+    # Locate the original image
+    upload_folder = 'uploads'
+    original_image_path = None
+    for filename in os.listdir(upload_folder):
+        if filename.startswith(image_id):
+            original_image_path = os.path.join(upload_folder, filename)
+            break
+
+    if not original_image_path:
+        return {
+            'success': False,
+            'message': 'Image not found'
+        }
+
+    os.makedirs(RENDITION_FOLDER, exist_ok=True)
+
+    # A newer rendition request on the same image cancels this one
+    cancel_token = register_operation(image_id, 'renditions', timeout_ms)
+    start_progress(image_id, 'renditions')
+
+    try:
+        started = time.perf_counter()
+        # The size comes from the metadata record written at upload
+        metadata = get_image_metadata(image_id, original_image_path)
+        source_width, source_height = metadata['width'], metadata['height']
+
+        # Renditions are never upscaled
+        skipped = [width for width in widths if width > source_width]
+        sizes = [
+            (width, max(1, round(source_height * width / source_width)))
+            for width in widths if width <= source_width
+        ]
+        if not sizes:
+            finish_progress(image_id, 'renditions', False, 'All rendition widths exceed the image width')
+            return {
+                'success': False,
+                'message': 'All rendition widths exceed the image width',
+                'skipped_widths': skipped
+            }
+
+        # Decode once, at a reduced resolution when only small renditions are needed
+        img = open_image_for_size(original_image_path, sizes[0])
+        # Palette and bilevel images would be resized with nearest-neighbour sampling
+        if img.mode not in ('RGB', 'RGBA', 'L'):
+            img = img.convert('RGBA')
+        if rendition_format == 'jpeg' and img.mode == 'RGBA':
+            img = img.convert('RGB')
+        renditions = build_rendition_cascade(img, sizes, cancel_token)
+        resize_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        def encode_rendition(rendition: tuple) -> dict:
+            (width, height), rendition_image = rendition
+            check_cancelled(cancel_token)
+            path = os.path.join(RENDITION_FOLDER, f'{image_id}_{width}w.{rendition_format}')
+            options = {} if rendition_format == 'png' else {'quality': quality}
+            save_image(rendition_image, path, rendition_format, encoder_tier, **options)
+            record_image_timestamp(path)
+            return {
+                'success': True,
+                'width': width,
+                'height': height,
+                'path': path,
+                'bytes': os.path.getsize(path)
+            }
+
+        # Encoders release the GIL, so the renditions are encoded in parallel
+        manifest = []
+        for done, (_, result) in enumerate(run_parallel(encode_rendition, renditions), start=1):
+            update_progress(image_id, 'renditions', done, len(renditions))
+            manifest.append(result)
+
+        cancel_token.check()
+        failed = [result['message'] for result in manifest if not result['success']]
+        if failed:
+            raise RuntimeError(failed[0])
+
+        manifest.sort(key=lambda rendition: rendition['width'])
+        for rendition in manifest:
+            del rendition['success']
+
+        finish_progress(image_id, 'renditions', True, 'Renditions created successfully')
+        return {
+            'success': True,
+            'message': 'Renditions created successfully',
+            'format': rendition_format,
+            'source_size': [source_width, source_height],
+            'renditions': manifest,
+            'skipped_widths': skipped,
+            'srcset': ', '.join(f"{rendition['path']} {rendition['width']}w" for rendition in manifest),
+            'resize_ms': resize_ms,
+            'total_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+    except OperationAbortedError as e:
+        finish_progress(image_id, 'renditions', False, str(e))
+        return abort_result(e, 'Rendition generation')
+    except Exception as e:
+        finish_progress(image_id, 'renditions', False, str(e))
+        return {
+            'success': False,
+            'message': f'Rendition generation failed: {str(e)}'
+        }
+    finally:
+        release_operation(image_id, 'renditions', cancel_token)
@@ -0,0 +1,227 @@
+import base64
+import copy
+import io
+import os
+import time
+import uuid
+
+from services.pipeline_service import apply_edit_step, run_pipeline, validate_pipeline_steps
+from utils.encoder_settings import INTERACTIVE_ENCODER_TIER, save_image
+from utils.image_cache import image_nbytes, open_image_for_size
+from utils.image_metadata import get_image_metadata
+from utils.lru_cache import ByteLRUCache
+from utils.operation_planner import RESIZE_REDUCING_GAP
+
+# Proxy size used when the client does not send its viewport size
+DEFAULT_PROXY_SIZE = (1280, 1280)
+
+# Memory kept for the proxies of open sessions; the least recently used sessions are closed first
+SESSION_CACHE_MAX_BYTES = int(os.environ.get('SESSION_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# JPEG quality of previews without transparency
+PREVIEW_JPEG_QUALITY = 85
+
+SESSION_NOT_FOUND_MESSAGE = 'Session not found'
+
+# Editing sessions keyed by session ID
+_sessions = ByteLRUCache(SESSION_CACHE_MAX_BYTES)
+
+
+def _fit_size(size: tuple, bounds: tuple) -> tuple:
+    # Largest size with the aspect ratio of size that fits in bounds, never upscaled
+    scale = min(bounds[0] / size[0], bounds[1] / size[1], 1.0)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def scale_steps(steps: list, scale_x: float, scale_y: float) -> list:
+    """
+    Convert the pixel parameters of pipeline steps from source to proxy coordinates
+    :param steps: Pipeline steps in source image coordinates
+    :param scale_x: Horizontal proxy scale
+    :param scale_y: Vertical proxy scale
+    :return: Scaled copy of the steps
+    """
+    def scaled(value, scale):
+        # Keep the value truthy, zero disables an operation
+        return max(1, round(int(value) * scale))
+
+    steps = copy.deepcopy(steps)
+    for step in steps:
+        if step['type'] == 'basic_operation':
+            operations = step['operations']
+            resize = operations.get('resize') or {}
+            if resize.get('width') and resize.get('height'):
+                resize['width'] = scaled(resize['width'], scale_x)
+                resize['height'] = scaled(resize['height'], scale_y)
+            crop = operations.get('crop') or {}
+            if all(crop.get(key) for key in ('left', 'top', 'right', 'bottom')):
+                for key, scale in (('left', scale_x), ('top', scale_y), ('right', scale_x), ('bottom', scale_y)):
+                    crop[key] = scaled(crop[key], scale)
+        elif step['type'] == 'watermark':
+            # Percentage positions are resolution independent, only the text size changes
+            step['fontSize'] = scaled(step.get('fontSize') or 36, min(scale_x, scale_y))
+
+    return steps
+
+
+def create_session(image_id: str, viewport_width: int = None, viewport_height: int = None) -> dict:
+    """
+    Open an editing session with a downscaled proxy of an image kept in memory
+    :param image_id: Unique identifier for the image
+    :param viewport_width: Width the previews are displayed at
+    :param viewport_height: Height the previews are displayed at
+    :return: Session details
+    """
+    # Locate the original image
+    upload_folder = 'uploads'
+    original_image_path = None
+    for filename in os.listdir(upload_folder):
+        if filename.startswith(image_id):
+            original_image_path = os.path.join(upload_folder, filename)
+            break
+
+    if not original_image_path:
+        return {
+            'success': False,
+            'message': 'Image not found'
+        }
+
+    try:
+        bounds = (int(viewport_width or DEFAULT_PROXY_SIZE[0]), int(viewport_height or DEFAULT_PROXY_SIZE[1]))
+    except (TypeError, ValueError):
+        bounds = (0, 0)
+    if bounds[0] <= 0 or bounds[1] <= 0:
+        return {
+            'success': False,
+            'message': 'Invalid viewport size'
+        }
+
+    try:
+        # The size comes from the metadata record written at upload
+        metadata = get_image_metadata(image_id, original_image_path)
+        source_size = (metadata['width'], metadata['height'])
+        proxy_size = _fit_size(source_size, bounds)
+
+        # JPEG sources are decoded directly at a reduced resolution
+        proxy = open_image_for_size(original_image_path, proxy_size)
+        if proxy.size != proxy_size:
+            proxy = proxy.resize(proxy_size, reducing_gap=RESIZE_REDUCING_GAP)
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Session creation failed: {str(e)}'
+        }
+
+    session_id = str(uuid.uuid4())
+    _sessions.put(session_id, {
+        'image_id': image_id,
+        'source_size': source_size,
+        'proxy': proxy
+    }, image_nbytes(proxy))
+
+    return {
+        'success': True,
+        'message': 'Session created successfully',
+        'session_id': session_id,
+        'source_size': list(source_size),
+        'proxy_size': list(proxy_size)
+    }
+
+
+def render_preview(session_id: str, steps: list) -> dict:
+    """
+    Render pipeline steps on the proxy of a session
+    :param session_id: Session ID returned by create_session
+    :param steps: Pipeline steps in source image coordinates; compress steps are ignored
+    :return: Preview details with the base64 encoded proxy rendering
+    """
+    session = _sessions.get(session_id)
+    if session is None:
+        return {
+            'success': False,
+            'message': SESSION_NOT_FOUND_MESSAGE
+        }
+
+    error = validate_pipeline_steps(steps)
+    if error:
+        return {
+            'success': False,
+            'message': error
+        }
+
+    started = time.perf_counter()
+    proxy = session['proxy']
+    scale_x = proxy.width / session['source_size'][0]
+    scale_y = proxy.height / session['source_size'][1]
+
+    try:
+        img = proxy
+        for step in scale_steps(steps, scale_x, scale_y):
+            if step['type'] != 'compress':
+                img = apply_edit_step(img, step)
+
+        # Watermarks add an alpha channel that stays opaque on opaque sources
+        if img.mode == 'RGBA' and proxy.mode not in ('RGBA', 'LA', 'PA') and 'transparency' not in proxy.info:
+            img = img.convert('RGB')
+
+        # Previews without transparency use the faster and smaller JPEG encoder
+        buffer = io.BytesIO()
+        if img.mode in ('RGB', 'L'):
+            preview_format = 'jpeg'
+            save_image(img, buffer, preview_format, INTERACTIVE_ENCODER_TIER, quality=PREVIEW_JPEG_QUALITY)
+        else:
+            preview_format = 'png'
+            save_image(img, buffer, preview_format, INTERACTIVE_ENCODER_TIER)
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Preview failed: {str(e)}'
+        }
+
+    return {
+        'success': True,
+        'message': 'Preview rendered successfully',
+        'image_base64': base64.b64encode(buffer.getvalue()).decode('utf-8'),
+        'image_format': preview_format,
+        'preview_size': list(img.size),
+        'render_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def commit_session(session_id: str, steps: list, encoder_tier: str = None, timeout_ms: int = None) -> dict:
+    """
+    Render pipeline steps at full resolution for the image of a session
+    :param session_id: Session ID returned by create_session
+    :param steps: Pipeline steps in source image coordinates
+    :param encoder_tier: Encoder effort tier, defaults to the tier of the last step's endpoint
+    :param timeout_ms: Maximum runtime in milliseconds, None for no deadline
+    :return: Pipeline result details
+    """
+    session = _sessions.get(session_id)
+    if session is None:
+        return {
+            'success': False,
+            'message': SESSION_NOT_FOUND_MESSAGE
+        }
+
+    return run_pipeline(session['image_id'], steps, encoder_tier, timeout_ms)
+
+
+def close_session(session_id: str) -> dict:
+    """
+    Close an editing session and free its proxy
+    :param session_id: Session ID returned by create_session
+    :return: Close result details
+    """
+    if session_id not in _sessions:
+        return {
+            'success': False,
+            'message': SESSION_NOT_FOUND_MESSAGE
+        }
+
+    _sessions.discard(session_id)
+    return {
+        'success': True,
+        'message': 'Session closed successfully'
+    }
+
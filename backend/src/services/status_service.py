@@ -1,5 +1,7 @@
 import os
 
+from services.job_service import get_image_jobs
+
 def get_image_status(image_id: str) -> dict:
     """
     Get processing status for a specific image.
@@ -19,6 +21,8 @@ def get_image_status(image_id: str) -> dict:
             - original_image_url (str, optional): Path to the original image
             - compressed_image_url (str, optional): Path to the compressed image
             - watermarked_image_url (str, optional): Path to the watermarked image
+            - jobs (list, optional): Recent background jobs with their status
+              ('queued', 'running', 'done' or 'failed') and timings
             - message (str, optional): Error message if image not found
     """
     # Check the original image
@@ -62,5 +66,6 @@ def get_image_status(image_id: str) -> dict:
         'status': status,
         'original_image_url': original_image_url,
         'compressed_image_url': compressed_image_url,
-        'watermarked_image_url': watermarked_image_url
+        'watermarked_image_url': watermarked_image_url,
+        'jobs': get_image_jobs(image_id)
     }
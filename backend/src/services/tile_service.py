@@ -0,0 +1,239 @@
+import io
+import json
+import math
+import os
+import time
+from functools import lru_cache
+
+from PIL import Image
+
+from utils.content_hash import file_content_hash
+from utils.encoder_settings import INTERACTIVE_ENCODER_TIER, save_image
+from utils.image_cache import open_image
+from utils.image_cleanup import record_image_timestamp
+from utils.parallel import run_parallel
+from utils.single_flight import coalesce
+
+TILE_FOLDER = 'tiles'
+
+# Edge length of the square tiles
+TILE_SIZE = 256
+
+# Encoder quality of JPEG tiles
+TILE_JPEG_QUALITY = 85
+
+# Bump when the tile layout changes so old pyramids are rebuilt
+TILE_LAYOUT_VERSION = 1
+
+TILE_MIME_TYPES = {
+    'jpeg': 'image/jpeg',
+    'png': 'image/png'
+}
+
+
+def _index_path(image_id: str) -> str:
+    return os.path.join(TILE_FOLDER, f'{image_id}_tiles.json')
+
+
+def _pack_path(image_id: str, level: int) -> str:
+    return os.path.join(TILE_FOLDER, f'{image_id}_level{level}.pack')
+
+
+@lru_cache(maxsize=64)
+def _read_index(index_path: str, mtime_ns: int) -> dict:
+    # Keyed by modification time, so a rebuilt pyramid is read again
+    with open(index_path, 'r') as f:
+        return json.load(f)
+
+
+def load_tile_index(image_id: str) -> dict:
+    """
+    Load the tile index of an image
+    :param image_id: Unique identifier for the image
+    :return: Tile index, None if the pyramid has not been built
+    """
+    index_path = _index_path(image_id)
+    try:
+        return _read_index(index_path, os.stat(index_path).st_mtime_ns)
+    except (OSError, ValueError):
+        return None
+
+
+def _encode_tile(tile: Image.Image, tile_format: str) -> bytes:
+    buffer = io.BytesIO()
+    options = {'quality': TILE_JPEG_QUALITY} if tile_format == 'jpeg' else {}
+    save_image(tile, buffer, tile_format, INTERACTIVE_ENCODER_TIER, **options)
+    return buffer.getvalue()
+
+
+def _write_level(image_id: str, level: int, img: Image.Image, tile_format: str) -> dict:
+    # Encode the tiles of one level row by row into a single pack file
+    columns = math.ceil(img.width / TILE_SIZE)
+    rows = math.ceil(img.height / TILE_SIZE)
+    tiles = {}
+    pack_path = _pack_path(image_id, level)
+    temp_path = f'{pack_path}.tmp'
+
+    with open(temp_path, 'wb') as pack:
+        for y in range(rows):
+            boxes = [
+                (x * TILE_SIZE, y * TILE_SIZE, min((x + 1) * TILE_SIZE, img.width), min((y + 1) * TILE_SIZE, img.height))
+                for x in range(columns)
+            ]
+            encoded = [None] * columns
+            for x, data in run_parallel(lambda box: _encode_tile(img.crop(box), tile_format), boxes):
+                encoded[x] = data
+
+            for x, data in enumerate(encoded):
+                if not isinstance(data, bytes):
+                    raise RuntimeError(data['message'])
+                tiles[f'{x}_{y}'] = [pack.tell(), len(data)]
+                pack.write(data)
+    os.replace(temp_path, pack_path)
+    record_image_timestamp(pack_path)
+
+    return {
+        'level': level,
+        'width': img.width,
+        'height': img.height,
+        'columns': columns,
+        'rows': rows,
+        'tiles': tiles
+    }
+
+
+def _build_tile_pyramid(image_id: str, original_image_path: str, content_hash: str) -> dict:
+    started = time.perf_counter()
+    img = open_image(original_image_path)
+    if img.mode not in ('RGB', 'RGBA', 'L'):
+        img = img.convert('RGBA')
+    tile_format = 'png' if img.mode == 'RGBA' else 'jpeg'
+
+    # DeepZoom levels: the last one is full resolution, level 0 is a single pixel
+    max_level = math.ceil(math.log2(max(img.size))) if max(img.size) > 1 else 0
+    os.makedirs(TILE_FOLDER, exist_ok=True)
+
+    levels = []
+    for level in range(max_level, -1, -1):
+        levels.append(_write_level(image_id, level, img, tile_format))
+        if level:
+            # Each level is halved from the one above, never from the source
+            img = img.reduce(2)
+    levels.reverse()
+
+    index = {
+        'layout_version': TILE_LAYOUT_VERSION,
+        'content_hash': content_hash,
+        'width': levels[-1]['width'],
+        'height': levels[-1]['height'],
+        'tile_size': TILE_SIZE,
+        'format': tile_format,
+        'max_level': max_level,
+        'levels': levels
+    }
+    index_path = _index_path(image_id)
+    with open(f'{index_path}.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(f'{index_path}.tmp', index_path)
+    record_image_timestamp(index_path)
+
+    return {
+        'success': True,
+        'message': 'Tile pyramid created successfully',
+        'build_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def build_tile_pyramid(image_id: str) -> dict:
+    """
+    Build the DeepZoom tile pyramid of an image, reusing an existing one for the same content
+    :param image_id: Unique identifier for the image
+    :return: Pyramid details (size, tile size, format and level count)
+    """
+    upload_folder = 'uploads'
+    original_image_path = None
+    for filename in os.listdir(upload_folder):
+        if filename.startswith(image_id):
+            original_image_path = os.path.join(upload_folder, filename)
+            break
+
+    if not original_image_path:
+        return {
+            'success': False,
+            'message': 'Image not found'
+        }
+
+    content_hash = file_content_hash(original_image_path)
+    index = load_tile_index(image_id)
+    built = False
+    if index is None or index['content_hash'] != content_hash or index['layout_version'] != TILE_LAYOUT_VERSION:
+        try:
+            result = coalesce(image_id, 'tiles', {'content_hash': content_hash}, lambda: _build_tile_pyramid(
+                image_id, original_image_path, content_hash
+            ))
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Tile pyramid creation failed: {str(e)}'
+            }
+        index = load_tile_index(image_id)
+        built = not result['coalesced']
+
+    return {
+        'success': True,
+        'message': 'Tile pyramid ready',
+        'built': built,
+        'width': index['width'],
+        'height': index['height'],
+        'tile_size': index['tile_size'],
+        'format': index['format'],
+        'max_level': index['max_level']
+    }
+
+
+def get_tile(image_id: str, level: int, x: int, y: int) -> dict:
+    """
+    Read one tile from the pyramid of an image, building the pyramid on first use
+    :param image_id: Unique identifier for the image
+    :param level: Pyramid level, 0 being the smallest
+    :param x: Tile column
+    :param y: Tile row
+    :return: Tile bytes with their MIME type and ETag
+    """
+    index = load_tile_index(image_id)
+    if index is None:
+        result = build_tile_pyramid(image_id)
+        if not result['success']:
+            return result
+        index = load_tile_index(image_id)
+
+    if not 0 <= level <= index['max_level']:
+        return {
+            'success': False,
+            'message': 'Tile not found'
+        }
+
+    entry = index['levels'][level]['tiles'].get(f'{x}_{y}')
+    if entry is None:
+        return {
+            'success': False,
+            'message': 'Tile not found'
+        }
+
+    offset, length = entry
+    try:
+        with open(_pack_path(image_id, level), 'rb') as pack:
+            pack.seek(offset)
+            data = pack.read(length)
+    except OSError:
+        return {
+            'success': False,
+            'message': 'Tile not found'
+        }
+
+    return {
+        'success': True,
+        'data': data,
+        'mimetype': TILE_MIME_TYPES[index['format']],
+        'etag': f"{index['content_hash'][:16]}-{level}-{x}-{y}"
+    }
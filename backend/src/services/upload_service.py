@@ -1,15 +1,24 @@
+import functools
 import uuid
 import os
-from datetime import datetime
 
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
-from utils.image_cleanup import load_image_timestamps, save_image_timestamps
+from services.compress_service import precompute_compression
+from services.preview_service import schedule_preview
+from utils.blob_store import remove_file, store_stream
+from utils.encoder_settings import FINAL_ENCODER_TIER
+from utils.image_cleanup import record_image_timestamp
+from utils.image_metadata import read_image_header, save_image_metadata
+from utils.speculative import SPECULATIVE_PRECOMPUTE, get_speculative_pool
 
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
+# Compressions most uploads are followed by, matching the frontend defaults (format, quality)
+SPECULATIVE_COMPRESSIONS = [('jpeg', 0.8), ('webp', 0.8)]
+
 def allowed_file(filename: str) -> bool:
     """
     Check if the file has an allowed extension
@@ -19,10 +28,29 @@ def allowed_file(filename: str) -> bool:
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def upload_image(file: 'FileStorage') -> dict:
+def schedule_precompute(image_id: str) -> list:
+    """
+    Schedule the likely outputs of an upload on the low-priority speculative pool
+    :param image_id: Unique identifier for the image
+    :return: Names of the scheduled tasks
+    """
+    speculative_pool = get_speculative_pool()
+    names = []
+    for compression_format, compression_quality in SPECULATIVE_COMPRESSIONS:
+        name = f'compress:{compression_format}:{compression_quality}'
+        # The pool passes the cancellation token as the last argument
+        speculative_pool.submit(image_id, name, functools.partial(
+            precompute_compression, image_id, compression_format, compression_quality, FINAL_ENCODER_TIER
+        ))
+        names.append(name)
+    return names
+
+
+def upload_image(file: 'FileStorage', precompute: bool = None) -> dict:
     """
     Upload an image and generate a unique ID
     :param file: File object from request
+    :param precompute: Precompute the likely outputs in the background, defaults to SPECULATIVE_PRECOMPUTE
     :return: Dictionary with an upload result
     """
     # Ensure upload directory exists
@@ -35,22 +63,60 @@ def upload_image(file: 'FileStorage') -> dict:
             'message': 'Invalid file type'
         }
 
+    # Save the content once, hashed while it streams to disk; the upload is a link to it
+    filepath = new_upload_path(file.filename)
+    content_hash, deduplicated = store_stream(file.stream, filepath)
+
+    result = register_upload(filepath, precompute)
+    if not result['success']:
+        return result
+    return dict(result, content_hash=content_hash, deduplicated=deduplicated)
+
+
+def new_upload_path(filename: str) -> str:
+    """
+    Generate a unique path in the upload folder
+    :param filename: Name of the file as sent by the client
+    :return: Path for the uploaded file
+    """
     # Generate unique filename
-    filename = str(uuid.uuid4()) + '.' + secure_filename(file.filename)
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    filename = str(uuid.uuid4()) + '.' + secure_filename(filename)
+    return os.path.join(UPLOAD_FOLDER, filename)
 
-    # Save file
-    file.save(filepath)
+
+def register_upload(filepath: str, precompute: bool = None) -> dict:
+    """
+    Validate a file written to the upload folder and make it available as an image
+    :param filepath: Path of the uploaded file
+    :param precompute: Precompute the likely outputs in the background, defaults to SPECULATIVE_PRECOMPUTE
+    :return: Dictionary with an upload result
+    """
+    # Corrupt files, mislabeled formats and oversized images are rejected from their header alone
+    try:
+        metadata = read_image_header(filepath)
+    except ValueError as e:
+        remove_file(filepath)
+        return {
+            'success': False,
+            'message': str(e)
+        }
 
     # Record upload timestamp
-    timestamps = load_image_timestamps()
-    timestamps[filepath] = str(datetime.now())
-    save_image_timestamps(timestamps)
+    record_image_timestamp(filepath)
+
+    image_id = os.path.basename(filepath).split('_')[0]
+    record_image_timestamp(save_image_metadata(image_id, metadata))
+    schedule_preview(image_id, filepath)
+    if precompute is None:
+        precompute = SPECULATIVE_PRECOMPUTE
+    precomputing = schedule_precompute(image_id) if precompute else []
 
     # Return success response
     return {
         'success': True,
         'message': 'Image uploaded successfully',
-        'image_id': filename.split('_')[0],
-        'original_image_url': filepath
+        'image_id': image_id,
+        'original_image_url': filepath,
+        'metadata': metadata,
+        'precomputing': precomputing
     }
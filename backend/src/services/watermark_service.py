@@ -1,20 +1,134 @@
 import os
 import json
-from datetime import datetime
+from typing import Iterator
+
 from PIL import Image
 
-from utils.image_cleanup import load_image_timestamps, save_image_timestamps
-from utils.watermark_image import watermark_image
+from services.logo_service import find_logo
+from services.preview_service import schedule_preview
+from utils.cancellation import CancellationToken, OperationAbortedError, abort_result, register_operation, release_operation
+from utils.encoder_settings import INTERACTIVE_ENCODER_TIER, is_valid_encoder_tier, save_image
+from utils.image_cache import open_image
+from utils.image_cleanup import record_image_timestamp
+from utils.parallel import run_parallel
+from utils.progress import finish_progress, start_progress, update_progress
+from utils.single_flight import coalesce
+from utils.watermark_image import watermark_image, watermark_logo
+
+def build_watermark_config(data: dict) -> dict:
+    """
+    Build a watermark configuration from request fields
+    :param data: Request data with fontSize, color, rotation, opacity, customPosition, pattern,
+                 logo_id and logoScale
+    :return: Watermark configuration without the missing fields
+    """
+    watermark_config = {
+        'fontSize': data.get('fontSize'),
+        'color': data.get('color'),
+        'rotation': data.get('rotation'),
+        'opacity': data.get('opacity'),
+        'position': data.get('customPosition'),  # 使用 customPosition 來傳遞百分比位置
+        'pattern': data.get('pattern'),  # Repeating pattern settings (spacing, angle, stagger)
+        'logoId': data.get('logo_id'),  # Stamp an uploaded logo instead of text
+        'logoScale': data.get('logoScale')  # Logo width as a fraction of the image width
+    }
+
+    # Remove None values from config
+    return {k: v for k, v in watermark_config.items() if v is not None}
+
+
+def normalize_watermark_config(config: dict = None) -> dict:
+    """
+    Clamp the percentage position of a watermark configuration to the image bounds
+    :param config: Watermark configuration
+    :return: The normalized configuration
+    """
+    if config and 'position' in config and isinstance(config['position'], dict):
+        x = config['position'].get('x', 50)
+        y = config['position'].get('y', 50)
+
+        # Ensure the position is within bounds
+        x = max(0, min(100, x))
+        y = max(0, min(100, y))
+
+        config['position'] = {'x': x, 'y': y}
+
+    return config
+
+
+def apply_watermark(
+    img: Image.Image,
+    watermark_text: str,
+    position: str,
+    config: dict = None,
+    cancel_token: 'CancellationToken' = None
+) -> Image.Image:
+    """
+    Add a text or logo watermark to an in-memory image
+    :param img: Input image
+    :param watermark_text: Text to use as watermark, unused when the config has a logoId
+    :param position: Position of the watermark applied to the image
+    :param config: Watermark configuration
+    :param cancel_token: Optional token checked during the watermark
+    :return: The watermarked image
+    """
+    if config and config.get('logoId'):
+        logo_path = find_logo(config['logoId'])
+        if not logo_path:
+            raise ValueError('Logo not found')
+        return watermark_logo(img, logo_path, position, config, cancel_token)
+
+    return watermark_image(img, watermark_text, position, config, cancel_token)
+
 
-def add_watermark(image_id: str, watermark_text: str, position: str, config: dict = None) -> dict:
+def add_watermark(
+    image_id: str,
+    watermark_text: str,
+    position: str,
+    config: dict = None,
+    encoder_tier: str = INTERACTIVE_ENCODER_TIER,
+    timeout_ms: int = None
+) -> dict:
     """
     Add watermark to an image
     :param image_id: Unique identifier for the image
     :param watermark_text: Text to use as watermark
     :param position: Position of the watermark applied to the image
     :param config: Additional configuration for watermark
+    :param encoder_tier: Encoder effort tier ('fast', 'balanced' or 'smallest')
+    :param timeout_ms: Maximum runtime in milliseconds, None for no deadline
     :return: Watermark result details
     """
+    return coalesce(image_id, 'watermark', {
+        'watermark_text': watermark_text,
+        'position': position,
+        'config': normalize_watermark_config(dict(config or {})),
+        'encoder_tier': encoder_tier,
+        'timeout_ms': timeout_ms
+    }, lambda: _add_watermark(image_id, watermark_text, position, config, encoder_tier, timeout_ms))
+
+
+def _add_watermark(
+    image_id: str,
+    watermark_text: str,
+    position: str,
+    config: dict,
+    encoder_tier: str,
+    timeout_ms: int
+) -> dict:
+    # Add a watermark; identical concurrent calls are coalesced by add_watermark
+    if not is_valid_encoder_tier(encoder_tier):
+        return {
+            'success': False,
+            'message': 'Invalid encoder tier'
+        }
+
+    if config and config.get('logoId') and not find_logo(config['logoId']):
+        return {
+            'success': False,
+            'message': 'Logo not found'
+        }
+
     # Locate the image
     compressed_folder = 'compressed'
     upload_folder = 'uploads'
@@ -47,38 +161,72 @@ def add_watermark(image_id: str, watermark_text: str, position: str, config: dic
     watermarked_filename = f'{image_id}_watermarked.png'
     watermarked_path = os.path.join(watermarked_folder, watermarked_filename)
 
+    # A newer watermark request on the same image cancels this one
+    cancel_token = register_operation(image_id, 'watermark', timeout_ms)
+    start_progress(image_id, 'watermark')
+
     try:
-        # Read the image and add the watermark
-        with Image.open(image_path) as img:
-            # Add watermark with optional configuration
-            if config and 'position' in config and isinstance(config['position'], dict):
-                x = config['position'].get('x', 50)
-                y = config['position'].get('y', 50)
-                
-                # Ensure the position is within bounds
-                x = max(0, min(100, x))
-                y = max(0, min(100, y))
-                
-                config['position'] = {'x': x, 'y': y}
-
-            # Add watermark to the image
-            watermarked = watermark_image(img, watermark_text, position, config)
-            
-            # Save the watermarked image
-            watermarked.save(watermarked_path, 'PNG')
-            
+        # Read the image and add the watermark with optional configuration
+        img = open_image(image_path)
+        watermarked = apply_watermark(img, watermark_text, position, normalize_watermark_config(config), cancel_token)
+
+        # Save the watermarked image
+        cancel_token.check()
+        update_progress(image_id, 'watermark', 1, 2)
+        save_image(watermarked, watermarked_path, 'png', encoder_tier)
+
         # Record watermark timestamp
-        timestamps = load_image_timestamps()
-        timestamps[watermarked_path] = str(datetime.now())
-        save_image_timestamps(timestamps)
+        record_image_timestamp(watermarked_path)
+        schedule_preview(image_id, watermarked_path)
+        finish_progress(image_id, 'watermark', True, 'Watermark added successfully')
 
         return {
             'success': True,
             'message': 'Watermark added successfully',
             'watermarked_image_url': watermarked_path
         }
+    except OperationAbortedError as e:
+        finish_progress(image_id, 'watermark', False, str(e))
+        return abort_result(e, 'Watermark')
     except Exception as e:
+        finish_progress(image_id, 'watermark', False, str(e))
         return {
             'success': False,
             'message': f'Watermark failed: {str(e)}'
-        }
\ No newline at end of file
+        }
+    finally:
+        release_operation(image_id, 'watermark', cancel_token)
+
+def add_watermarks(
+    items: list,
+    config: dict = None,
+    encoder_tier: str = INTERACTIVE_ENCODER_TIER,
+    timeout_ms: int = None
+) -> Iterator[dict]:
+    """
+    Watermark several images with one configuration in parallel on the shared worker pool
+    :param items: Dictionaries with image_id, watermark_text and position
+    :param config: Watermark configuration shared by every image
+    :param encoder_tier: Encoder effort tier ('fast', 'balanced' or 'smallest')
+    :param timeout_ms: Maximum runtime of each watermark in milliseconds
+    :return: Iterator of per-image results in completion order
+    """
+    # The text sprite or logo overlay is rendered by the first image needing it and reused by the rest
+    def watermark_item(item: dict) -> dict:
+        if not item.get('image_id'):
+            return {
+                'success': False,
+                'message': 'Image ID is required'
+            }
+
+        return add_watermark(
+            item['image_id'],
+            item['watermark_text'],
+            item['position'],
+            dict(config or {}),
+            encoder_tier,
+            timeout_ms
+        )
+
+    for index, result in run_parallel(watermark_item, items):
+        yield dict(result, index=index, image_id=items[index].get('image_id'))
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from typing import BinaryIO, Tuple
+
+from utils.content_hash import HASH_CHUNK_SIZE, file_content_hash, remember_content_hash
+from utils.image_cache import invalidate_image_file
+
+BLOB_FOLDER = 'blobs'
+
+# Serializes the reference checks of removals with new links to the same blob
+_blobs_lock = threading.Lock()
+
+
+def _blob_path(content_hash: str) -> str:
+    return os.path.join(BLOB_FOLDER, content_hash)
+
+
+def _add_blob(temp_path: str, content_hash: str, path: str) -> bool:
+    # Publish a hashed temporary file as a blob unless the content is already stored, then link
+    # the path to it; the caller holds _blobs_lock so a removal cannot drop the blob in between
+    blob_path = _blob_path(content_hash)
+    try:
+        os.link(temp_path, blob_path)
+        existed = False
+    except FileExistsError:
+        existed = True
+    except OSError:
+        # Filesystems without hard links: the temporary file is renamed into place instead
+        existed = os.path.exists(blob_path)
+        if not existed:
+            os.replace(temp_path, blob_path)
+    finally:
+        # Blobs are shared by every upload of the same content and are never written in place; they
+        # stay writable because Windows cannot remove a read-only file or its links
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    try:
+        os.link(blob_path, path)
+    except OSError:
+        # Filesystems without hard links get a private copy, which holds no reference
+        shutil.copyfile(blob_path, path)
+    remember_content_hash(path, content_hash)
+    return existed
+
+
+def store_stream(stream: 'BinaryIO', path: str) -> Tuple[str, bool]:
+    """
+    Store a stream once per content, hashing it while it is written, and link a path to it
+    :param stream: Binary stream to read until its end
+    :param path: Path the content is made available at; every such path counts as a reference
+    :return: (SHA-256 hex digest, True if the content was already stored)
+    """
+    os.makedirs(BLOB_FOLDER, exist_ok=True)
+    temp_path = os.path.join(BLOB_FOLDER, f'.{uuid.uuid4().hex}.tmp')
+    digest = hashlib.sha256()
+    with open(temp_path, 'wb') as f:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            f.write(chunk)
+
+    content_hash = digest.hexdigest()
+    with _blobs_lock:
+        existed = _add_blob(temp_path, content_hash, path)
+    return content_hash, existed
+
+
+def store_file(source_path: str, path: str, content_hash: str = None) -> Tuple[str, bool]:
+    """
+    Move a file into the blob store and link a path to it
+    :param source_path: Path of the file, on the same filesystem as the blob store; it is removed
+    :param path: Path the content is made available at; every such path counts as a reference
+    :param content_hash: SHA-256 hex digest of the file when the caller computed it while writing,
+                         None to read the whole file again to hash it
+    :return: (SHA-256 hex digest, True if the content was already stored)
+    """
+    os.makedirs(BLOB_FOLDER, exist_ok=True)
+    if content_hash is None:
+        content_hash = file_content_hash(source_path)
+    with _blobs_lock:
+        existed = _add_blob(source_path, content_hash, path)
+    return content_hash, existed
+
+
+def remove_file(path: str):
+    """
+    Remove a file, and the blob it refers to once no other path refers to it
+    :param path: Path of the file
+    """
+    with _blobs_lock:
+        file_stat = os.stat(path)
+        blob_path = _blob_path(file_content_hash(path)) if file_stat.st_nlink > 1 else None
+        if blob_path and not (os.path.exists(blob_path) and os.path.samefile(path, blob_path)):
+            blob_path = None
+
+        # The blob holds one link itself, so this was the last reference when two links remain
+        last_reference = blob_path is None or file_stat.st_nlink <= 2
+        if last_reference:
+            invalidate_image_file(path)
+        os.remove(path)
+        if blob_path and last_reference:
+            os.remove(blob_path)
+
+
+def blob_store_stats() -> dict:
+    """
+    Get the blob store statistics
+    :return: Dictionary with blob count, references and bytes stored and saved by deduplication
+    """
+    blobs = references = stored_bytes = saved_bytes = 0
+    if os.path.isdir(BLOB_FOLDER):
+        with os.scandir(BLOB_FOLDER) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                entry_stat = entry.stat()
+                blobs += 1
+                references += entry_stat.st_nlink - 1
+                stored_bytes += entry_stat.st_size
+                saved_bytes += entry_stat.st_size * max(0, entry_stat.st_nlink - 2)
+
+    return {
+        'blobs': blobs,
+        'references': references,
+        'stored_bytes': stored_bytes,
+        'saved_bytes': saved_bytes
+    }
@@ -0,0 +1,145 @@
+import threading
+import time
+
+
+class OperationAbortedError(Exception):
+    """
+    Raised when an image operation stops before completion
+    """
+    error = 'aborted'
+
+
+class OperationCancelledError(OperationAbortedError):
+    """
+    Raised when an image operation was cancelled (e.g. superseded by a newer request)
+    """
+    error = 'cancelled'
+
+
+class OperationTimeoutError(OperationAbortedError):
+    """
+    Raised when an image operation ran past its deadline
+    """
+    error = 'timeout'
+
+
+# HTTP status codes returned by the API for aborted operations
+ABORT_STATUS_CODES = {
+    'timeout': 408,
+    'cancelled': 499
+}
+
+
+INVALID_TIMEOUT_MESSAGE = 'Timeout must be a positive number of milliseconds'
+
+
+def is_valid_timeout(timeout_ms) -> bool:
+    """
+    Check a requested operation timeout
+    :param timeout_ms: Timeout from a request, None for no deadline
+    :return: True if the timeout is None or a positive integer
+    """
+    if timeout_ms is None:
+        return True
+    return isinstance(timeout_ms, int) and not isinstance(timeout_ms, bool) and timeout_ms > 0
+
+
+class CancellationToken:
+    def __init__(self, timeout_ms: int = None):
+        """
+        Cooperative cancellation token with an optional deadline
+        :param timeout_ms: Maximum runtime in milliseconds, None for no deadline
+        """
+        self._cancelled = threading.Event()
+        self.deadline = time.monotonic() + timeout_ms / 1000.0 if timeout_ms else None
+
+    def cancel(self):
+        """
+        Request cancellation of the operation holding this token
+        """
+        self._cancelled.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        """
+        Raise if the operation has been cancelled or its deadline has passed
+        """
+        if self._cancelled.is_set():
+            raise OperationCancelledError('Operation was cancelled')
+
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise OperationTimeoutError('Operation timed out')
+
+
+def check_cancelled(cancel_token: 'CancellationToken' = None):
+    """
+    Check a cancellation token if one is given
+    :param cancel_token: Token to check, may be None
+    """
+    if cancel_token is not None:
+        cancel_token.check()
+
+
+# Tokens of the running operations keyed by (image_id, operation)
+_active_tokens = {}
+_active_tokens_lock = threading.Lock()
+
+
+def register_operation(image_id: str, operation: str, timeout_ms: int = None) -> CancellationToken:
+    """
+    Create a token for a new operation, cancelling the older one on the same image
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name (e.g. 'compress', 'watermark')
+    :param timeout_ms: Maximum runtime in milliseconds
+    :return: Cancellation token for the new operation
+    """
+    token = CancellationToken(timeout_ms)
+    with _active_tokens_lock:
+        previous = _active_tokens.get((image_id, operation))
+        if previous is not None:
+            previous.cancel()
+        _active_tokens[(image_id, operation)] = token
+    return token
+
+
+def release_operation(image_id: str, operation: str, token: CancellationToken):
+    """
+    Forget the token of a finished operation
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name
+    :param token: Token returned by register_operation
+    """
+    with _active_tokens_lock:
+        if _active_tokens.get((image_id, operation)) is token:
+            del _active_tokens[(image_id, operation)]
+
+
+def is_operation_registered(image_id: str, operation: str = None) -> bool:
+    """
+    Check whether an operation on an image is running
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name, None for any operation
+    :return: True if a matching token is registered
+    """
+    with _active_tokens_lock:
+        return any(
+            key[0] == image_id and operation in (None, key[1])
+            for key in _active_tokens
+        )
+
+
+def abort_result(error: OperationAbortedError, action: str) -> dict:
+    """
+    Build the service result for an aborted operation
+    :param error: The abort error that was raised
+    :param action: Name of the action used in the message (e.g. 'Compression')
+    :return: Failure result details with the abort reason
+    """
+    return {
+        'success': False,
+        'message': f'{action} aborted: {str(error)}',
+        'error': error.error
+    }
@@ -0,0 +1,46 @@
+import hashlib
+import os
+
+from utils.lru_cache import ByteLRUCache
+
+# Size of the chunks read while hashing a file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Number of file hashes remembered
+MAX_MEMOIZED_HASHES = 1024
+
+# Hashes keyed by file identity (device, inode, modification time, size), each entry counting as one,
+# so hard links to the same content are hashed once
+_file_hashes = ByteLRUCache(MAX_MEMOIZED_HASHES)
+
+
+def _file_key(path: str) -> tuple:
+    stat = os.stat(path)
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def file_content_hash(path: str) -> str:
+    """
+    Get the SHA-256 hash of a file, memoized by file identity, modification time and size
+    :param path: Path of the file
+    :return: Hex digest of the file content
+    """
+    key = _file_key(path)
+    content_hash = _file_hashes.get(key)
+    if content_hash is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        _file_hashes.put(key, content_hash, 1)
+    return content_hash
+
+
+def remember_content_hash(path: str, content_hash: str):
+    """
+    Record the hash of a file computed while it was written, so it is never read back for hashing
+    :param path: Path of the file
+    :param content_hash: Hex digest of the file content
+    """
+    _file_hashes.put(_file_key(path), content_hash, 1)
@@ -0,0 +1,81 @@
+import zlib
+
+from PIL import Image
+
+# Tier used for interactive edits (basic operations, watermark previews)
+INTERACTIVE_ENCODER_TIER = 'fast'
+
+# Tier used for outputs that are meant to be downloaded
+FINAL_ENCODER_TIER = 'smallest'
+
+# Per-format save options for each encoder tier.
+# Pillow does not expose the per-row PNG filter choice, so the zlib strategy
+# (compress_type) is the filter-related knob available for PNG.
+ENCODER_TIERS = {
+    'fast': {
+        'png': {'compress_level': 1, 'compress_type': zlib.Z_RLE},
+        'webp': {'method': 0},
+        'jpeg': {'optimize': False},
+    },
+    'balanced': {
+        'png': {'compress_level': 6, 'compress_type': zlib.Z_FILTERED},
+        'webp': {'method': 4},
+        'jpeg': {'optimize': True},
+    },
+    'smallest': {
+        'png': {'compress_level': 9, 'optimize': True},
+        'webp': {'method': 6},
+        'jpeg': {'optimize': True, 'progressive': True},
+    },
+}
+
+# Aliases for format names accepted by the API
+FORMAT_ALIASES = {
+    'jpg': 'jpeg',
+}
+
+
+def normalize_format(image_format: str) -> str:
+    """
+    Normalize an image format name to the keys used by the encoder tiers
+    :param image_format: Format name (e.g. 'PNG', 'jpg', 'webp')
+    :return: Lower-case canonical format name
+    """
+    image_format = image_format.lower()
+    return FORMAT_ALIASES.get(image_format, image_format)
+
+
+def is_valid_encoder_tier(tier: str) -> bool:
+    """
+    Check if the encoder tier is supported
+    :param tier: Encoder tier name
+    :return: Boolean indicating if the tier is supported
+    """
+    return tier in ENCODER_TIERS
+
+
+def get_encoder_options(image_format: str, tier: str) -> dict:
+    """
+    Get the save options of an encoder tier for the given format
+    :param image_format: Target image format
+    :param tier: Encoder tier name ('fast', 'balanced' or 'smallest')
+    :return: Keyword arguments for Image.save
+    """
+    if not is_valid_encoder_tier(tier):
+        raise ValueError(f"Invalid encoder tier: {tier}")
+
+    return dict(ENCODER_TIERS[tier].get(normalize_format(image_format), {}))
+
+
+def save_image(image: Image.Image, path: str, image_format: str, tier: str, **options) -> None:
+    """
+    Save an image using the encoder settings of a tier
+    :param image: Image to save
+    :param path: Output path
+    :param image_format: Target image format
+    :param tier: Encoder tier name
+    :param options: Extra save options (e.g. quality), override the tier settings
+    """
+    save_options = get_encoder_options(image_format, tier)
+    save_options.update(options)
+    image.save(path, format=normalize_format(image_format).upper(), **save_options)
@@ -0,0 +1,143 @@
+import os
+from typing import Optional
+
+from PIL import Image
+
+from utils.lru_cache import ByteLRUCache
+
+DECODED_IMAGE_CACHE_MAX_BYTES = int(os.environ.get('DECODED_IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Reduced decodes keep at least this many source pixels per output pixel for the final resample
+DRAFT_REDUCING_GAP = 2.0
+
+# Bytes per pixel of the image modes with more or less than one byte per band
+_MODE_PIXEL_BYTES = {
+    '1': 1,
+    'I': 4,
+    'F': 4,
+    'I;16': 2,
+    'RGBX': 4,
+}
+
+# Decoded images keyed by file identity (device, inode, modification time, size), so hard links
+# to the same content share one decode
+_decoded_images = ByteLRUCache(DECODED_IMAGE_CACHE_MAX_BYTES)
+
+
+def image_nbytes(image: Image.Image) -> int:
+    """
+    Estimate the memory used by the pixels of an image
+    :param image: Decoded image
+    :return: Size of the pixel data in bytes
+    """
+    pixel_bytes = _MODE_PIXEL_BYTES.get(image.mode, len(image.getbands()))
+    return image.width * image.height * pixel_bytes
+
+
+def read_only_view(image: Image.Image) -> Image.Image:
+    """
+    Create a view sharing the pixels of a cached image
+    :param image: Cached image that must not be modified
+    :return: Copy-on-write view of the image
+    """
+    # Pillow copies the pixels before any in-place change of a read-only image
+    view = image._new(image.im)
+    view.format = image.format
+    view.readonly = 1
+    return view
+
+
+def _file_key(path: str) -> tuple:
+    stat = os.stat(path)
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def open_image(path: str) -> Image.Image:
+    """
+    Open and decode an image, reusing the decoded pixels of earlier calls
+    :param path: Path of the image file
+    :return: Copy-on-write view of the decoded image
+    """
+    key = _file_key(path)
+
+    image = _decoded_images.get(key)
+    if image is None:
+        with Image.open(path) as image:
+            image.load()
+        _decoded_images.put(key, image, image_nbytes(image))
+
+    return read_only_view(image)
+
+
+def _draft_size(image: Image.Image, target_size: tuple) -> Optional[tuple]:
+    # Size a JPEG is decoded at for a downscale to target_size, None when it is decoded in full
+    draft_size = (int(target_size[0] * DRAFT_REDUCING_GAP), int(target_size[1] * DRAFT_REDUCING_GAP))
+    # Only JPEG supports DCT-domain scaling; other formats are decoded in full
+    if image.format != 'JPEG' or image.width < draft_size[0] * 2 or image.height < draft_size[1] * 2:
+        return None
+    return draft_size
+
+
+def open_image_for_size(path: str, target_size: tuple) -> Image.Image:
+    """
+    Open an image that will be downscaled, decoding JPEGs at a reduced resolution when possible
+    :param path: Path of the image file
+    :param target_size: Final (width, height) the image is resized to
+    :return: Copy-on-write view of the decoded image, at least DRAFT_REDUCING_GAP times target_size
+    """
+    key = _file_key(path)
+
+    # A full decode that is already cached costs nothing to reuse
+    if key in _decoded_images:
+        return open_image(path)
+
+    with Image.open(path) as image:
+        draft_size = _draft_size(image, target_size)
+        if draft_size is None:
+            return open_image(path)
+
+        reduced_key = key + (draft_size,)
+        reduced = _decoded_images.get(reduced_key)
+        if reduced is None:
+            image.draft(image.mode, draft_size)
+            image.load()
+            reduced = image
+            _decoded_images.put(reduced_key, reduced, image_nbytes(reduced))
+
+    return read_only_view(reduced)
+
+
+def peek_decoded_size(path: str, target_size: tuple = None) -> tuple:
+    """
+    Get the size and mode an image is decoded at, reading only its header
+    :param path: Path of the image file
+    :param target_size: Target size passed to open_image_for_size, None for open_image
+    :return: ((width, height), mode) of the image these functions return
+    """
+    with Image.open(path) as image:
+        if target_size is not None and _file_key(path) not in _decoded_images:
+            draft_size = _draft_size(image, target_size)
+            if draft_size is not None:
+                # Without a load, draft() only adjusts the size the decoder will produce
+                image.draft(image.mode, draft_size)
+        return image.size, image.mode
+
+
+def invalidate_image_file(path: str):
+    """
+    Drop every cached decode of an image file, before the file is removed
+    :param path: Path of the image file
+    """
+    try:
+        identity = _file_key(path)[:2]
+    except OSError:
+        return
+    _decoded_images.discard_where(lambda key: key[:2] == identity)
+
+
+def decoded_image_cache_stats() -> dict:
+    """
+    Get the decoded image cache statistics
+    :return: Dictionary with entry count, sizes and hit rate
+    """
+    return _decoded_images.stats()
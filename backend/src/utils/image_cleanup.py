@@ -1,9 +1,15 @@
 import os
 import json
+import threading
 from datetime import datetime, timedelta
 
+from utils.blob_store import remove_file
+
 IMAGE_TIMESTAMPS_FILE = "image_timestamps.json"
 
+# Serializes read-modify-write cycles of the timestamps file between threads
+_timestamps_lock = threading.RLock()
+
 def load_image_timestamps() -> dict:
     if os.path.exists(IMAGE_TIMESTAMPS_FILE):
         with open(IMAGE_TIMESTAMPS_FILE, 'r') as f:
@@ -12,11 +18,30 @@ def load_image_timestamps() -> dict:
 
 
 def save_image_timestamps(timestamps: dict):
-    with open(IMAGE_TIMESTAMPS_FILE, 'w') as f:
+    # Write to a temporary file first so concurrent readers never see a partial file
+    temp_file = f'{IMAGE_TIMESTAMPS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_file, 'w') as f:
         json.dump(timestamps, f, indent=4)
+    os.replace(temp_file, IMAGE_TIMESTAMPS_FILE)
+
+
+def record_image_timestamp(filepath: str):
+    """
+    Record the current time for a written image so the cleanup task can expire it
+    :param filepath: Path of the image
+    """
+    with _timestamps_lock:
+        timestamps = load_image_timestamps()
+        timestamps[filepath] = str(datetime.now())
+        save_image_timestamps(timestamps)
 
 
 def cleanup_images(deletion_interval_seconds: int):
+    with _timestamps_lock:
+        _cleanup_images(deletion_interval_seconds)
+
+
+def _cleanup_images(deletion_interval_seconds: int):
     timestamps = load_image_timestamps()
     now = datetime.now()
     images_to_delete = []
@@ -33,7 +58,7 @@ def cleanup_images(deletion_interval_seconds: int):
     for filepath in images_to_delete:
         try:
             if os.path.exists(filepath):
-                os.remove(filepath)
+                remove_file(filepath)
                 print(f"Deleted image: {filepath}")
         except Exception as e:
             print(f"Error deleting image {filepath}: {e}")
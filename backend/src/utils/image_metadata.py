@@ -0,0 +1,119 @@
+import json
+import os
+import warnings
+from functools import lru_cache
+
+from PIL import Image, UnidentifiedImageError
+
+from utils.image_cache import image_nbytes
+
+METADATA_FOLDER = 'metadata'
+
+# Largest accepted image, in pixels per frame
+MAX_UPLOAD_PIXELS = int(os.environ.get('MAX_UPLOAD_PIXELS', 100_000_000))
+
+# Largest accepted decoded size of one frame, in bytes
+MAX_UPLOAD_DECODED_BYTES = int(os.environ.get('MAX_UPLOAD_DECODED_BYTES', 512 * 1024 * 1024))
+
+# Formats detected from the file content, matching the allowed upload extensions
+ALLOWED_IMAGE_FORMATS = {'PNG', 'JPEG', 'GIF', 'WEBP'}
+
+# EXIF tag holding the orientation of the camera
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+def _exif_orientation(img: Image.Image) -> int:
+    # Read from the EXIF block the plugin already parsed; getexif() decodes a PNG without one
+    exif = Image.Exif()
+    if img.info.get('exif'):
+        exif.load(img.info['exif'])
+    return exif.get(EXIF_ORIENTATION_TAG, 1)
+
+
+def _header_metadata(img: Image.Image, path: str) -> dict:
+    # Everything here comes from the header of a lazily opened image; no pixels are decoded
+    return {
+        'format': img.format,
+        'width': img.width,
+        'height': img.height,
+        'mode': img.mode,
+        'frames': getattr(img, 'n_frames', 1),
+        'orientation': _exif_orientation(img),
+        'file_bytes': os.path.getsize(path),
+        'decoded_bytes': image_nbytes(img)
+    }
+
+
+def read_image_header(path: str) -> dict:
+    """
+    Identify an image and check it against the pixel and memory budgets without decoding its pixels
+    :param path: Path of the image file
+    :return: Metadata with format, width, height, mode, frame count, EXIF orientation and sizes
+    :raises ValueError: If the file is not a supported image or exceeds a budget
+    """
+    try:
+        with warnings.catch_warnings():
+            # Our own budgets decide; Pillow's bomb check only stops absurd headers early
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(path) as img:
+                # The format comes from the magic bytes, not from the file extension
+                if img.format not in ALLOWED_IMAGE_FORMATS:
+                    raise ValueError('Unsupported image format')
+
+                # The budgets are checked before anything else reads the file
+                if img.width * img.height > MAX_UPLOAD_PIXELS:
+                    raise ValueError('Image exceeds the pixel limit')
+                if image_nbytes(img) > MAX_UPLOAD_DECODED_BYTES:
+                    raise ValueError('Image exceeds the memory limit')
+
+                return _header_metadata(img, path)
+    except Image.DecompressionBombError:
+        raise ValueError('Image exceeds the pixel limit')
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise ValueError('Invalid or corrupt image file')
+
+
+def _metadata_path(image_id: str) -> str:
+    return os.path.join(METADATA_FOLDER, f'{image_id}.json')
+
+
+@lru_cache(maxsize=1024)
+def _read_metadata(metadata_path: str, mtime_ns: int) -> dict:
+    # Keyed by modification time, so a rewritten record is read again
+    with open(metadata_path, 'r') as f:
+        return json.load(f)
+
+
+def save_image_metadata(image_id: str, metadata: dict) -> str:
+    """
+    Persist the metadata record of an uploaded image
+    :param image_id: Unique identifier for the image
+    :param metadata: Metadata returned by read_image_header
+    :return: Path of the record
+    """
+    os.makedirs(METADATA_FOLDER, exist_ok=True)
+    metadata_path = _metadata_path(image_id)
+    with open(f'{metadata_path}.tmp', 'w') as f:
+        json.dump(metadata, f)
+    os.replace(f'{metadata_path}.tmp', metadata_path)
+    return metadata_path
+
+
+def get_image_metadata(image_id: str, image_path: str) -> dict:
+    """
+    Get the metadata of an uploaded image from its record, creating the record if it is missing
+    :param image_id: Unique identifier for the image
+    :param image_path: Path of the uploaded image, read only when there is no record
+    :return: Metadata with format, width, height, mode, frame count, EXIF orientation and sizes
+    """
+    metadata_path = _metadata_path(image_id)
+    try:
+        return dict(_read_metadata(metadata_path, os.stat(metadata_path).st_mtime_ns))
+    except (OSError, ValueError):
+        pass
+
+    # Images uploaded before records were kept are not held to the upload budgets
+    with Image.open(image_path) as img:
+        metadata = _header_metadata(img, image_path)
+    save_image_metadata(image_id, metadata)
+    return metadata
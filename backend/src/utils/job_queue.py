@@ -0,0 +1,302 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+JOB_QUEUE_DATABASE = 'jobs.db'
+
+# Seconds between two heartbeats of a running job
+HEARTBEAT_INTERVAL = 5
+
+# Running jobs without a heartbeat for this long belong to a crashed worker
+STALE_JOB_TIMEOUT = 30
+
+# Number of times a job is requeued after a crash before it is marked as failed
+MAX_JOB_ATTEMPTS = 3
+
+# Seconds a worker waits for new jobs before polling the database again
+POLL_INTERVAL = 1.0
+
+# Seconds a done or failed job is kept before it is deleted
+FINISHED_JOB_RETENTION = int(os.environ.get('FINISHED_JOB_RETENTION', 3600))
+
+# Seconds between two deletions of old finished jobs
+JOB_PRUNE_INTERVAL = 10 * STALE_JOB_TIMEOUT
+
+
+class JobQueue:
+    def __init__(
+        self,
+        handlers: Dict[str, Callable[..., dict]],
+        database: str = JOB_QUEUE_DATABASE,
+        workers: int = 2
+    ):
+        """
+        Persistent SQLite-backed job queue executed by a local pool of worker threads
+        :param handlers: Functions called as handler(image_id, **params) for each operation
+        :param database: Path of the SQLite database file
+        :param workers: Number of worker threads
+        """
+        self.handlers = handlers
+        self.database = database
+        self.workers = workers
+        self.worker_prefix = f'{socket.gethostname()}:{os.getpid()}'
+        self._running_jobs = set()
+        self._running_jobs_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+        self._init_database()
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.database, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def _init_database(self):
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    image_id TEXT NOT NULL,
+                    operation TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL
+                )
+            ''')
+            connection.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)')
+            connection.execute('CREATE INDEX IF NOT EXISTS jobs_image ON jobs (image_id, created_at)')
+            connection.execute('CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, finished_at)')
+
+    def start(self):
+        """
+        Requeue the jobs of crashed workers and start the worker threads
+        """
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+
+        self.requeue_stale_jobs()
+
+        for index in range(self.workers):
+            threading.Thread(target=self._run_worker, args=(f'{self.worker_prefix}:{index}',), daemon=True).start()
+        threading.Thread(target=self._run_heartbeat, daemon=True).start()
+
+    def enqueue(self, image_id: str, operation: str, params: dict) -> str:
+        """
+        Add a job to the queue
+        :param image_id: Unique identifier for the image
+        :param operation: Operation name, must be one of the handlers
+        :param params: JSON-serializable keyword arguments of the handler
+        :return: Job ID
+        """
+        if operation not in self.handlers:
+            raise ValueError(f'Unknown operation: {operation}')
+
+        job_id = str(uuid.uuid4())
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT INTO jobs (job_id, image_id, operation, params, status, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, image_id, operation, json.dumps(params), 'queued', time.time())
+            )
+
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def requeue_stale_jobs(self) -> int:
+        """
+        Put the running jobs of crashed workers back in the queue
+        :return: Number of requeued jobs
+        """
+        stale_before = time.time() - STALE_JOB_TIMEOUT
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, result = ? "
+                "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (time.time(), json.dumps({'success': False, 'message': 'Worker crashed too many times'}),
+                 stale_before, MAX_JOB_ATTEMPTS)
+            )
+            cursor = connection.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL "
+                "WHERE status = 'running' AND heartbeat_at < ?",
+                (stale_before,)
+            )
+            return cursor.rowcount
+
+    def prune_finished_jobs(self, max_age_seconds: float = FINISHED_JOB_RETENTION) -> int:
+        """
+        Delete the jobs that finished a while ago
+        :param max_age_seconds: Age after which a done or failed job is deleted
+        :return: Number of deleted jobs
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - max_age_seconds,)
+            )
+            return cursor.rowcount
+
+    def _claim_job(self, worker: str) -> Optional[sqlite3.Row]:
+        now = time.time()
+        with self._connect() as connection:
+            # Select and mark the job in one write transaction so no other worker claims it
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                job = connection.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if job is not None:
+                    connection.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                        "started_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                        (worker, now, now, job['job_id'])
+                    )
+                connection.execute('COMMIT')
+            except sqlite3.Error:
+                connection.execute('ROLLBACK')
+                raise
+            return job
+
+    def _finish_job(self, job_id: str, result: dict):
+        status = 'done' if result.get('success') else 'failed'
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE job_id = ?',
+                (status, json.dumps(result), time.time(), job_id)
+            )
+
+    def _run_worker(self, worker: str):
+        while True:
+            try:
+                job = self._claim_job(worker)
+            except sqlite3.Error:
+                traceback.print_exc()
+                job = None
+
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(POLL_INTERVAL)
+                continue
+
+            with self._running_jobs_lock:
+                self._running_jobs.add(job['job_id'])
+            try:
+                handler = self.handlers[job['operation']]
+                result = handler(job['image_id'], **json.loads(job['params']))
+            except Exception as e:
+                result = {
+                    'success': False,
+                    'message': f'Job failed: {str(e)}'
+                }
+            finally:
+                with self._running_jobs_lock:
+                    self._running_jobs.discard(job['job_id'])
+
+            try:
+                self._finish_job(job['job_id'], result)
+            except sqlite3.Error:
+                # The heartbeat stops, so the job is requeued as if the worker crashed
+                traceback.print_exc()
+
+    def _run_heartbeat(self):
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            with self._running_jobs_lock:
+                job_ids = list(self._running_jobs)
+            try:
+                with self._connect() as connection:
+                    connection.executemany(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = 'running'",
+                        [(time.time(), job_id) for job_id in job_ids]
+                    )
+                self.requeue_stale_jobs()
+            except sqlite3.Error:
+                traceback.print_exc()
+
+    @staticmethod
+    def _describe(job: sqlite3.Row) -> dict:
+        def elapsed_ms(start, end):
+            return round((end - start) * 1000, 1)
+
+        now = time.time()
+        if job['started_at'] is not None:
+            queued_ms = elapsed_ms(job['created_at'], job['started_at'])
+            run_ms = elapsed_ms(job['started_at'], job['finished_at'] or now)
+        else:
+            queued_ms = elapsed_ms(job['created_at'], job['finished_at'] or now)
+            run_ms = None
+
+        return {
+            'job_id': job['job_id'],
+            'image_id': job['image_id'],
+            'operation': job['operation'],
+            'status': job['status'],
+            'attempts': job['attempts'],
+            'result': json.loads(job['result']) if job['result'] else None,
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at'],
+            'queued_ms': queued_ms,
+            'run_ms': run_ms
+        }
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """
+        Get the state and timings of a job
+        :param job_id: Job ID
+        :return: Job details, None if the job does not exist
+        """
+        with self._connect() as connection:
+            job = connection.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._describe(job) if job else None
+
+    def get_jobs_for_image(self, image_id: str, limit: int = 10) -> List[dict]:
+        """
+        Get the most recent jobs of an image
+        :param image_id: Unique identifier for the image
+        :param limit: Maximum number of jobs to return
+        :return: Job details, newest first
+        """
+        with self._connect() as connection:
+            jobs = connection.execute(
+                'SELECT * FROM jobs WHERE image_id = ? ORDER BY created_at DESC LIMIT ?',
+                (image_id, limit)
+            ).fetchall()
+        return [self._describe(job) for job in jobs]
+
+    def has_pending_jobs(self, image_id: str, operation: str = None) -> bool:
+        """
+        Check whether an image has queued or running jobs
+        :param image_id: Unique identifier for the image
+        :param operation: Operation name, None for any operation
+        :return: True if a matching job has not finished yet
+        """
+        with self._connect() as connection:
+            job = connection.execute(
+                "SELECT 1 FROM jobs WHERE image_id = ? AND status IN ('queued', 'running') "
+                'AND (? IS NULL OR operation = ?) LIMIT 1',
+                (image_id, operation, operation)
+            ).fetchone()
+        return job is not None
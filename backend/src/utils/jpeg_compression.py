@@ -1,11 +1,13 @@
 import math
+from typing import Callable
 
 import numpy as np
 from PIL import Image
 from scipy import fftpack
-from tqdm import tqdm
 
+from utils.cancellation import CancellationToken, check_cancelled
 from utils.image_validation import validate_compression_input
+from utils.progress import ProgressReporter
 
 USE_MANUAL_DCT = False
 
@@ -62,13 +64,16 @@ class JPEGCompressor:
     @staticmethod
     def blockwise_dct(block: np.ndarray) -> np.ndarray:
         """
-        Apply DCT to a single block
-        :param block: Input block
+        Apply DCT to a single block or a stack of blocks
+        :param block: Input block (8x8) or stack of blocks (Nx8x8)
         :return: DCT transformed block
         """
         # Well, the manual DCT implementation will cost you a lot of time, try it out when you have time
         if not USE_MANUAL_DCT:
-            return fftpack.dctn(block, type=2, norm='ortho')
+            return fftpack.dctn(block, type=2, norm='ortho', axes=(-2, -1))
+
+        if block.ndim > 2:
+            return np.stack([JPEGCompressor.blockwise_dct(single_block) for single_block in block])
 
         # Manual DCT implementation
         n = 8
@@ -96,11 +101,11 @@ class JPEGCompressor:
     @staticmethod
     def blockwise_idct(block: np.ndarray) -> np.ndarray:
         """
-        Apply inverse DCT to a single block
-        :param block: Input DCT block
+        Apply inverse DCT to a single block or a stack of blocks
+        :param block: Input DCT block (8x8) or stack of blocks (Nx8x8)
         :return: Inversed DCT block
         """
-        return fftpack.idctn(block, type=2, norm='ortho')
+        return fftpack.idctn(block, type=2, norm='ortho', axes=(-2, -1))
 
     @staticmethod
     def quantize_block(block: np.ndarray, quality: int) -> np.ndarray:
@@ -129,11 +134,18 @@ class JPEGCompressor:
         return block * quant_matrix
 
     @staticmethod
-    def get_compress_image(image: Image.Image, quality: int = 85) -> Image.Image:
+    def get_compress_image(
+        image: Image.Image,
+        quality: int = 85,
+        cancel_token: 'CancellationToken' = None,
+        progress_callback: Callable[[int, int], None] = None
+    ) -> Image.Image:
         """
         Manually compress an image using JPEG-like compression
         :param image: Input image
         :param quality: Compression quality (1-100), defaults to 85
+        :param cancel_token: Optional token checked between block rows
+        :param progress_callback: Optional function called with (block rows done, total block rows)
         :return: Compressed image
         """
         # Validate input
@@ -147,34 +159,30 @@ class JPEGCompressor:
         padded_w = (w + 7) // 8 * 8
         padded_img = np.pad(ycbcr_img, ((0, padded_h - h), (0, padded_w - w), (0, 0)), mode='constant')
 
-        # Split image into 8x8 blocks and for each channel
+        # Process each channel one row of 8x8 blocks at a time
+        progress = ProgressReporter(progress_callback, 3 * padded_h // 8)
         channels = []
-        for c in tqdm(range(3), desc="Compressing", leave=False):
-            # Extract 8x8 blocks
-            blocks = [
-                padded_img[i:i + 8, j:j + 8, c]
-                for i in range(0, padded_img.shape[0], 8)
-                for j in range(0, padded_img.shape[1], 8)
-            ]
-
-            # Apply DCT
-            quantized_blocks = [
-                JPEGCompressor.quantize_block(JPEGCompressor.blockwise_dct(block), quality)
-                for block in blocks
-            ]
-
-            # Apply inverse DCT
-            reconstructed_blocks = [
-                JPEGCompressor.blockwise_idct(JPEGCompressor.dequantize_block(block, quality))
-                for block in quantized_blocks
-            ]
-
-            # Reconstruct channel
-            reconstructed_channel = np.zeros_like(padded_img[:, :, 0])
-            for idx, block in enumerate(reconstructed_blocks):
-                i = (idx // (padded_w // 8)) * 8
-                j = (idx % (padded_w // 8)) * 8
-                reconstructed_channel[i:i + 8, j:j + 8] = block
+        for c in range(3):
+            channel = padded_img[:, :, c]
+            reconstructed_channel = np.zeros_like(channel)
+
+            for i in range(0, padded_h, 8):
+                check_cancelled(cancel_token)
+
+                # Extract the 8x8 blocks of this row as a (blocks, 8, 8) stack
+                blocks = channel[i:i + 8].reshape(8, padded_w // 8, 8).transpose(1, 0, 2)
+
+                # Apply DCT
+                quantized_blocks = JPEGCompressor.quantize_block(JPEGCompressor.blockwise_dct(blocks), quality)
+
+                # Apply inverse DCT
+                reconstructed_blocks = JPEGCompressor.blockwise_idct(
+                    JPEGCompressor.dequantize_block(quantized_blocks, quality)
+                )
+
+                # Reconstruct the block row
+                reconstructed_channel[i:i + 8] = reconstructed_blocks.transpose(1, 0, 2).reshape(8, padded_w)
+                progress.advance()
             channels.append(reconstructed_channel)
 
         # Remove padding
@@ -186,14 +194,21 @@ class JPEGCompressor:
 
 
 # Export function to match the expected interface
-def jpeg_compression(image: Image.Image, quality: int = 85) -> Image.Image:
+def jpeg_compression(
+    image: Image.Image,
+    quality: int = 85,
+    cancel_token: 'CancellationToken' = None,
+    progress_callback: Callable[[int, int], None] = None
+) -> Image.Image:
     """
     Wrapper for JPEG compression
     :param image: Input image
     :param quality: Compression quality, defaults to 85
+    :param cancel_token: Optional token checked between block rows
+    :param progress_callback: Optional function called with (block rows done, total block rows)
     :return: Compressed image
     """
-    return JPEGCompressor.get_compress_image(image, quality)
+    return JPEGCompressor.get_compress_image(image, quality, cancel_token, progress_callback)
 
 
 if __name__ == '__main__':
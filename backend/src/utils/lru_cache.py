@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class ByteLRUCache:
+    def __init__(self, max_bytes: int):
+        """
+        Thread-safe LRU cache bounded by the total size of its values
+        :param max_bytes: Maximum total size of the cached values
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value, marking it as recently used
+        :param key: Cache key
+        :param default: Value returned on a miss
+        :return: The cached value or the default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: Hashable, value: Any, size: int):
+        """
+        Cache a value, evicting the least recently used values beyond the size bound
+        :param key: Cache key
+        :param value: Value to cache
+        :param size: Size of the value in bytes
+        """
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def discard(self, key: Hashable):
+        """
+        Remove a value from the cache if present
+        :param key: Cache key
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[1]
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]):
+        """
+        Remove every value whose key matches a predicate
+        :param predicate: Function returning True for the keys to remove
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self.total_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """
+        Remove every value from the cache
+        """
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Get the cache statistics
+        :return: Dictionary with entry count, sizes and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
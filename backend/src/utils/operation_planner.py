@@ -0,0 +1,276 @@
+import math
+from typing import Callable, List, Optional
+
+from PIL import Image
+
+from utils.cancellation import CancellationToken, check_cancelled
+
+# This is for working with the PIL library older
+Transpose = getattr(Image, 'Transpose', Image)
+Transform = getattr(Image, 'Transform', Image)
+Resampling = getattr(Image, 'Resampling', Image)
+
+# Large downscales first shrink by an integer factor, keeping this many source pixels per output pixel
+RESIZE_REDUCING_GAP = 3.0
+
+# A resize is merged into an affine transform only while it scales by at most this factor either
+# way; a single bicubic transform aliases on larger downscales, which need the reducing resize, and
+# blurs larger upscales less evenly than resize()
+MAX_AFFINE_SCALE = 1.25
+
+# Modes whose geometric operations commute with a grayscale conversion
+GRAYSCALE_REORDER_MODES = ('L', 'RGB')
+
+# Modes resampled with a real filter by both resize() and transform()
+AFFINE_MODES = ('L', 'RGB', 'RGBA')
+
+# Filter of merged resize and rotate transforms, the one resize() uses by default
+AFFINE_RESAMPLE = Resampling.BICUBIC
+
+# Transposes as matrices mapping centered input coordinates to centered output coordinates
+_TRANSPOSE_MATRICES = {
+    'FLIP_LEFT_RIGHT': (-1, 0, 0, 1),
+    'FLIP_TOP_BOTTOM': (1, 0, 0, -1),
+    'ROTATE_90': (0, 1, -1, 0),
+    'ROTATE_180': (-1, 0, 0, -1),
+    'ROTATE_270': (0, -1, 1, 0),
+    'TRANSPOSE': (0, 1, 1, 0),
+    'TRANSVERSE': (0, -1, -1, 0),
+}
+_IDENTITY = (1, 0, 0, 1)
+
+
+def _normalize_operation(operation: str, params: dict, size: tuple) -> Optional[dict]:
+    # Turn a requested operation into a plan step, None for the ones apply_operations ignored
+    if operation == 'resize':
+        width = params.get('width')
+        height = params.get('height')
+        if width and height:
+            return {'op': 'resize', 'size': [int(width), int(height)], 'box': None}
+    elif operation == 'rotate':
+        angle = params.get('angle')
+        if angle:
+            return _rotation_step(int(angle), size)
+    elif operation == 'crop':
+        box = [params.get(key) for key in ('left', 'top', 'right', 'bottom')]
+        if all(box):
+            return {'op': 'crop', 'box': [int(value) for value in box]}
+    elif operation == 'flip':
+        direction = params.get('direction')
+        if direction == 'horizontal':
+            return {'op': 'transpose', 'method': 'FLIP_LEFT_RIGHT'}
+        elif direction == 'vertical':
+            return {'op': 'transpose', 'method': 'FLIP_TOP_BOTTOM'}
+    elif operation == 'grayscale':
+        return {'op': 'grayscale'}
+    return None
+
+
+def _rotation_step(angle: int, size: tuple) -> Optional[dict]:
+    # Image.rotate() without expand turns these angles into a lossless transpose
+    angle %= 360
+    if angle == 0:
+        return None
+    if angle == 180:
+        return {'op': 'transpose', 'method': 'ROTATE_180'}
+    if angle in (90, 270) and size[0] == size[1]:
+        return {'op': 'transpose', 'method': f'ROTATE_{angle}'}
+    return {'op': 'rotate', 'angle': angle}
+
+
+def _output_size(step: dict, size: tuple) -> tuple:
+    if step['op'] in ('resize', 'affine'):
+        return tuple(step['size'])
+    if step['op'] == 'crop':
+        left, top, right, bottom = step['box']
+        return right - left, bottom - top
+    if step['op'] == 'transpose' and _TRANSPOSE_MATRICES[step['method']][0] == 0:
+        return size[1], size[0]
+    return size
+
+
+def _compose_transposes(first: str, second: str) -> Optional[str]:
+    a, b, c, d = _TRANSPOSE_MATRICES[first]
+    e, f, g, h = _TRANSPOSE_MATRICES[second]
+    matrix = (e * a + f * c, e * b + f * d, g * a + h * c, g * b + h * d)
+    if matrix == _IDENTITY:
+        return None
+    return next(method for method, value in _TRANSPOSE_MATRICES.items() if value == matrix)
+
+
+def _crop_before_transpose(box: list, method: str, size: tuple) -> list:
+    # Map the crop box of the transposed image back onto the image before the transpose
+    a, b, c, d = _TRANSPOSE_MATRICES[method]
+    out_width, out_height = _output_size({'op': 'transpose', 'method': method}, size)
+    corners = []
+    for x, y in ((box[0], box[1]), (box[2], box[3])):
+        x, y = x - out_width / 2, y - out_height / 2
+        # The matrices are orthogonal, so the inverse is the transpose
+        corners.append((a * x + c * y + size[0] / 2, b * x + d * y + size[1] / 2))
+    xs, ys = [x for x, _ in corners], [y for _, y in corners]
+    return [int(round(min(xs))), int(round(min(ys))), int(round(max(xs))), int(round(max(ys)))]
+
+
+def _resize_scale(step: dict, size: tuple) -> tuple:
+    left, top, right, bottom = step['box'] or (0, 0, size[0], size[1])
+    return left, top, (right - left) / step['size'][0], (bottom - top) / step['size'][1]
+
+
+def _rotation_matrix(angle: int, size: tuple) -> list:
+    # Same inverse mapping as Image.rotate() without expand
+    center_x, center_y = size[0] / 2.0, size[1] / 2.0
+    radians = -math.radians(angle)
+    a, b = round(math.cos(radians), 15), round(math.sin(radians), 15)
+    d, e = round(-math.sin(radians), 15), round(math.cos(radians), 15)
+    return [a, b, a * -center_x + b * -center_y + center_x, d, e, d * -center_x + e * -center_y + center_y]
+
+
+def _merge_resize_crop(resize: dict, crop: dict, size: tuple) -> Optional[dict]:
+    # Resample only the source region the crop keeps
+    width, height = resize['size']
+    left, top, right, bottom = crop['box']
+    if not (0 <= left < right <= width and 0 <= top < bottom <= height):
+        return None
+
+    box_left, box_top, scale_x, scale_y = _resize_scale(resize, size)
+    return {
+        'op': 'resize',
+        'size': [right - left, bottom - top],
+        'box': [box_left + left * scale_x, box_top + top * scale_y,
+                box_left + right * scale_x, box_top + bottom * scale_y]
+    }
+
+
+def _merge_resize_rotate(first: dict, second: dict, size: tuple) -> Optional[dict]:
+    if first['op'] == 'resize':
+        resize, rotate = first, second
+        box_left, box_top, scale_x, scale_y = _resize_scale(resize, size)
+        a, b, c, d, e, f = _rotation_matrix(rotate['angle'], resize['size'])
+        matrix = [scale_x * a, scale_x * b, scale_x * c + box_left, scale_y * d, scale_y * e, scale_y * f + box_top]
+    else:
+        rotate, resize = first, second
+        box_left, box_top, scale_x, scale_y = _resize_scale(resize, size)
+        a, b, c, d, e, f = _rotation_matrix(rotate['angle'], size)
+        matrix = [a * scale_x, b * scale_y, a * box_left + b * box_top + c,
+                  d * scale_x, e * scale_y, d * box_left + e * box_top + f]
+
+    if not all(1 / MAX_AFFINE_SCALE <= scale <= MAX_AFFINE_SCALE for scale in (scale_x, scale_y)):
+        return None
+    return {'op': 'affine', 'size': list(resize['size']), 'matrix': matrix}
+
+
+def _rewrite_pair(first: dict, second: dict, size: tuple, mode: str) -> Optional[list]:
+    # Return the steps replacing an adjacent pair, None if the pair stays as is
+    kinds = (first['op'], second['op'])
+
+    if kinds == ('transpose', 'transpose'):
+        method = _compose_transposes(first['method'], second['method'])
+        return [{'op': 'transpose', 'method': method}] if method else []
+
+    if kinds == ('transpose', 'crop'):
+        return [{'op': 'crop', 'box': _crop_before_transpose(second['box'], first['method'], size)}, first]
+
+    if kinds == ('grayscale', 'crop'):
+        return [second, first]
+
+    if kinds == ('resize', 'crop'):
+        merged = _merge_resize_crop(first, second, size)
+        return [merged] if merged else None
+
+    if second['op'] == 'grayscale' and first['op'] != 'crop' and mode in GRAYSCALE_REORDER_MODES:
+        return [second, first]
+
+    # A resize with a box has absorbed a crop; the transform would read the source beyond the
+    # crop where the rotation leaves black corners
+    if kinds == ('resize', 'rotate') and first['box']:
+        return None
+
+    if kinds in (('resize', 'rotate'), ('rotate', 'resize')) and mode in AFFINE_MODES:
+        merged = _merge_resize_rotate(first, second, size)
+        return [merged] if merged else None
+
+    return None
+
+
+def plan_operations(operations: dict, size: tuple, mode: str) -> List[dict]:
+    """
+    Compile basic operations into the shortest equivalent list of full-frame passes
+    :param operations: Dictionary of operations with their parameters, applied in order
+    :param size: (width, height) of the input image
+    :param mode: Mode of the input image
+    :return: JSON-serializable plan steps for execute_plan
+    """
+    steps = []
+    step_size = size
+    for operation, params in operations.items():
+        step = _normalize_operation(operation, params, step_size)
+        if step is not None:
+            steps.append(step)
+            step_size = _output_size(step, step_size)
+
+    changed = True
+    while changed:
+        changed = False
+        step_size, step_mode = size, mode
+        for index in range(len(steps) - 1):
+            replacement = _rewrite_pair(steps[index], steps[index + 1], step_size, step_mode)
+            if replacement is not None:
+                steps[index:index + 2] = replacement
+                changed = True
+                break
+            step_size = _output_size(steps[index], step_size)
+            if steps[index]['op'] == 'grayscale':
+                step_mode = 'L'
+
+    return steps
+
+
+def get_plan_output(plan: List[dict], size: tuple, mode: str) -> tuple:
+    """
+    Get the size and mode of the image a plan produces
+    :param plan: Steps returned by plan_operations
+    :param size: (width, height) of the input image
+    :param mode: Mode of the input image
+    :return: ((width, height), mode) of the resulting image
+    """
+    for step in plan:
+        size = _output_size(step, size)
+        if step['op'] == 'grayscale':
+            mode = 'L'
+    return tuple(size), mode
+
+
+def execute_plan(
+    img: Image.Image,
+    plan: List[dict],
+    cancel_token: 'CancellationToken' = None,
+    progress_callback: Callable[[int, int], None] = None
+) -> Image.Image:
+    """
+    Run the steps of an operation plan on an in-memory image
+    :param img: Input image
+    :param plan: Steps returned by plan_operations
+    :param cancel_token: Optional token checked between steps
+    :param progress_callback: Optional function called with (steps done, total steps)
+    :return: Resulting image
+    """
+    for index, step in enumerate(plan):
+        check_cancelled(cancel_token)
+        if progress_callback is not None:
+            progress_callback(index, len(plan))
+
+        if step['op'] == 'resize':
+            box = tuple(step['box']) if step['box'] else None
+            img = img.resize(tuple(step['size']), box=box, reducing_gap=RESIZE_REDUCING_GAP)
+        elif step['op'] == 'rotate':
+            img = img.rotate(step['angle'])
+        elif step['op'] == 'affine':
+            img = img.transform(tuple(step['size']), Transform.AFFINE, step['matrix'], resample=AFFINE_RESAMPLE)
+        elif step['op'] == 'crop':
+            img = img.crop(tuple(step['box']))
+        elif step['op'] == 'transpose':
+            img = img.transpose(getattr(Transpose, step['method']))
+        elif step['op'] == 'grayscale':
+            img = img.convert('L')
+
+    return img
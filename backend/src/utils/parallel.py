@@ -0,0 +1,42 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterator, Sequence, Tuple
+
+# Number of threads shared by all parallel image work in the process
+WORKER_POOL_SIZE = int(os.environ.get('WORKER_POOL_SIZE', os.cpu_count() or 2))
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> ThreadPoolExecutor:
+    """
+    Get the process-wide bounded worker pool, creating it on first use
+    :return: The shared ThreadPoolExecutor
+    """
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = ThreadPoolExecutor(max_workers=WORKER_POOL_SIZE, thread_name_prefix='image-worker')
+        return _worker_pool
+
+
+def run_parallel(func: Callable[[Any], dict], items: Sequence) -> Iterator[Tuple[int, dict]]:
+    """
+    Run a function over items on the shared worker pool, yielding results as they complete
+    :param func: Function returning a result dictionary for one item
+    :param items: Items to process
+    :return: Iterator of (item index, result) in completion order
+    """
+    futures = {get_worker_pool().submit(func, item): index for index, item in enumerate(items)}
+
+    for future in as_completed(futures):
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {
+                'success': False,
+                'message': f'Processing failed: {str(e)}'
+            }
+        yield futures[future], result
@@ -0,0 +1,180 @@
+import threading
+import time
+from typing import Callable, Optional
+
+# Minimum delay between two progress reports of the same operation
+PROGRESS_REPORT_INTERVAL = 0.1
+
+
+class ProgressReporter:
+    def __init__(
+        self,
+        callback: Optional[Callable[[int, int], None]],
+        total: int,
+        min_interval: float = PROGRESS_REPORT_INTERVAL
+    ):
+        """
+        Throttled progress counter forwarding (done, total) to a callback
+        :param callback: Function called with (done, total), may be None
+        :param total: Total number of units (rows, blocks, stages)
+        :param min_interval: Minimum seconds between two callback calls
+        """
+        self.callback = callback
+        self.total = total
+        self.done = 0
+        self.min_interval = min_interval
+        self._last_report = 0.0
+
+    def advance(self, amount: int = 1):
+        """
+        Mark units as done, reporting them if the throttle interval has passed
+        :param amount: Number of units completed
+        """
+        if self.callback is None:
+            return
+
+        self.done += amount
+        now = time.monotonic()
+        if self.done >= self.total or now - self._last_report >= self.min_interval:
+            self._last_report = now
+            self.callback(self.done, self.total)
+
+
+# Latest progress state of each operation, keyed by (image_id, operation) like the cancellation registry
+_progress_states = {}
+# Monotonic time of the last change of each progress state, used to expire finished ones
+_progress_updated = {}
+# Versions are shared by all states, so a stream following every operation of an image can
+# tell which changes it has already seen
+_progress_version = 0
+_progress_condition = threading.Condition()
+
+
+def _publish(image_id: str, operation: str, **changes):
+    global _progress_version
+    key = (image_id, operation)
+    with _progress_condition:
+        _progress_version += 1
+        state = dict(_progress_states.get(key, {}), **changes)
+        state['image_id'] = image_id
+        state['operation'] = operation
+        state['version'] = _progress_version
+        _progress_states[key] = state
+        _progress_updated[key] = time.monotonic()
+        _progress_condition.notify_all()
+
+
+def _image_states(image_id: str, operation: str = None) -> list:
+    # Progress states of an image, restricted to one operation when given; caller holds the lock
+    if operation is not None:
+        state = _progress_states.get((image_id, operation))
+        return [state] if state else []
+    return [state for (state_image_id, _), state in _progress_states.items() if state_image_id == image_id]
+
+
+def start_progress(image_id: str, operation: str):
+    """
+    Reset the progress state of an operation on an image
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name (e.g. 'compress')
+    """
+    _publish(
+        image_id,
+        operation,
+        status='running',
+        done=0,
+        total=0,
+        percent=0.0,
+        message=None
+    )
+
+
+def update_progress(image_id: str, operation: str, done: int, total: int):
+    """
+    Record the progress of a running operation on an image
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name
+    :param done: Units completed
+    :param total: Total units
+    """
+    percent = round(done / total * 100, 1) if total else 0.0
+    _publish(image_id, operation, done=done, total=total, percent=percent)
+
+
+def finish_progress(image_id: str, operation: str, success: bool, message: str = None):
+    """
+    Mark an operation on an image as done or failed
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name
+    :param success: Whether the operation succeeded
+    :param message: Optional result message
+    """
+    if success:
+        _publish(image_id, operation, status='done', percent=100.0, message=message)
+    else:
+        _publish(image_id, operation, status='failed', message=message)
+
+
+def make_progress_callback(image_id: str, operation: str) -> Callable[[int, int], None]:
+    """
+    Create a (done, total) callback that updates the progress of an operation
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name
+    :return: Progress callback
+    """
+    return lambda done, total: update_progress(image_id, operation, done, total)
+
+
+def get_progress(image_id: str, operation: str = None) -> Optional[dict]:
+    """
+    Get the latest progress state of an image
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name, None for the most recently changed operation
+    :return: Copy of the progress state, None if there is no progress
+    """
+    with _progress_condition:
+        states = _image_states(image_id, operation)
+        return dict(max(states, key=lambda state: state['version'])) if states else None
+
+
+def wait_for_progress(image_id: str, last_version: int, timeout: float, operation: str = None) -> Optional[dict]:
+    """
+    Wait until the progress of an image changes
+    :param image_id: Unique identifier for the image
+    :param last_version: Version of the last state seen by the caller
+    :param timeout: Maximum seconds to wait
+    :param operation: Operation name, None to follow every operation on the image
+    :return: The oldest state newer than last_version, None if nothing changed before the timeout
+    """
+    def changed_states():
+        return [state for state in _image_states(image_id, operation) if state['version'] > last_version]
+
+    with _progress_condition:
+        if not _progress_condition.wait_for(changed_states, timeout):
+            return None
+        return dict(min(changed_states(), key=lambda state: state['version']))
+
+
+def clear_progress(image_id: str):
+    """
+    Forget the progress states of every operation on an image
+    :param image_id: Unique identifier for the image
+    """
+    with _progress_condition:
+        for key in list(_progress_states):
+            if key[0] == image_id:
+                _progress_states.pop(key)
+                _progress_updated.pop(key)
+
+
+def expire_progress(max_age_seconds: float):
+    """
+    Forget the progress states of finished operations that have not changed for a while
+    :param max_age_seconds: Age after which a done or failed state is dropped
+    """
+    cutoff = time.monotonic() - max_age_seconds
+    with _progress_condition:
+        for key, updated in list(_progress_updated.items()):
+            if updated < cutoff and _progress_states[key]['status'] != 'running':
+                _progress_states.pop(key)
+                _progress_updated.pop(key)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+RESULT_CACHE_FOLDER = 'result_cache'
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+class ResultCache:
+    def __init__(self, cache_folder: str = RESULT_CACHE_FOLDER, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        """
+        Content-addressed cache of encoded outputs stored on disk with an in-memory LRU index
+        :param cache_folder: Folder holding the cached files
+        :param max_bytes: Maximum total size of the cached files
+        """
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_folder, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(**params) -> str:
+        """
+        Build a cache key from the parameters that determine an output
+        :param params: Content hash, format, quality, engine version, ...
+        :return: Hex digest identifying the output
+        """
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _load_index(self):
+        # Rebuild the index from the files left by a previous run, oldest first
+        entries = []
+        for filename in os.listdir(self.cache_folder):
+            if filename.startswith('.'):
+                continue
+            path = os.path.join(self.cache_folder, filename)
+            if filename.endswith('.tmp'):
+                # Left by a write interrupted before its rename
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, filename.split('.')[0], path, stat.st_size))
+
+        for _, key, path, size in sorted(entries):
+            self._index[key] = (path, size)
+            self.total_bytes += size
+
+        self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._index:
+            _, (path, size) = self._index.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._index
+
+    def get(self, key: str, destination_path: str) -> bool:
+        """
+        Copy a cached output to the destination path
+        :param key: Cache key
+        :param destination_path: Where to write the cached output
+        :return: True on a cache hit, False on a miss
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return False
+            self._index.move_to_end(key)
+
+        path, size = entry
+        try:
+            shutil.copyfile(path, destination_path)
+        except OSError:
+            # The cached file disappeared, treat it as a miss
+            with self._lock:
+                if self._index.pop(key, None) is not None:
+                    self.total_bytes -= size
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += size
+        return True
+
+    def put(self, key: str, source_path: str):
+        """
+        Store an encoded output in the cache
+        :param key: Cache key
+        :param source_path: Path of the encoded output to store
+        """
+        extension = os.path.splitext(source_path)[1]
+        path = os.path.join(self.cache_folder, f'{key}{extension}')
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            previous = self._index.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._index[key] = (path, size)
+            self.total_bytes += size
+            self._evict()
+
+    def stats(self) -> dict:
+        """
+        Get the cache statistics
+        :return: Dictionary with entry count, sizes, hit rate and bytes saved
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._index),
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'bytes_saved': self.bytes_saved
+            }
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Get the process-wide result cache, creating it on first use
+    :return: The shared ResultCache
+    """
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
@@ -0,0 +1,95 @@
+import json
+import threading
+from typing import Any, Callable, Hashable, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Run identical concurrent calls once and share their result
+        """
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Call func, or wait for the running call with the same key and share its result
+        :param key: Identity of the call
+        :param func: Function computing the result
+        :return: (result, True if the result was computed by another caller)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # Later calls start a new computation, e.g. after the input file changed
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+    def stats(self) -> dict:
+        """
+        Get the coalescing statistics
+        :return: Dictionary with the executed and coalesced call counts
+        """
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self.executed,
+                'coalesced': self.coalesced
+            }
+
+
+_single_flight = SingleFlight()
+
+
+def coalesce(image_id: str, operation: str, params: dict, func: Callable[[], dict]) -> dict:
+    """
+    Run a service call once for identical concurrent requests
+    :param image_id: Unique identifier for the image
+    :param operation: Operation name (e.g. 'compress', 'watermark')
+    :param params: JSON-serializable parameters identifying the result
+    :param func: Function computing the service result
+    :return: The service result, with 'coalesced' telling if it was shared with an earlier request
+    """
+    key = (image_id, operation, json.dumps(params, sort_keys=True, default=str))
+    result, shared = _single_flight.do(key, func)
+    return dict(result, coalesced=shared)
+
+
+def single_flight_stats() -> dict:
+    """
+    Get the statistics of the shared request coalescing layer
+    :return: Dictionary with the executed and coalesced call counts
+    """
+    return _single_flight.stats()
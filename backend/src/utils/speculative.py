@@ -0,0 +1,203 @@
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Optional
+
+from utils.cancellation import CancellationToken, OperationAbortedError
+
+# Precompute the likely outputs of every upload unless the request says otherwise
+SPECULATIVE_PRECOMPUTE = os.environ.get('SPECULATIVE_PRECOMPUTE', '0') == '1'
+
+# Seconds without foreground requests before speculative work starts
+FOREGROUND_IDLE_DELAY = 0.2
+
+# Times a task interrupted by foreground requests is retried
+MAX_SPECULATIVE_ATTEMPTS = 3
+
+# Speculative tasks waiting to run, the oldest dropped first when more are submitted
+MAX_PENDING_TASKS = 1000
+
+# Precomputed outputs tracked for the hit and waste statistics, oldest dropped first
+MAX_TRACKED_OUTPUTS = 10000
+
+# Nice increment of the speculative worker thread where the OS supports per-thread priorities
+SPECULATIVE_THREAD_NICENESS = 10
+
+
+class SpeculativePool:
+    def __init__(self, idle_delay: float = FOREGROUND_IDLE_DELAY, max_pending: int = MAX_PENDING_TASKS):
+        """
+        Single low-priority worker running speculative tasks while no foreground request is active
+        :param idle_delay: Seconds without foreground requests before a task starts
+        :param max_pending: Maximum number of waiting tasks, the oldest is dropped beyond it
+        """
+        self.idle_delay = idle_delay
+        self.max_pending = max_pending
+        self._tasks = deque()
+        self._condition = threading.Condition()
+        self._foreground = 0
+        self._last_foreground = 0.0
+        self._running = None
+        self._started = False
+
+        # Precomputed outputs keyed by the key their task returned
+        self._outputs = {}
+        self.scheduled = 0
+        self.completed = 0
+        self.aborted = 0
+        self.dropped = 0
+        self.produced = 0
+        self.hits = 0
+        self.cpu_ms = 0.0
+
+    def submit(self, image_id: str, name: str, func: Callable[[CancellationToken], Optional[str]]):
+        """
+        Schedule a speculative task
+        :param image_id: Unique identifier for the image the task works on
+        :param name: Task name (e.g. 'compress:jpeg')
+        :param func: Function called with a cancellation token, returning the key of the output it
+                     produced or None when nothing had to be computed
+        """
+        with self._condition:
+            if not self._started:
+                self._started = True
+                threading.Thread(target=self._run_worker, daemon=True).start()
+            # Under a steady stream of foreground requests the backlog would grow without bound;
+            # the oldest tasks are the least likely to still be useful
+            if len(self._tasks) >= self.max_pending:
+                self._tasks.popleft()
+                self.dropped += 1
+            self._tasks.append({'image_id': image_id, 'name': name, 'func': func, 'attempts': 0})
+            self.scheduled += 1
+            self._condition.notify_all()
+
+    def begin_foreground(self):
+        """
+        Mark the start of a foreground request, interrupting the running speculative task
+        """
+        with self._condition:
+            self._foreground += 1
+            if self._running is not None:
+                self._running['token'].cancel()
+
+    def end_foreground(self):
+        """
+        Mark the end of a foreground request
+        """
+        with self._condition:
+            self._foreground -= 1
+            self._last_foreground = time.monotonic()
+            self._condition.notify_all()
+
+    def record_hit(self, key: str) -> bool:
+        """
+        Record that a foreground request was served by a precomputed output
+        :param key: Output key returned by the task
+        :return: True if the output was precomputed and not used before
+        """
+        with self._condition:
+            output = self._outputs.get(key)
+            if output is None or output['used']:
+                return False
+            output['used'] = True
+            self.hits += 1
+            return True
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Wait until every scheduled task has finished
+        :param timeout: Maximum seconds to wait
+        :return: True if the pool is idle
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._tasks and self._running is None, timeout)
+
+    def _next_task(self) -> dict:
+        with self._condition:
+            while True:
+                idle_for = time.monotonic() - self._last_foreground
+                if self._tasks and self._foreground == 0 and idle_for >= self.idle_delay:
+                    task = self._tasks.popleft()
+                    task['token'] = CancellationToken()
+                    self._running = task
+                    return task
+                if not self._tasks or self._foreground:
+                    # submit() and end_foreground() notify the condition
+                    self._condition.wait()
+                else:
+                    self._condition.wait(self.idle_delay - idle_for)
+
+    def _run_worker(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), SPECULATIVE_THREAD_NICENESS)
+        except (AttributeError, OSError):
+            pass
+
+        while True:
+            task = self._next_task()
+            started = time.perf_counter()
+            key = None
+            interrupted = False
+            try:
+                key = task['func'](task['token'])
+            except OperationAbortedError:
+                interrupted = True
+            except Exception:
+                traceback.print_exc()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            with self._condition:
+                self._running = None
+                self.cpu_ms += elapsed_ms
+                task['attempts'] += 1
+                if interrupted and task['attempts'] < MAX_SPECULATIVE_ATTEMPTS:
+                    # Foreground work preempted the task, try again once the server is idle
+                    if len(self._tasks) >= self.max_pending:
+                        self.dropped += 1
+                    else:
+                        self._tasks.appendleft(task)
+                elif interrupted:
+                    self.aborted += 1
+                else:
+                    self.completed += 1
+                    if key is not None:
+                        self.produced += 1
+                        self._outputs[key] = {'image_id': task['image_id'], 'elapsed_ms': elapsed_ms, 'used': False}
+                        if len(self._outputs) > MAX_TRACKED_OUTPUTS:
+                            del self._outputs[next(iter(self._outputs))]
+                self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """
+        Get the precompute statistics
+        :return: Dictionary with task counts and the hit and waste ratios of the precomputed outputs
+        """
+        with self._condition:
+            unused = [output for output in self._outputs.values() if not output['used']]
+            return {
+                'scheduled': self.scheduled,
+                'pending': len(self._tasks) + (self._running is not None),
+                'completed': self.completed,
+                'aborted': self.aborted,
+                'dropped': self.dropped,
+                'produced': self.produced,
+                'hits': self.hits,
+                'unused': len(unused),
+                'hit_ratio': self.hits / self.produced if self.produced else 0.0,
+                'waste_ratio': len(unused) / self.produced if self.produced else 0.0,
+                'cpu_ms': round(self.cpu_ms, 2),
+                'unused_cpu_ms': round(sum(output['elapsed_ms'] for output in unused), 2)
+            }
+
+
+_speculative_pool = SpeculativePool()
+
+
+def get_speculative_pool() -> SpeculativePool:
+    """
+    Get the shared speculative precompute pool
+    :return: The process-wide SpeculativePool
+    """
+    return _speculative_pool
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from utils.image_cache import image_nbytes, read_only_view
+from utils.lru_cache import ByteLRUCache
+
+STEP_CACHE_MAX_BYTES = int(os.environ.get('STEP_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+class StepCache:
+    def __init__(self, max_bytes: int = STEP_CACHE_MAX_BYTES):
+        """
+        Byte-bounded cache of the intermediate images of operation chains
+        :param max_bytes: Maximum total size of the cached images
+        """
+        self._images = ByteLRUCache(max_bytes)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.reused_steps = 0
+        self.time_saved_ms = 0.0
+
+    @staticmethod
+    def make_key(source_key: str, steps: list) -> str:
+        """
+        Build the cache key of the image produced by a chain prefix
+        :param source_key: Identifier of the source pixels (e.g. content hash and decode size)
+        :param steps: JSON-serializable steps of the prefix, in order
+        :return: Hex digest identifying the intermediate image
+        """
+        payload = json.dumps([source_key, steps], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def lookup(self, source_key: str, steps: list) -> Tuple[int, Optional[Image.Image], float]:
+        """
+        Find the longest cached prefix of a chain
+        :param source_key: Identifier of the source pixels
+        :param steps: JSON-serializable steps of the chain, in order
+        :return: (prefix length, copy-on-write view of its image, milliseconds it took to compute),
+                 (0, None, 0.0) when no prefix is cached
+        """
+        for length in range(len(steps), 0, -1):
+            entry = self._images.get(self.make_key(source_key, steps[:length]))
+            if entry is not None:
+                image, elapsed_ms = entry
+                return length, read_only_view(image), elapsed_ms
+        return 0, None, 0.0
+
+    def store(self, source_key: str, steps: list, image: Image.Image, elapsed_ms: float):
+        """
+        Cache the image produced by a chain prefix
+        :param source_key: Identifier of the source pixels
+        :param steps: JSON-serializable steps of the prefix, in order
+        :param image: Image produced by the prefix; it must not be modified afterwards
+        :param elapsed_ms: Milliseconds it took to compute the image from the source
+        """
+        self._images.put(self.make_key(source_key, steps), (image, elapsed_ms), image_nbytes(image))
+
+    def record(self, reused_steps: int, time_saved_ms: float):
+        """
+        Count a chain execution in the statistics
+        :param reused_steps: Number of steps served from the cache
+        :param time_saved_ms: Milliseconds of computation the reused prefix saved
+        """
+        with self._lock:
+            self.requests += 1
+            if reused_steps:
+                self.hits += 1
+                self.reused_steps += reused_steps
+                self.time_saved_ms += time_saved_ms
+
+    def clear(self):
+        """
+        Remove every cached image
+        """
+        self._images.clear()
+
+    def stats(self) -> dict:
+        """
+        Get the cache statistics
+        :return: Dictionary with sizes, hit rate and time saved
+        """
+        image_stats = self._images.stats()
+        with self._lock:
+            return {
+                'entries': image_stats['entries'],
+                'total_bytes': image_stats['total_bytes'],
+                'max_bytes': image_stats['max_bytes'],
+                'requests': self.requests,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.requests if self.requests else 0.0,
+                'reused_steps': self.reused_steps,
+                'time_saved_ms': round(self.time_saved_ms, 2)
+            }
+
+
+_step_cache = StepCache()
+
+
+def get_step_cache() -> StepCache:
+    """
+    Get the shared intermediate image cache
+    :return: The process-wide StepCache
+    """
+    return _step_cache
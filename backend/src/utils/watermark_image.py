@@ -2,132 +2,484 @@ from PIL import Image, ImageDraw, ImageFont
 import os
 import math
 import logging
+from functools import lru_cache
+
+import numpy as np
+
+from utils.cancellation import CancellationToken, check_cancelled
+from utils.image_cache import image_nbytes, open_image
+from utils.lru_cache import ByteLRUCache
+from utils.single_flight import SingleFlight
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def watermark_image(image: Image.Image, watermark_text: str, position: str, config: dict = None) -> Image.Image:
-    """
-    Add watermark to an image
-    """
-    logger.debug(f"Starting watermark_image with config: {config}")
-    
-    # Create a copy of the image to ensure the original remains unaltered
-    img = image.copy()
-    if img.mode != 'RGBA':
-        img = img.convert('RGBA')  # Convert image to RGBA mode for transparency support
-    
-    # Create a transparent layer for the watermark
-    watermark_layer = Image.new('RGBA', img.size, (0, 0, 0, 0))  # Initialize a transparent image layer
-    draw = ImageDraw.Draw(watermark_layer)
+FONT_PATH = os.path.join(os.path.dirname(__file__), 'fonts', 'Arial.ttf')
 
-    # Get configuration settings or use defaults
-    if config is None:
-        config = {}
-    
-    font_size = config.get('fontSize', 36)  # Default font size is 36
-    color = config.get('color', '#ffffff')  # Default color is white
-    opacity = int(config.get('opacity', 0.8) * 255)  # Default opacity is 80%
-    rotation = -config.get('rotation', 0)  # Rotation angle (default is no rotation)
-    custom_position = config.get('customPosition', None) or config.get('position', None)  # Custom position override
+WATERMARK_SPRITE_CACHE_MAX_BYTES = int(os.environ.get('WATERMARK_SPRITE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Rendered text keyed by text, font, size, color (with opacity) and rotation
+_text_sprites = ByteLRUCache(WATERMARK_SPRITE_CACHE_MAX_BYTES)
+
+# Concurrent misses on the same sprite or overlay (e.g. a batch on the worker pool) render it once
+_overlay_renders = SingleFlight()
+
+WATERMARK_LOGO_CACHE_MAX_BYTES = int(os.environ.get('WATERMARK_LOGO_CACHE_MAX_BYTES', 128 * 1024 * 1024))
+
+# Premultiplied logo overlays keyed by logo file, width, opacity and rotation
+_logo_overlays = ByteLRUCache(WATERMARK_LOGO_CACHE_MAX_BYTES)
+
+WATERMARK_PATTERN_CACHE_MAX_BYTES = int(os.environ.get('WATERMARK_PATTERN_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Full-frame pattern layers keyed by sprite, spacing, stagger and image size, shared by batch items
+_pattern_layers = ByteLRUCache(WATERMARK_PATTERN_CACHE_MAX_BYTES)
+
+# Logo width as a fraction of the image width when the config does not set logoScale
+DEFAULT_LOGO_SCALE = 0.2
+
+# Distance between a preset logo position and the image edges, as a fraction of the shorter side
+LOGO_PADDING_RATIO = 0.02
 
-    # Convert color from hex (e.g., #RRGGBB) to RGBA tuple
-    if isinstance(color, str) and color.startswith('#'):
-        color = color.lstrip('#')
-        r = int(color[:2], 16)
-        g = int(color[2:4], 16)
-        b = int(color[4:], 16)
-        color = (r, g, b, opacity)
 
-    # Load font, defaulting to built-in font if loading fails
+@lru_cache(maxsize=32)
+def load_font(font_path: str, font_size: int) -> ImageFont.ImageFont:
+    """
+    Load a font once per path and size
+    :param font_path: Path of the TrueType font file
+    :param font_size: Font size in pixels
+    :return: The font, or Pillow's built-in font if the file cannot be loaded
+    """
     try:
-        font_path = os.path.join(os.path.dirname(__file__), 'fonts', 'Arial.ttf')
-        font = ImageFont.truetype(font_path, font_size)
+        return ImageFont.truetype(font_path, font_size)
     except:
-        font = ImageFont.load_default()
         logger.warning("Using default font. For best results, place Arial.ttf in the fonts directory.")
+        return ImageFont.load_default()
+
+
+def get_text_sprite(watermark_text: str, font_size: int, color, rotation: float) -> tuple:
+    """
+    Render watermark text onto a transparent sprite, reusing earlier renderings
+    :param watermark_text: Text of the watermark
+    :param font_size: Font size in pixels
+    :param color: Fill color (RGBA tuple or color name)
+    :param rotation: Counter-clockwise rotation in degrees
+    :return: (sprite, (text width, text height), (x, y) offset of the sprite from the text position)
+    """
+    if isinstance(color, list):
+        color = tuple(color)
+    key = (watermark_text, FONT_PATH, font_size, color, rotation)
+    sprite = _text_sprites.get(key)
+    if sprite is None:
+        sprite = _overlay_renders.do(('text',) + key, lambda: _render_text_sprite(key))[0]
+    return sprite
+
+
+def _render_text_sprite(key: tuple) -> tuple:
+    watermark_text, font_path, font_size, color, rotation = key
+    font = load_font(font_path, font_size)
 
     # Get the bounding box dimensions of the text
-    bbox = draw.textbbox((0, 0), watermark_text, font=font)  # Text bounding box
+    bbox = ImageDraw.Draw(Image.new('RGBA', (1, 1))).textbbox((0, 0), watermark_text, font=font)  # Text bounding box
     text_width = bbox[2] - bbox[0]
     text_height = bbox[3] - bbox[1]
 
-    logger.debug(f"Text dimensions: {text_width}x{text_height}")
+    if rotation:
+        # Create a temporary image to accommodate rotation
+        diagonal = math.sqrt(text_width**2 + text_height**2)  # Diagonal of the text rectangle
+        padding = int(diagonal / 2)
+        temp_size = (text_width + padding * 2, text_height + padding * 2)  # Ensure enough space for rotation
+        temp_img = Image.new('RGBA', temp_size, (0, 0, 0, 0))  # Temporary transparent image
+        temp_draw = ImageDraw.Draw(temp_img)
+
+        # Draw the text at the center of the temporary image
+        temp_x = (temp_size[0] - text_width) / 2
+        temp_y = (temp_size[1] - text_height) / 2
+        temp_draw.text((temp_x, temp_y), watermark_text, font=font, fill=color)
+
+        # Rotate the temporary image
+        rotated = temp_img.rotate(rotation, expand=True, center=(temp_size[0]/2, temp_size[1]/2))
+
+        # Paste through its own mask, as the rotated text has always been pasted onto the layer
+        image = Image.new('RGBA', rotated.size, (0, 0, 0, 0))
+        image.paste(rotated, (0, 0), rotated)
+        offset = (0, 0)
+    else:
+        # Only the inked box of the text is kept
+        image = Image.new('RGBA', (max(text_width, 1), max(text_height, 1)), (0, 0, 0, 0))
+        ImageDraw.Draw(image).text((-bbox[0], -bbox[1]), watermark_text, font=font, fill=color)
+        offset = (bbox[0], bbox[1])
+
+    sprite = (image, (text_width, text_height), offset)
+    _text_sprites.put(key, sprite, image_nbytes(image))
+    return sprite
+
+
+def composite_sprite(img: Image.Image, sprite: Image.Image, position: tuple):
+    """
+    Blend an RGBA sprite into an image in place, converting only the pixels under the sprite
+    :param img: RGB or RGBA image, modified in place
+    :param sprite: RGBA sprite
+    :param position: (x, y) of the sprite's top-left corner, which may lie outside the image
+    """
+    left, top = max(position[0], 0), max(position[1], 0)
+    right = min(position[0] + sprite.width, img.width)
+    bottom = min(position[1] + sprite.height, img.height)
+    if left >= right or top >= bottom:
+        return
+
+    source = (left - position[0], top - position[1], right - position[0], bottom - position[1])
+    if img.mode == 'RGBA':
+        img.alpha_composite(sprite, dest=(left, top), source=source)
+    else:
+        # An opaque image stays opaque, so the blend is done on an RGBA copy of the region only
+        region = img.crop((left, top, right, bottom)).convert('RGBA')
+        region.alpha_composite(sprite, source=source)
+        img.paste(region.convert(img.mode), (left, top))
+
+
+def watermark_pattern(
+    img: Image.Image,
+    sprite: Image.Image,
+    spacing: int,
+    stagger: bool = True,
+    cancel_token: 'CancellationToken' = None
+) -> Image.Image:
+    """
+    Repeat a sprite across a whole image and blend it in one pass
+    :param img: RGB or RGBA image, modified in place
+    :param sprite: RGBA sprite
+    :param spacing: Gap in pixels between neighbouring sprites
+    :param stagger: Shift every other row by half a cell
+    :param cancel_token: Optional token checked before blending
+    :return: The watermarked image
+    """
+    # Sprites come from the sprite cache, so batch items share the same object; each entry keeps its
+    # sprite alive, which keeps the id from being reused while the entry exists
+    key = (id(sprite), spacing, stagger, img.size)
+    entry = _pattern_layers.get(key)
+    if entry is None or entry[0] is not sprite:
+        entry = _overlay_renders.do(('pattern',) + key, lambda: _render_pattern_layer(sprite, key))[0]
+    layer = entry[1]
+    if layer is None:
+        return img
+
+    check_cancelled(cancel_token)
+    if img.mode == 'RGBA':
+        img.alpha_composite(layer)
+    else:
+        # Over opaque pixels a masked paste is the same blend, without converting the image
+        img.paste(layer, (0, 0), layer)
+    return img
+
+
+def _render_pattern_layer(sprite: Image.Image, key: tuple) -> tuple:
+    _, spacing, stagger, size = key
+
+    # Spacing is measured between the visible text, not the padding of rotated sprites
+    bbox = sprite.getbbox()
+    if bbox is None:
+        entry = (sprite, None)
+        _pattern_layers.put(key, entry, 0)
+        return entry
+    cropped = sprite.crop(bbox)
+    cell_width = cropped.width + spacing
+    cell_height = cropped.height + spacing
+
+    # One period of the pattern, two rows high when alternate rows are shifted
+    cell = Image.new('RGBA', (cell_width, cell_height * (2 if stagger else 1)), (0, 0, 0, 0))
+    cell.paste(cropped, (0, 0))
+    if stagger:
+        shift = cell_width // 2
+        cell.paste(cropped, (shift, cell_height))
+        cell.paste(cropped, (shift - cell_width, cell_height))  # Part wrapping around the right edge
+
+    # Tile the period over the canvas with array repeats instead of one paste per sprite
+    pixels = np.asarray(cell)
+    repeats = (-(-size[1] // cell.height), -(-size[0] // cell.width), 1)
+    layer = Image.fromarray(np.tile(pixels, repeats)[:size[1], :size[0]], 'RGBA')
+
+    entry = (sprite, layer)
+    _pattern_layers.put(key, entry, image_nbytes(layer))
+    return entry
+
+
+def pattern_layer_cache_stats() -> dict:
+    """
+    Get the watermark pattern layer cache statistics
+    :return: Dictionary with entry count, sizes and hit rate
+    """
+    return _pattern_layers.stats()
+
+
+def _writable_copy(image: Image.Image) -> Image.Image:
+    # Watermarks are blended into their region only, so RGB and RGBA images keep their mode
+    if image.mode in ('RGB', 'RGBA'):
+        return image.copy()
+    return image.convert('RGBA')  # Convert image to RGBA mode for transparency support
+
+
+def watermark_position(
+    image_size: tuple,
+    box_size: tuple,
+    position: str,
+    custom_position: dict = None,
+    padding: float = 0
+) -> tuple:
+    """
+    Compute where the top-left corner of an unrotated watermark goes
+    :param image_size: (width, height) of the image
+    :param box_size: (width, height) of the watermark
+    :param position: Preset position ('top-left', 'top-right', 'bottom-left', 'bottom-right' or 'center')
+    :param custom_position: Optional {'x', 'y'} percentages of the watermark center, overriding the preset
+    :param padding: Distance in pixels between a preset position and the image edges
+    :return: (x, y) clamped so the watermark stays inside the image
+    """
+    width, height = image_size
+    box_width, box_height = box_size
 
-    # Determine the position of the watermark
     if custom_position and isinstance(custom_position, dict):
         # Extract percentage-based positions if specified
         x_percent = float(custom_position.get('x', 50))  # Default x position is 50%
         y_percent = float(custom_position.get('y', 50))  # Default y position is 50%
-        
+
         # Convert percentages to pixel values
-        x = (x_percent / 100.0) * img.width
-        y = (y_percent / 100.0) * img.height
+        x = (x_percent / 100.0) * width
+        y = (y_percent / 100.0) * height
 
         logger.debug(f"Percentage position: {x_percent}%, {y_percent}%")
         logger.debug(f"Absolute position before adjustment: {x}, {y}")
 
-        # Adjust to center the text at the calculated position
-        x = x - (text_width / 2)
-        y = y - (text_height / 2)
+        # Adjust to center the watermark at the calculated position
+        x = x - (box_width / 2)
+        y = y - (box_height / 2)
 
         logger.debug(f"Final position after centering: {x}, {y}")
     else:
         # Default positioning based on predefined options
-        padding = font_size  # Padding around the text
         if position == 'top-left':
             x, y = padding, padding
         elif position == 'top-right':
-            x, y = img.width - text_width - padding, padding
+            x, y = width - box_width - padding, padding
         elif position == 'bottom-left':
-            x, y = padding, img.height - text_height - padding
+            x, y = padding, height - box_height - padding
         elif position == 'bottom-right':
-            x, y = img.width - text_width - padding, img.height - text_height - padding
+            x, y = width - box_width - padding, height - box_height - padding
         elif position == 'center':
-            x = (img.width - text_width) / 2
-            y = (img.height - text_height) / 2
+            x = (width - box_width) / 2
+            y = (height - box_height) / 2
         else:
             x, y = padding, padding  # Default fallback position
 
     # Ensure the calculated coordinates are within image boundaries
-    x = max(0, min(x, img.width - text_width))
-    y = max(0, min(y, img.height - text_height))
+    x = max(0, min(x, width - box_width))
+    y = max(0, min(y, height - box_height))
 
     logger.debug(f"Final adjusted position: {x}, {y}")
+    return x, y
+
+
+def text_sprite_cache_stats() -> dict:
+    """
+    Get the watermark text sprite cache statistics
+    :return: Dictionary with entry count, sizes and hit rate
+    """
+    return _text_sprites.stats()
+
+
+def watermark_image(
+    image: Image.Image,
+    watermark_text: str,
+    position: str,
+    config: dict = None,
+    cancel_token: 'CancellationToken' = None
+) -> Image.Image:
+    """
+    Add watermark to an image
+    RGB and RGBA images keep their mode, other modes are converted to RGBA
+    A 'pattern' config ({'spacing', 'angle', 'stagger'}, or True for the defaults) repeats the text
+    across the whole image instead of placing it once; its angle turns clockwise like 'rotation'
+    """
+    logger.debug(f"Starting watermark_image with config: {config}")
+    
+    # Create a copy of the image to ensure the original remains unaltered
+    img = _writable_copy(image)
+    check_cancelled(cancel_token)
+
+    # Get configuration settings or use defaults
+    if config is None:
+        config = {}
+    
+    font_size = config.get('fontSize', 36)  # Default font size is 36
+    color = config.get('color', '#ffffff')  # Default color is white
+    opacity = int(config.get('opacity', 0.8) * 255)  # Default opacity is 80%
+    rotation = -config.get('rotation', 0)  # Rotation angle (default is no rotation)
+    custom_position = config.get('customPosition', None) or config.get('position', None)  # Custom position override
+
+    # Convert color from hex (e.g., #RRGGBB) to RGBA tuple
+    if isinstance(color, str) and color.startswith('#'):
+        color = color.lstrip('#')
+        r = int(color[:2], 16)
+        g = int(color[2:4], 16)
+        b = int(color[4:], 16)
+        color = (r, g, b, opacity)
+
+    # Repeat the text across the whole image
+    pattern = config.get('pattern')
+    if pattern:
+        pattern = pattern if isinstance(pattern, dict) else {}
+        spacing = max(0, int(pattern.get('spacing', font_size)))
+        # Clockwise like 'rotation', which it defaults to; without either the text rises diagonally
+        angle = -float(pattern.get('angle', config.get('rotation', -45)))
+        sprite = get_text_sprite(watermark_text, font_size, color, angle)[0]
+        check_cancelled(cancel_token)
+        logger.debug(f"Pattern watermark: spacing {spacing}, angle {angle}")
+        return watermark_pattern(img, sprite, spacing, bool(pattern.get('stagger', True)), cancel_token)
+
+    # Render the text once per text, font and style; later requests reuse the sprite
+    sprite, (text_width, text_height), sprite_offset = get_text_sprite(watermark_text, font_size, color, rotation)
+
+    logger.debug(f"Text dimensions: {text_width}x{text_height}")
+
+    # Determine the position of the watermark, padded by the font size
+    x, y = watermark_position(img.size, (text_width, text_height), position, custom_position, font_size)
+    check_cancelled(cancel_token)
 
     # Handle rotation of the text, if specified
     if rotation:
-        # Calculate the center point for rotation
+        # Calculate the paste position to keep the rotated text centered on the text box
         center_x = x + text_width / 2
         center_y = y + text_height / 2
-        
-        # Create a temporary image to accommodate rotation
-        diagonal = math.sqrt(text_width**2 + text_height**2)  # Diagonal of the text rectangle
-        padding = int(diagonal / 2)
-        temp_size = (text_width + padding * 2, text_height + padding * 2)  # Ensure enough space for rotation
-        temp_img = Image.new('RGBA', temp_size, (0, 0, 0, 0))  # Temporary transparent image
-        temp_draw = ImageDraw.Draw(temp_img)
-        
-        # Draw the text at the center of the temporary image
-        temp_x = (temp_size[0] - text_width) / 2
-        temp_y = (temp_size[1] - text_height) / 2
-        temp_draw.text((temp_x, temp_y), watermark_text, font=font, fill=color)
-        
-        # Rotate the temporary image
-        rotated = temp_img.rotate(rotation, expand=True, center=(temp_size[0]/2, temp_size[1]/2))
-        
-        # Calculate the paste position to keep the rotated text centered
-        paste_x = int(center_x - rotated.width / 2)
-        paste_y = int(center_y - rotated.height / 2)
-        
-        # Paste the rotated text onto the watermark layer
-        watermark_layer.paste(rotated, (paste_x, paste_y), rotated)
+        paste_x = int(center_x - sprite.width / 2)
+        paste_y = int(center_y - sprite.height / 2)
     else:
-        # Draw the text directly without rotation
-        draw.text((x, y), watermark_text, font=font, fill=color)
+        paste_x = int(x) + sprite_offset[0]
+        paste_y = int(y) + sprite_offset[1]
+
+    # Blend the text sprite into the pixels it covers
+    check_cancelled(cancel_token)
+    composite_sprite(img, sprite, (paste_x, paste_y))
 
-    # Combine the watermark layer with the original image
-    result = Image.alpha_composite(img, watermark_layer)
-    
     logger.debug("Watermark applied successfully")
-    return result
\ No newline at end of file
+    return img
+
+
+def get_logo_overlay(logo_path: str, width: int, opacity: float, rotation: float) -> tuple:
+    """
+    Scale, fade and rotate a logo in premultiplied alpha, reusing earlier overlays
+    :param logo_path: Path of the logo image
+    :param width: Logo width in pixels before rotation
+    :param opacity: Opacity multiplier (0-1)
+    :param rotation: Counter-clockwise rotation in degrees
+    :return: (premultiplied 'RGBa' overlay, (logo width, logo height) before rotation)
+    """
+    stat = os.stat(logo_path)
+    key = (os.path.abspath(logo_path), stat.st_mtime_ns, width, round(opacity, 3), rotation)
+    overlay = _logo_overlays.get(key)
+    if overlay is None:
+        overlay = _overlay_renders.do(('logo',) + key, lambda: _render_logo_overlay(key))[0]
+    return overlay
+
+
+def _render_logo_overlay(key: tuple) -> tuple:
+    logo_path, _, width, opacity, rotation = key
+    logo = open_image(logo_path)
+    height = max(1, round(logo.height * width / logo.width))
+
+    # Resampling premultiplied pixels keeps transparent edges from bleeding their color
+    image = logo.convert('RGBA').convert('RGBa')
+    if image.size != (width, height):
+        image = image.resize((width, height), Image.LANCZOS)
+    if opacity < 1:
+        # Premultiplied colors fade together with the alpha
+        image = image.point(lambda value: round(value * opacity))
+    if rotation:
+        image = image.rotate(rotation, resample=Image.BICUBIC, expand=True)
+
+    # LANCZOS and BICUBIC overshoot at sharp edges; a color above its alpha would overflow the blend
+    pixels = np.array(image)
+    np.minimum(pixels[..., :3], pixels[..., 3:], out=pixels[..., :3])
+    image = Image.frombytes('RGBa', image.size, pixels.tobytes())
+
+    overlay = (image, (width, height))
+    _logo_overlays.put(key, overlay, image_nbytes(image))
+    return overlay
+
+
+def composite_premultiplied(img: Image.Image, overlay: Image.Image, position: tuple):
+    """
+    Blend a premultiplied overlay into an image in place, converting only the pixels under it
+    :param img: RGB or RGBA image, modified in place
+    :param overlay: Premultiplied 'RGBa' overlay
+    :param position: (x, y) of the overlay's top-left corner, which may lie outside the image
+    """
+    left, top = max(position[0], 0), max(position[1], 0)
+    right = min(position[0] + overlay.width, img.width)
+    bottom = min(position[1] + overlay.height, img.height)
+    if left >= right or top >= bottom:
+        return
+
+    box = (left, top, right, bottom)
+    source = np.asarray(overlay.crop((left - position[0], top - position[1], right - position[0], bottom - position[1])), dtype=np.uint16)
+    transparency = 255 - source[..., 3:]
+
+    # Premultiplied "over": destination scaled by the overlay's transparency plus the overlay
+    if img.mode == 'RGBA':
+        destination = np.asarray(img.crop(box).convert('RGBa'), dtype=np.uint16)
+        blended = source + (destination * transparency + 127) // 255
+        img.paste(Image.frombytes('RGBa', blended.shape[1::-1], blended.astype(np.uint8).tobytes()).convert('RGBA'), box)
+    else:
+        destination = np.asarray(img.crop(box), dtype=np.uint16)
+        blended = source[..., :3] + (destination * transparency + 127) // 255
+        img.paste(Image.frombytes('RGB', blended.shape[1::-1], blended.astype(np.uint8).tobytes()), box)
+
+
+def watermark_logo(
+    image: Image.Image,
+    logo_path: str,
+    position: str,
+    config: dict = None,
+    cancel_token: 'CancellationToken' = None
+) -> Image.Image:
+    """
+    Add a logo watermark to an image
+    RGB and RGBA images keep their mode, other modes are converted to RGBA
+    :param image: Input image
+    :param logo_path: Path of the logo image
+    :param position: Preset position of the logo
+    :param config: Optional logoScale (fraction of the image width), opacity, rotation and position
+    :param cancel_token: Optional token checked during the watermark
+    :return: The watermarked image
+    """
+    img = _writable_copy(image)
+    check_cancelled(cancel_token)
+
+    if config is None:
+        config = {}
+
+    scale = float(config.get('logoScale', DEFAULT_LOGO_SCALE))
+    opacity = max(0.0, min(1.0, float(config.get('opacity', 0.8))))  # Default opacity is 80%
+    rotation = -config.get('rotation', 0)  # Same direction as text rotation
+    custom_position = config.get('customPosition', None) or config.get('position', None)
+
+    width = max(1, min(img.width, round(img.width * scale)))
+    overlay, (logo_width, logo_height) = get_logo_overlay(logo_path, width, opacity, rotation)
+
+    padding = round(min(img.size) * LOGO_PADDING_RATIO)
+    x, y = watermark_position(img.size, (logo_width, logo_height), position, custom_position, padding)
+    check_cancelled(cancel_token)
+
+    # Keep a rotated logo centered on its unrotated box
+    paste_x = int(x + logo_width / 2 - overlay.width / 2)
+    paste_y = int(y + logo_height / 2 - overlay.height / 2)
+    composite_premultiplied(img, overlay, (paste_x, paste_y))
+
+    logger.debug("Logo watermark applied successfully")
+    return img
+
+
+def logo_overlay_cache_stats() -> dict:
+    """
+    Get the logo overlay cache statistics
+    :return: Dictionary with entry count, sizes and hit rate
+    """
+    return _logo_overlays.stats()
@@ -1,8 +1,12 @@
+from typing import Callable
+
 import numpy as np
 from PIL import Image
 from scipy import fftpack
-from tqdm import tqdm
+
+from utils.cancellation import CancellationToken, check_cancelled
 from utils.image_validation import validate_compression_input
+from utils.progress import ProgressReporter
 
 
 class WebPCompressor:
@@ -172,12 +176,20 @@ class WebPCompressor:
         return np.clip(idct_block + 128.0, 0, 255)
 
     @staticmethod
-    def compress_channel(channel: np.ndarray, quality: int, block_size: int = 16) -> np.ndarray:
+    def compress_channel(
+        channel: np.ndarray,
+        quality: int,
+        block_size: int = 16,
+        cancel_token: 'CancellationToken' = None,
+        progress: 'ProgressReporter' = None
+    ) -> np.ndarray:
         """
         Compress a single channel
         :param channel: Input channel
         :param quality: Compression quality
         :param block_size: Size of processing blocks
+        :param cancel_token: Optional token checked between block rows
+        :param progress: Optional reporter advanced once per block row
         :return: Compressed channel
         """
         height, width = channel.shape
@@ -196,6 +208,8 @@ class WebPCompressor:
         result = np.zeros_like(padded)
         
         for i in range(0, padded_h, block_size):
+            check_cancelled(cancel_token)
+
             for j in range(0, padded_w, block_size):
                 block = padded[i:i+block_size, j:j+block_size]
                 
@@ -214,16 +228,26 @@ class WebPCompressor:
                 result[i:i+block_size, j:j+block_size] = np.clip(
                     predicted + processed_residual, 0, 255
                 )
+
+            if progress is not None:
+                progress.advance()
         
         # Remove padding
         return result[:height, :width]
 
     @staticmethod
-    def get_compress_image(image: Image.Image, quality: int = 85) -> Image.Image:
+    def get_compress_image(
+        image: Image.Image,
+        quality: int = 85,
+        cancel_token: 'CancellationToken' = None,
+        progress_callback: Callable[[int, int], None] = None
+    ) -> Image.Image:
         """
         Compress an image using WebP-like compression
         :param image: Input image
         :param quality: Compression quality (1-100), defaults to 85
+        :param cancel_token: Optional token checked between block rows
+        :param progress_callback: Optional function called with (block rows done, total block rows)
         :return: Compressed image
         """
         # Validate input
@@ -232,15 +256,20 @@ class WebPCompressor:
         # Convert to YUV color space
         yuv_img = WebPCompressor.rgb_to_yuv(image)
 
+        # Use different block sizes for luma (Y) and chroma (U,V)
+        block_sizes = [WebPCompressor.LUMA_16x16, WebPCompressor.CHROMA_8x8, WebPCompressor.CHROMA_8x8]
+        total_rows = sum((yuv_img.shape[0] + size - 1) // size for size in block_sizes)
+        progress = ProgressReporter(progress_callback, total_rows)
+
         # Process channels
         channels = []
-        for i, channel in enumerate(tqdm(np.dsplit(yuv_img, 3), desc="Compressing", total=3)):
-            # Use different block sizes for luma (Y) and chroma (U,V)
-            block_size = WebPCompressor.LUMA_16x16 if i == 0 else WebPCompressor.CHROMA_8x8
+        for channel, block_size in zip(np.dsplit(yuv_img, 3), block_sizes):
             compressed = WebPCompressor.compress_channel(
                 channel.squeeze(), 
                 quality,
-                block_size
+                block_size,
+                cancel_token,
+                progress
             )
             channels.append(compressed)
 
@@ -251,14 +280,21 @@ class WebPCompressor:
         return Image.fromarray(rgb_img)
 
 
-def webp_compression(image: Image.Image, quality: int = 85) -> Image.Image:
+def webp_compression(
+    image: Image.Image,
+    quality: int = 85,
+    cancel_token: 'CancellationToken' = None,
+    progress_callback: Callable[[int, int], None] = None
+) -> Image.Image:
     """
     Wrapper for WebP compression
     :param image: Input image
     :param quality: Compression quality (1-100), defaults to 85
+    :param cancel_token: Optional token checked between block rows
+    :param progress_callback: Optional function called with (block rows done, total block rows)
     :return: Compressed image
     """
-    return WebPCompressor.get_compress_image(image, quality)
+    return WebPCompressor.get_compress_image(image, quality, cancel_token, progress_callback)
 
 
 if __name__ == '__main__':
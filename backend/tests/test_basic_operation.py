@@ -187,3 +187,86 @@ def test_basic_operation_invalid_image(client: FlaskClient):
     json_response = response.get_json()
     assert not json_response.get('success', True)
     assert 'not found' in json_response.get('message', '').lower()
+
+def test_operation_dry_run(client: FlaskClient, temp_image: str):
+    """Test that a dry run returns the operation plan without writing an image."""
+    image_id = upload_image(client, temp_image)
+    operation_data = {
+        'image_id': image_id,
+        'operations': {
+            'flip': {'direction': 'horizontal'},
+            'rotate': {'angle': 180}
+        },
+        'dry_run': True
+    }
+    response = client.post(
+        '/api/basic_operation',
+        content_type='application/json',
+        data=json.dumps(operation_data)
+    )
+    assert response.status_code == 200
+    json_response = response.get_json()
+    assert json_response['success'] is True
+    assert json_response['plan'] == [{'op': 'transpose', 'method': 'FLIP_TOP_BOTTOM'}]
+    assert json_response['pass_count'] == 1
+    assert not os.path.exists(os.path.join('modified', f'{image_id}_modified.png'))
+
+def test_operation_prefix_reuse(client: FlaskClient, temp_image: str):
+    """Test that changing the last operation only recomputes that operation."""
+    image_id = upload_image(client, temp_image)
+    operations = {
+        'resize': {'width': 80, 'height': 60},
+        'rotate': {'angle': 15},
+        'crop': {'left': 10, 'top': 10, 'right': 50, 'bottom': 40}
+    }
+
+    def apply(operations: dict) -> dict:
+        response = client.post(
+            '/api/basic_operation',
+            content_type='application/json',
+            data=json.dumps({'image_id': image_id, 'operations': operations})
+        )
+        assert response.status_code == 200
+        return response.get_json()
+
+    assert apply(operations)['step_cache']['reused_operations'] == 0
+
+    operations['crop'] = {'left': 20, 'top': 20, 'right': 60, 'bottom': 50}
+    json_response = apply(operations)
+    assert json_response['step_cache']['reused_operations'] == 2
+    assert json_response['step_cache']['recomputed_operations'] == 1
+    with Image.open(json_response['modified_image_url']) as img:
+        assert img.size == (40, 30)
+
+    assert apply(operations)['step_cache']['reused_operations'] == 3
+
+def test_fused_last_operation_is_not_split_off(client: FlaskClient, temp_image: str):
+    """Test that an operation fused with the one before runs in one pass, as the dry run reports."""
+    image_id = upload_image(client, temp_image)
+    operations = {
+        'resize': {'width': 90, 'height': 90},
+        'rotate': {'angle': 30}
+    }
+
+    def post(operations: dict, dry_run: bool = False) -> dict:
+        response = client.post(
+            '/api/basic_operation',
+            content_type='application/json',
+            data=json.dumps({'image_id': image_id, 'operations': operations, 'dry_run': dry_run})
+        )
+        assert response.status_code == 200
+        return response.get_json()
+
+    json_response = post(operations, dry_run=True)
+    assert [step['op'] for step in json_response['plan']] == ['affine']
+    assert json_response['reused_operations'] == 0
+    assert post(operations)['step_cache']['reused_operations'] == 0
+
+    # The whole chain is cached, but not the resize on its own
+    json_response = post(operations, dry_run=True)
+    assert json_response['plan'] == []
+    assert json_response['reused_operations'] == 2
+
+    operations['rotate'] = {'angle': 45}
+    assert [step['op'] for step in post(operations, dry_run=True)['plan']] == ['affine']
+    assert post(operations)['step_cache']['recomputed_operations'] == 2
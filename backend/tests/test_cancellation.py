@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+from flask.testing import FlaskClient
+from PIL import Image
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from utils.cancellation import (
+    CancellationToken,
+    OperationCancelledError,
+    OperationTimeoutError,
+    abort_result,
+    register_operation,
+    release_operation
+)
+from utils.jpeg_compression import jpeg_compression
+from utils.watermark_image import watermark_image
+from utils.webp_compression import webp_compression
+
+
+def test_token_deadline():
+    """
+    Test that a token raises once its deadline has passed
+    """
+    token = CancellationToken(timeout_ms=1)
+    time.sleep(0.01)
+
+    with pytest.raises(OperationTimeoutError):
+        token.check()
+
+
+def test_compressors_stop_when_cancelled():
+    """
+    Test that the compressors and the watermark stop on a cancelled token
+    """
+    test_image = Image.new('RGB', (64, 64), color='red')
+    token = CancellationToken()
+    token.cancel()
+
+    with pytest.raises(OperationCancelledError):
+        jpeg_compression(test_image, 50, token)
+
+    with pytest.raises(OperationCancelledError):
+        webp_compression(test_image, 50, token)
+
+    with pytest.raises(OperationCancelledError):
+        watermark_image(test_image, 'Test', 'center', cancel_token=token)
+
+
+def test_newer_operation_supersedes_older():
+    """
+    Test that registering an operation cancels the older one on the same image
+    """
+    older = register_operation('image-id', 'compress')
+    newer = register_operation('image-id', 'compress')
+    other = register_operation('image-id', 'watermark')
+
+    assert older.is_cancelled
+    assert not newer.is_cancelled
+    assert not other.is_cancelled
+
+    release_operation('image-id', 'compress', newer)
+    release_operation('image-id', 'watermark', other)
+
+
+def test_abort_result():
+    """
+    Test the failure result of an aborted operation
+    """
+    result = abort_result(OperationTimeoutError('Operation timed out'), 'Compression')
+
+    assert result['success'] is False
+    assert result['error'] == 'timeout'
+    assert result['message'] == 'Compression aborted: Operation timed out'
+
+
+@pytest.mark.parametrize('timeout_ms', ['100', 0, -5, 1.5, True])
+def test_invalid_timeouts_are_rejected(client: 'FlaskClient', timeout_ms):
+    """
+    Test that timeouts other than a positive integer are rejected before any work starts
+    """
+    requests = [
+        ('/api/compress', {'image_id': 'image', 'compression_format': 'webp', 'compression_quality': 75}),
+        ('/api/compress/batch', {'image_ids': ['image'], 'compression_format': 'webp', 'compression_quality': 75}),
+        ('/api/watermark', {'image_id': 'image'}),
+        ('/api/watermark/batch', {'image_ids': ['image']}),
+        ('/api/basic_operation', {'image_id': 'image', 'operations': {'grayscale': {}}}),
+        ('/api/pipeline', {'image_id': 'image', 'steps': [{'type': 'watermark'}]}),
+        ('/api/renditions', {'image_id': 'image'}),
+        ('/api/session/session/commit', {'steps': []})
+    ]
+    for url, data in requests:
+        response = client.post(url, content_type='application/json', data=json.dumps(dict(data, timeout_ms=timeout_ms)))
+        assert response.status_code == 400, url
+        assert response.get_json()['message'] == 'Timeout must be a positive number of milliseconds'
@@ -0,0 +1,124 @@
+import hashlib
+import io
+import json
+import os
+import sys
+
+import pytest
+from flask.testing import FlaskClient
+from werkzeug.exceptions import ClientDisconnected
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from services.chunked_upload_service import create_chunked_upload, write_upload_chunk
+
+
+def test_chunked_upload_resumes_out_of_order(client: 'FlaskClient', temp_image: str):
+    """Test a chunked upload sent in two chunks, the second one first."""
+    data = temp_image.getvalue()
+    half = len(data) // 2
+
+    create_response = client.post(
+        '/api/upload/chunked',
+        content_type='application/json',
+        data=json.dumps({'filename': 'test_image.png', 'size': len(data)})
+    )
+    assert create_response.status_code == 201
+    upload_id = create_response.get_json()['upload_id']
+
+    response = client.put(f'/api/upload/chunked/{upload_id}?offset={half}', data=data[half:])
+    assert response.get_json()['received_ranges'] == [[half, len(data)]]
+
+    # Finalizing before every byte arrived is refused, the status tells what is missing
+    response = client.post(f'/api/upload/chunked/{upload_id}/finalize')
+    assert response.status_code == 409
+    status = client.get(f'/api/upload/chunked/{upload_id}').get_json()
+    assert status['bytes_received'] == len(data) - half
+    assert status['complete'] is False
+
+    response = client.put(f'/api/upload/chunked/{upload_id}?offset=0', data=data[:half])
+    assert response.get_json()['complete'] is True
+
+    response = client.post(f'/api/upload/chunked/{upload_id}/finalize')
+    json_response = response.get_json()
+    assert json_response['success'] is True
+    with open(json_response['original_image_url'], 'rb') as f:
+        assert f.read() == data
+
+    # The upload session is gone once the image exists
+    assert client.get(f'/api/upload/chunked/{upload_id}').status_code == 404
+
+
+def test_chunked_upload_rejects_bad_chunks(client: 'FlaskClient'):
+    """Test chunks outside the file and unknown uploads."""
+    create_response = client.post(
+        '/api/upload/chunked',
+        content_type='application/json',
+        data=json.dumps({'filename': 'test_image.png', 'size': 10})
+    )
+    upload_id = create_response.get_json()['upload_id']
+
+    response = client.put(f'/api/upload/chunked/{upload_id}?offset=8', data=b'abcd')
+    assert response.status_code == 400
+
+    response = client.put(f'/api/upload/chunked/{"0" * 32}?offset=0', data=b'abcd')
+    assert response.status_code == 404
+
+    assert client.delete(f'/api/upload/chunked/{upload_id}').status_code == 200
+
+    response = client.post(
+        '/api/upload/chunked',
+        content_type='application/json',
+        data=json.dumps({'filename': 'notes.txt', 'size': 10})
+    )
+    assert response.status_code == 400
+
+
+def test_chunked_upload_in_order_is_hashed_while_written(
+    client: 'FlaskClient',
+    temp_image: str,
+    monkeypatch: 'pytest.MonkeyPatch'
+):
+    """Test that an upload received in order is not read again to hash it."""
+    data = temp_image.getvalue()
+    third = len(data) // 3
+    upload_id = create_chunked_upload('test_image.png', len(data))['upload_id']
+    for start, end in [(0, third), (third, 2 * third), (2 * third, len(data))]:
+        client.put(f'/api/upload/chunked/{upload_id}?offset={start}', data=data[start:end])
+
+    def file_content_hash(path):
+        raise AssertionError('The upload was hashed again')
+
+    monkeypatch.setattr('utils.blob_store.file_content_hash', file_content_hash)
+    json_response = client.post(f'/api/upload/chunked/{upload_id}/finalize').get_json()
+    assert json_response['success'] is True
+    assert json_response['content_hash'] == hashlib.sha256(data).hexdigest()
+
+
+class DisconnectingStream(io.BytesIO):
+    """Request body whose client disconnects once the buffered bytes are read."""
+
+    def read(self, size: int = -1) -> bytes:
+        block = super().read(size)
+        if not block:
+            raise ClientDisconnected()
+        return block
+
+
+def test_chunked_upload_keeps_bytes_of_dropped_chunk(client: 'FlaskClient', temp_image: str):
+    """Test that a chunk cut off by a disconnect keeps the bytes that arrived."""
+    data = temp_image.getvalue()
+    half = len(data) // 2
+    upload_id = create_chunked_upload('test_image.png', len(data))['upload_id']
+
+    write_upload_chunk(upload_id, 0, DisconnectingStream(data[:half]), len(data))
+
+    status = client.get(f'/api/upload/chunked/{upload_id}').get_json()
+    assert status['received_ranges'] == [[0, half]]
+
+    response = client.put(f'/api/upload/chunked/{upload_id}?offset={half}', data=data[half:])
+    assert response.get_json()['complete'] is True
+
+    json_response = client.post(f'/api/upload/chunked/{upload_id}/finalize').get_json()
+    assert json_response['content_hash'] == hashlib.sha256(data).hexdigest()
@@ -0,0 +1,73 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+from flask.testing import FlaskClient
+from PIL import Image
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from utils.encoder_settings import ENCODER_TIERS, get_encoder_options, save_image
+
+
+def test_every_tier_covers_every_format():
+    """
+    Test that each tier defines options for all output formats
+    """
+    for tier, formats in ENCODER_TIERS.items():
+        assert set(formats) == {'png', 'webp', 'jpeg'}, f"Tier {tier} is missing formats"
+
+
+def test_get_encoder_options():
+    """
+    Test option lookup, format aliases and invalid tiers
+    """
+    assert get_encoder_options('PNG', 'fast')['compress_level'] == 1
+    assert get_encoder_options('webp', 'smallest')['method'] == 6
+    assert get_encoder_options('jpg', 'smallest')['optimize'] is True
+
+    with pytest.raises(ValueError, match="Invalid encoder tier"):
+        get_encoder_options('png', 'ultra')
+
+
+def test_smallest_tier_is_not_larger_than_fast():
+    """
+    Test that the smallest tier does not produce a larger PNG than the fast tier
+    """
+    image = Image.linear_gradient('L').resize((512, 512)).convert('RGB')
+
+    sizes = {}
+    for tier in ['fast', 'smallest']:
+        output = io.BytesIO()
+        save_image(image, output, 'png', tier)
+        sizes[tier] = output.tell()
+
+    assert sizes['smallest'] <= sizes['fast']
+
+
+def test_compress_with_invalid_encoder_tier(client: 'FlaskClient', temp_image: str):
+    """Test compression with an unsupported encoder tier."""
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (temp_image, 'test_image.png')}
+    )
+    compress_data = {
+        'image_id': upload_response.get_json()['image_id'],
+        'compression_format': 'webp',
+        'compression_quality': 75,
+        'encoder_tier': 'ultra'
+    }
+
+    response = client.post(
+        '/api/compress',
+        content_type='application/json',
+        data=json.dumps(compress_data)
+    )
+
+    json_response = response.get_json()
+    assert json_response['success'] is False
+    assert json_response['message'] == 'Invalid encoder tier'
@@ -0,0 +1,84 @@
+import os
+import sys
+
+from PIL import Image
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from utils.image_cache import decoded_image_cache_stats, invalidate_image_file, open_image, open_image_for_size
+from utils.lru_cache import ByteLRUCache
+
+
+def test_byte_lru_cache_eviction():
+    """
+    Test that the cache evicts the least recently used values beyond its size
+    """
+    cache = ByteLRUCache(max_bytes=10)
+    cache.put('a', 'A', 4)
+    cache.put('b', 'B', 4)
+    assert cache.get('a') == 'A'
+
+    cache.put('c', 'C', 4)
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+
+    # Values larger than the whole cache are not stored
+    cache.put('d', 'D', 11)
+    assert cache.get('d') is None
+    assert cache.stats()['total_bytes'] == 8
+
+
+def test_open_image_reuses_decoded_pixels(tmp_path):
+    """
+    Test that repeated opens hit the cache and return copy-on-write views
+    """
+    path = str(tmp_path / 'image.png')
+    Image.new('RGB', (20, 20), color='red').save(path)
+
+    first = open_image(path)
+    hits = decoded_image_cache_stats()['hits']
+    second = open_image(path)
+
+    assert decoded_image_cache_stats()['hits'] == hits + 1
+    assert second.format == 'PNG'
+
+    # Changing one view must not change the cached pixels
+    first.paste((0, 0, 255), (0, 0, 10, 10))
+    assert second.getpixel((0, 0)) == (255, 0, 0)
+    assert open_image(path).getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_open_image_sees_file_changes(tmp_path):
+    """
+    Test that rewritten and invalidated files are decoded again
+    """
+    path = str(tmp_path / 'image.png')
+    Image.new('RGB', (20, 20), color='red').save(path)
+    assert open_image(path).getpixel((0, 0)) == (255, 0, 0)
+
+    Image.new('RGB', (30, 30), color='blue').save(path)
+    assert open_image(path).getpixel((0, 0)) == (0, 0, 255)
+
+    invalidate_image_file(path)
+    misses = decoded_image_cache_stats()['misses']
+    open_image(path)
+    assert decoded_image_cache_stats()['misses'] == misses + 1
+
+
+def test_open_image_for_size_reduces_jpeg_decode(tmp_path):
+    """
+    Test that large JPEG downscales are decoded at a reduced resolution
+    """
+    jpeg_path = str(tmp_path / 'image.jpeg')
+    Image.new('RGB', (1600, 1200), color='green').save(jpeg_path)
+
+    reduced = open_image_for_size(jpeg_path, (100, 75))
+    assert reduced.size == (200, 150)
+
+    # Other formats and small downscales are decoded in full
+    png_path = str(tmp_path / 'image.png')
+    Image.new('RGB', (1600, 1200), color='green').save(png_path)
+    assert open_image_for_size(png_path, (100, 75)).size == (1600, 1200)
+    assert open_image_for_size(jpeg_path, (1000, 750)).size == (1600, 1200)
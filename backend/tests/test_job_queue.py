@@ -0,0 +1,114 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from flask.testing import FlaskClient
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from utils.job_queue import STALE_JOB_TIMEOUT, JobQueue
+
+
+def wait_for_job(get_job, timeout: float = 10) -> dict:
+    """Helper function to poll a job until it is done or failed."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get_job()
+        if job and job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError('Job did not finish in time')
+
+
+def test_job_queue_runs_jobs(tmp_path):
+    """
+    Test that queued jobs are executed with their parameters
+    """
+    def handler(image_id, value):
+        return {'success': value > 0, 'message': f'{image_id}:{value}'}
+
+    queue = JobQueue({'test': handler}, database=str(tmp_path / 'jobs.db'), workers=2)
+    queue.start()
+
+    done_id = queue.enqueue('image', 'test', {'value': 1})
+    failed_id = queue.enqueue('image', 'test', {'value': 0})
+
+    done_job = wait_for_job(lambda: queue.get_job(done_id))
+    failed_job = wait_for_job(lambda: queue.get_job(failed_id))
+
+    assert done_job['status'] == 'done'
+    assert done_job['result']['message'] == 'image:1'
+    assert done_job['run_ms'] is not None
+    assert failed_job['status'] == 'failed'
+    assert len(queue.get_jobs_for_image('image')) == 2
+
+
+def test_stale_jobs_are_requeued(tmp_path):
+    """
+    Test that running jobs without a recent heartbeat are requeued
+    """
+    database = str(tmp_path / 'jobs.db')
+    queue = JobQueue({'test': lambda image_id: {'success': True}}, database=database)
+    job_id = queue.enqueue('image', 'test', {})
+
+    # Simulate a worker that crashed while running the job
+    connection = sqlite3.connect(database)
+    connection.execute(
+        "UPDATE jobs SET status = 'running', attempts = 1, started_at = ?, heartbeat_at = ? WHERE job_id = ?",
+        (time.time(), time.time() - STALE_JOB_TIMEOUT - 1, job_id)
+    )
+    connection.commit()
+    connection.close()
+
+    assert queue.requeue_stale_jobs() == 1
+    assert queue.get_job(job_id)['status'] == 'queued'
+
+
+def test_finished_jobs_are_pruned(tmp_path):
+    """
+    Test that finished jobs are deleted once older than the retention period
+    """
+    queue = JobQueue({'test': lambda image_id: {'success': True}}, database=str(tmp_path / 'jobs.db'))
+    queue.start()
+    finished_id = queue.enqueue('image', 'test', {})
+    wait_for_job(lambda: queue.get_job(finished_id))
+
+    assert queue.prune_finished_jobs(3600) == 0
+    # A negative age puts the cutoff after the finish time
+    assert queue.prune_finished_jobs(-60) == 1
+    assert queue.get_job(finished_id) is None
+
+
+def test_async_compress(client: 'FlaskClient', temp_image: str):
+    """Test queuing a compression and following it through the status endpoint."""
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (temp_image, 'test_image.png')}
+    )
+    image_id = upload_response.get_json()['image_id']
+
+    response = client.post(
+        '/api/compress',
+        content_type='application/json',
+        data=json.dumps({
+            'image_id': image_id,
+            'compression_format': 'webp',
+            'compression_quality': 75,
+            'async': True
+        })
+    )
+
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    def get_job():
+        jobs = client.get(f'/api/status/{image_id}').get_json()['jobs']
+        return next((job for job in jobs if job['job_id'] == job_id), None)
+
+    job = wait_for_job(get_job)
+    assert job['status'] == 'done'
+    assert job['result']['success'] is True
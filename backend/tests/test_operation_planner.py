@@ -0,0 +1,154 @@
+import os
+import sys
+
+import numpy as np
+from PIL import Image, ImageChops
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from utils.operation_planner import execute_plan, plan_operations
+
+
+def apply_naively(img: Image.Image, operations: dict) -> Image.Image:
+    """Apply the operations one by one, as basic_operation did before planning."""
+    for operation, params in operations.items():
+        if operation == 'resize':
+            img = img.resize((params['width'], params['height']))
+        elif operation == 'rotate':
+            img = img.rotate(params['angle'])
+        elif operation == 'crop':
+            img = img.crop((params['left'], params['top'], params['right'], params['bottom']))
+        elif operation == 'flip':
+            img = img.transpose(Image.FLIP_LEFT_RIGHT if params['direction'] == 'horizontal' else Image.FLIP_TOP_BOTTOM)
+        elif operation == 'grayscale':
+            img = img.convert('L')
+    return img
+
+
+def make_image(size=(120, 80)) -> Image.Image:
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+
+
+def make_gradient(size=(120, 80)) -> Image.Image:
+    x = np.linspace(0, 255, size[0])
+    y = np.linspace(0, 255, size[1])
+    channels = [np.add.outer(y, x) / 2, np.tile(x, (size[1], 1)), np.tile(y[:, None], (1, size[0]))]
+    return Image.fromarray(np.stack(channels, axis=-1).astype(np.uint8))
+
+
+def max_difference(first: Image.Image, second: Image.Image) -> int:
+    assert first.size == second.size
+    assert first.mode == second.mode
+    return int(np.asarray(ImageChops.difference(first, second)).max())
+
+
+def test_transposes_and_crops_are_lossless():
+    """
+    Test that flips, 180 degree turns and crops collapse without changing any pixel
+    """
+    img = make_image()
+    operations = {
+        'flip': {'direction': 'horizontal'},
+        'rotate': {'angle': 180},
+        'crop': {'left': 10, 'top': 5, 'right': 70, 'bottom': 60},
+        'grayscale': {}
+    }
+
+    plan = plan_operations(operations, img.size, img.mode)
+    assert [step['op'] for step in plan] == ['crop', 'grayscale', 'transpose']
+    assert plan[-1]['method'] == 'FLIP_TOP_BOTTOM'
+    assert max_difference(execute_plan(img, plan), apply_naively(img, operations)) == 0
+
+
+def test_crop_after_resize_resamples_only_the_kept_region():
+    """
+    Test that a crop after a resize is folded into the resize box
+    """
+    img = make_image()
+    operations = {
+        'resize': {'width': 60, 'height': 40},
+        'crop': {'left': 10, 'top': 10, 'right': 50, 'bottom': 30}
+    }
+
+    plan = plan_operations(operations, img.size, img.mode)
+    assert [step['op'] for step in plan] == ['resize']
+    assert plan[0]['size'] == [40, 20]
+    assert max_difference(execute_plan(img, plan), apply_naively(img, operations)) <= 2
+
+
+def test_resize_and_rotate_merge_into_one_transform():
+    """
+    Test that a small resize and an arbitrary rotation become a single affine transform
+    """
+    img = Image.new('RGB', (120, 80), color='white')
+    operations = {
+        'resize': {'width': 110, 'height': 74},
+        'rotate': {'angle': 30}
+    }
+
+    plan = plan_operations(operations, img.size, img.mode)
+    assert [step['op'] for step in plan] == ['affine']
+
+    planned = np.asarray(execute_plan(img, plan).convert('L'), dtype=np.int16)
+    naive = np.asarray(apply_naively(img, operations).convert('L'), dtype=np.int16)
+    # Only pixels along the edges of the rotated frame may differ
+    assert np.mean(np.abs(planned - naive) > 64) < 0.02
+
+    # Larger downscales and upscales keep a separate, filtered resize
+    for width, height in [(60, 40), (240, 160)]:
+        operations['resize'] = {'width': width, 'height': height}
+        assert [step['op'] for step in plan_operations(operations, img.size, img.mode)] == ['resize', 'rotate']
+
+
+def test_merged_transform_matches_separate_operations():
+    """
+    Test that a merged resize and rotation stays close to running them one by one
+    """
+    img = make_gradient()
+    for operations in [
+        {'resize': {'width': 100, 'height': 70}, 'rotate': {'angle': 30}},
+        {'rotate': {'angle': 30}, 'resize': {'width': 140, 'height': 90}}
+    ]:
+        plan = plan_operations(operations, img.size, img.mode)
+        assert [step['op'] for step in plan] == ['affine']
+
+        planned = np.asarray(execute_plan(img, plan), dtype=np.int16)
+        naive = np.asarray(apply_naively(img, operations), dtype=np.int16)
+        difference = np.abs(planned - naive)
+        assert difference.mean() < 2
+        # Larger differences stay on the edges of the rotated frame
+        assert np.mean(difference > 32) < 0.02
+
+
+def test_rotate_after_cropped_resize_keeps_black_corners():
+    """
+    Test that a rotation after a resize and crop does not read pixels outside the crop
+    """
+    img = Image.new('RGB', (400, 300), color='white')
+    operations = {
+        'resize': {'width': 200, 'height': 150},
+        'crop': {'left': 50, 'top': 50, 'right': 150, 'bottom': 100},
+        'rotate': {'angle': 30}
+    }
+
+    plan = plan_operations(operations, img.size, img.mode)
+    assert [step['op'] for step in plan] == ['resize', 'rotate']
+
+    planned = np.asarray(execute_plan(img, plan).convert('L'))
+    naive = np.asarray(apply_naively(img, operations).convert('L'))
+    assert np.mean(naive == 0) > 0.2
+    assert np.array_equal(planned == 0, naive == 0)
+
+
+def test_quarter_turns_of_rectangular_images_are_kept():
+    """
+    Test that 90 degree rotations of non-square images still crop like Image.rotate()
+    """
+    img = make_image()
+    operations = {'rotate': {'angle': 90}, 'flip': {'direction': 'vertical'}}
+
+    plan = plan_operations(operations, img.size, img.mode)
+    assert [step['op'] for step in plan] == ['rotate', 'transpose']
+    assert max_difference(execute_plan(img, plan), apply_naively(img, operations)) == 0
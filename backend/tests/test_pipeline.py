@@ -0,0 +1,90 @@
+import io
+import json
+import os
+
+from flask.testing import FlaskClient
+from PIL import Image
+
+
+def _upload(client: 'FlaskClient', temp_image) -> str:
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (io.BytesIO(temp_image.getvalue()), 'test_image.png')}
+    )
+    return upload_response.get_json()['image_id']
+
+
+def test_pipeline(client: 'FlaskClient', temp_image: str):
+    """Test running basic operations, watermark and compress in one pass."""
+    image_id = _upload(client, temp_image)
+
+    pipeline_data = {
+        'image_id': image_id,
+        'steps': [
+            {'type': 'basic_operation', 'operations': {'resize': {'width': 50, 'height': 40}}},
+            {'type': 'watermark', 'watermark_text': 'Test', 'position': 'center'},
+            {'type': 'compress', 'compression_format': 'webp', 'compression_quality': 75}
+        ]
+    }
+
+    response = client.post(
+        '/api/pipeline',
+        content_type='application/json',
+        data=json.dumps(pipeline_data)
+    )
+
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['success'] is True
+    assert [timing['stage'] for timing in result['timings']] == ['decode', 'basic_operation', 'watermark', 'compress']
+
+    # Only the final output is written
+    assert os.path.exists(result['compressed_image_url'])
+    assert not os.path.exists(os.path.join('modified', f'{image_id}_modified.png'))
+    assert not os.path.exists(os.path.join('watermarked', f'{image_id}_watermarked.png'))
+    with Image.open(result['compressed_image_url']) as img:
+        assert img.size == (50, 40)
+
+
+def test_pipeline_without_compress(client: 'FlaskClient', temp_image: str):
+    """Test that a pipeline ending with a watermark writes a watermarked image."""
+    image_id = _upload(client, temp_image)
+
+    response = client.post(
+        '/api/pipeline',
+        content_type='application/json',
+        data=json.dumps({
+            'image_id': image_id,
+            'steps': [
+                {'type': 'basic_operation', 'operations': {'grayscale': {}}},
+                {'type': 'watermark', 'watermark_text': 'Test'}
+            ]
+        })
+    )
+
+    result = response.get_json()
+    assert result['success'] is True
+    assert result['watermarked_image_url'].endswith('_watermarked.png')
+    assert result['timings'][-1]['stage'] == 'encode'
+
+
+def test_pipeline_invalid_steps(client: 'FlaskClient', temp_image: str):
+    """Test that compress must be the last pipeline step."""
+    image_id = _upload(client, temp_image)
+
+    response = client.post(
+        '/api/pipeline',
+        content_type='application/json',
+        data=json.dumps({
+            'image_id': image_id,
+            'steps': [
+                {'type': 'compress', 'compression_format': 'webp', 'compression_quality': 75},
+                {'type': 'watermark', 'watermark_text': 'Test'}
+            ]
+        })
+    )
+
+    result = response.get_json()
+    assert result['success'] is False
+    assert 'last' in result['message']
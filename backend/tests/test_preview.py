@@ -0,0 +1,86 @@
+import base64
+import io
+import json
+import os
+import sys
+
+from flask.testing import FlaskClient
+from PIL import Image
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from services.preview_service import get_preview_path
+from utils.speculative import get_speculative_pool
+
+
+def upload_image(client: FlaskClient, size: tuple) -> dict:
+    """Helper function to upload a JPEG image of the given size."""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color=(30, 120, 200)).save(buffer, format='JPEG')
+    buffer.seek(0)
+    response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (buffer, 'test_image.jpg')}
+    )
+    return response.get_json()
+
+
+def get_preview_image(client: FlaskClient, image_id: str, image_type: str) -> Image.Image:
+    """Helper function to fetch and decode the preview of an image."""
+    response = client.get(f'/api/image/{image_id}?type={image_type}&size=preview')
+    assert response.status_code == 200
+    json_response = response.get_json()
+    assert json_response['mimetype'] == 'image/webp'
+    img = Image.open(io.BytesIO(base64.b64decode(json_response['image_base64'])))
+    assert img.format == 'WEBP'
+    return img
+
+
+def test_preview_generated_in_background(client: FlaskClient):
+    """
+    Test that uploads get a preview in the background, fitted within the preview size
+    """
+    upload_json = upload_image(client, (1200, 800))
+    pool = get_speculative_pool()
+    assert pool.join(10)
+    assert os.path.exists(get_preview_path(upload_json['original_image_url']))
+
+    hits = pool.stats()['hits']
+    assert get_preview_image(client, upload_json['image_id'], 'original').size == (512, 341)
+    assert pool.stats()['hits'] == hits + 1
+
+    # The full-resolution image is still served by default
+    response = client.get(f"/api/image/{upload_json['image_id']}?type=original")
+    assert response.get_json()['mimetype'] == 'image/jpeg'
+
+
+def test_preview_follows_rewritten_output(client: FlaskClient):
+    """
+    Test that the preview of a processed output is regenerated when the output changes
+    """
+    image_id = upload_image(client, (300, 200))['image_id']
+
+    for width, height in [(240, 160), (100, 150)]:
+        response = client.post(
+            '/api/basic_operation',
+            content_type='application/json',
+            data=json.dumps({
+                'image_id': image_id,
+                'operations': {'resize': {'width': width, 'height': height}}
+            })
+        )
+        assert response.get_json()['success'] is True
+        # Smaller images keep their size
+        assert get_preview_image(client, image_id, 'basicOperation').size == (width, height)
+
+
+def test_invalid_preview_size(client: FlaskClient):
+    """
+    Test that unknown image sizes are rejected
+    """
+    image_id = upload_image(client, (100, 100))['image_id']
+    response = client.get(f'/api/image/{image_id}?type=original&size=huge')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+from flask.testing import FlaskClient
+from PIL import Image
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import api.progress
+from services.compress_service import compress_image
+from utils.jpeg_compression import jpeg_compression
+from utils.progress import (
+    ProgressReporter,
+    expire_progress,
+    finish_progress,
+    get_progress,
+    start_progress,
+    update_progress
+)
+
+
+def test_progress_reporter_throttles_reports():
+    """
+    Test that the reporter throttles reports but always reports completion
+    """
+    reports = []
+    progress = ProgressReporter(lambda done, total: reports.append((done, total)), 100, min_interval=60)
+
+    for _ in range(100):
+        progress.advance()
+
+    assert reports == [(1, 100), (100, 100)]
+
+
+def test_jpeg_compression_reports_block_rows():
+    """
+    Test that JPEG compression reports every block row of the three channels
+    """
+    reports = []
+    jpeg_compression(
+        Image.new('RGB', (40, 30), color='red'),
+        progress_callback=lambda done, total: reports.append((done, total))
+    )
+
+    assert reports[-1] == (12, 12)
+
+
+def test_progress_stream(client: 'FlaskClient', temp_image: str):
+    """Test the Server-Sent Events progress stream of a compression."""
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (temp_image, 'test_image.png')}
+    )
+    image_id = upload_response.get_json()['image_id']
+
+    # Subscribe before starting the operation
+    response = client.get(f'/api/progress/{image_id}', buffered=False)
+
+    compress_image(image_id, 'jpeg', 0.5)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    events = [
+        json.loads(line[len('data: '):])
+        for line in response.get_data(as_text=True).splitlines()
+        if line.startswith('data: ')
+    ]
+    assert events[-1]['operation'] == 'compress'
+    assert events[-1]['status'] == 'done'
+    assert events[-1]['percent'] == 100.0
+
+
+def test_progress_stream_reports_finished_operation_once(
+    client: 'FlaskClient',
+    monkeypatch: 'pytest.MonkeyPatch'
+):
+    """
+    Test that a stream opened after an operation finished reports it and closes at once
+    """
+    # A regression would wait for the next operation instead of hanging the suite
+    monkeypatch.setattr(api.progress, 'IDLE_TIMEOUT', 5)
+    start_progress('finished_image', 'compress')
+    finish_progress('finished_image', 'compress', True)
+
+    started = time.monotonic()
+    data = client.get('/api/progress/finished_image').get_data(as_text=True)
+
+    assert time.monotonic() - started < 1
+    assert ': keep-alive' not in data
+    events = [json.loads(line[len('data: '):]) for line in data.splitlines() if line.startswith('data: ')]
+    assert [event['status'] for event in events] == ['done']
+
+
+def test_progress_stream_of_unknown_image(client: 'FlaskClient'):
+    """
+    Test that a stream of an image without progress, jobs or files is refused
+    """
+    response = client.get('/api/progress/unknown_image')
+
+    assert response.status_code == 404
+    assert response.get_json()['success'] is False
+
+
+def test_progress_is_kept_per_operation():
+    """
+    Test that operations on the same image report their progress separately
+    """
+    start_progress('busy_image', 'compress')
+    start_progress('busy_image', 'watermark')
+    update_progress('busy_image', 'compress', 1, 2)
+    finish_progress('busy_image', 'watermark', True)
+
+    assert get_progress('busy_image', 'compress')['status'] == 'running'
+    assert get_progress('busy_image', 'compress')['percent'] == 50.0
+    assert get_progress('busy_image', 'watermark')['status'] == 'done'
+    # Without an operation the most recent change is reported
+    assert get_progress('busy_image')['operation'] == 'watermark'
+
+
+def test_expire_progress_keeps_running_operations():
+    """
+    Test that only finished progress states are expired
+    """
+    start_progress('running_image', 'compress')
+    start_progress('done_image', 'compress')
+    finish_progress('done_image', 'compress', True)
+
+    expire_progress(0)
+
+    assert get_progress('running_image')['status'] == 'running'
+    assert get_progress('done_image') is None
@@ -0,0 +1,54 @@
+import io
+import json
+import os
+
+from flask.testing import FlaskClient
+from PIL import Image
+
+
+def test_renditions(client: 'FlaskClient'):
+    """Test building several widths of an image in one request."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (1000, 500), color='red').save(buffer, format='JPEG')
+    buffer.seek(0)
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (buffer, 'test_image.jpg')}
+    )
+    image_id = upload_response.get_json()['image_id']
+
+    response = client.post(
+        '/api/renditions',
+        content_type='application/json',
+        data=json.dumps({'image_id': image_id, 'widths': [640, 320, 1280], 'format': 'webp'})
+    )
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['success'] is True
+    assert result['skipped_widths'] == [1280]
+    assert [(rendition['width'], rendition['height']) for rendition in result['renditions']] == [(320, 160), (640, 320)]
+
+    for rendition in result['renditions']:
+        assert os.path.getsize(rendition['path']) == rendition['bytes']
+        with Image.open(rendition['path']) as img:
+            assert img.format == 'WEBP'
+            assert img.size == (rendition['width'], rendition['height'])
+
+    assert result['srcset'].endswith('640w')
+
+
+def test_renditions_invalid_format(client: 'FlaskClient', temp_image: str):
+    """Test that unsupported rendition formats are rejected."""
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (temp_image, 'test_image.png')}
+    )
+    response = client.post(
+        '/api/renditions',
+        content_type='application/json',
+        data=json.dumps({'image_id': upload_response.get_json()['image_id'], 'format': 'bmp'})
+    )
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Invalid rendition format'
@@ -0,0 +1,99 @@
+import io
+import json
+import os
+import sys
+
+from flask.testing import FlaskClient
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from utils.result_cache import ResultCache
+
+
+def test_result_cache_lru_eviction(tmp_path):
+    """
+    Test that the cache evicts the least recently used entries beyond its size
+    """
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=20)
+    source = tmp_path / 'source.webp'
+    source.write_bytes(b'0123456789')
+
+    cache.put('a', str(source))
+    cache.put('b', str(source))
+    assert cache.get('a', str(tmp_path / 'out.webp'))
+
+    # Adding a third entry evicts 'b', the least recently used one
+    cache.put('c', str(source))
+    assert not cache.get('b', str(tmp_path / 'out.webp'))
+    assert cache.get('c', str(tmp_path / 'out.webp'))
+
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+    assert stats['bytes_saved'] == 20
+
+
+def test_result_cache_reloads_index(tmp_path):
+    """
+    Test that cached files survive a restart
+    """
+    source = tmp_path / 'source.jpeg'
+    source.write_bytes(b'jpeg bytes')
+    ResultCache(str(tmp_path / 'cache')).put('key', str(source))
+
+    cache = ResultCache(str(tmp_path / 'cache'))
+    assert cache.get('key', str(tmp_path / 'out.jpeg'))
+    assert (tmp_path / 'out.jpeg').read_bytes() == b'jpeg bytes'
+
+
+def test_result_cache_drops_interrupted_writes(tmp_path):
+    """
+    Test that temporary files of interrupted writes are not loaded as entries
+    """
+    source = tmp_path / 'source.jpeg'
+    source.write_bytes(b'jpeg bytes')
+    ResultCache(str(tmp_path / 'cache')).put('key', str(source))
+    leftover = tmp_path / 'cache' / 'key.jpeg.1234.tmp'
+    leftover.write_bytes(b'partial')
+
+    cache = ResultCache(str(tmp_path / 'cache'))
+    assert cache.stats()['entries'] == 1
+    assert cache.stats()['total_bytes'] == len(b'jpeg bytes')
+    assert not leftover.exists()
+    assert cache.get('key', str(tmp_path / 'out.jpeg'))
+    assert (tmp_path / 'out.jpeg').read_bytes() == b'jpeg bytes'
+
+
+def test_repeated_compression_hits_cache(client: 'FlaskClient', temp_image: str):
+    """Test that compressing identical content twice is served from the cache."""
+    temp_bytes = temp_image.getvalue()
+    compress_data = {
+        'compression_format': 'webp',
+        'compression_quality': 75
+    }
+
+    results = []
+    for _ in range(2):
+        upload_response = client.post(
+            '/api/upload',
+            content_type='multipart/form-data',
+            data={'file': (io.BytesIO(temp_bytes), 'test_image.png')}
+        )
+        compress_data['image_id'] = upload_response.get_json()['image_id']
+        response = client.post(
+            '/api/compress',
+            content_type='application/json',
+            data=json.dumps(compress_data)
+        )
+        results.append(response.get_json())
+
+    assert results[1]['success'] is True
+    assert results[1]['cache_hit'] is True
+    assert os.path.exists(results[1]['compressed_image_url'])
+
+    stats = client.get('/api/cache/stats').get_json()['result_cache']
+    assert stats['hits'] >= 1
+    assert stats['bytes_saved'] > 0
+
@@ -0,0 +1,97 @@
+import base64
+import io
+import json
+import os
+
+from flask.testing import FlaskClient
+from PIL import Image
+
+
+def upload_large_image(client: 'FlaskClient') -> str:
+    """Helper function to upload a large JPEG and return its ID."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (2400, 1600), color='blue').save(buffer, format='JPEG')
+    buffer.seek(0)
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (buffer, 'large_image.jpg')}
+    )
+    return upload_response.get_json()['image_id']
+
+
+def test_session_preview_and_commit(client: 'FlaskClient'):
+    """Test rendering previews on the proxy and committing at full resolution."""
+    image_id = upload_large_image(client)
+
+    response = client.post(
+        '/api/session',
+        content_type='application/json',
+        data=json.dumps({'image_id': image_id, 'viewport_width': 600, 'viewport_height': 600})
+    )
+    assert response.status_code == 200
+    session = response.get_json()
+    assert session['source_size'] == [2400, 1600]
+    assert session['proxy_size'] == [600, 400]
+
+    steps = [
+        {'type': 'basic_operation', 'operations': {'crop': {'left': 400, 'top': 400, 'right': 2000, 'bottom': 1200}}},
+        {'type': 'watermark', 'watermark_text': 'Test', 'fontSize': 80}
+    ]
+
+    response = client.post(
+        f"/api/session/{session['session_id']}/preview",
+        content_type='application/json',
+        data=json.dumps({'steps': steps})
+    )
+    assert response.status_code == 200
+    preview = response.get_json()
+    assert preview['preview_size'] == [400, 200]
+    with Image.open(io.BytesIO(base64.b64decode(preview['image_base64']))) as img:
+        assert img.size == (400, 200)
+
+    # Nothing is written until the session is committed
+    assert not os.path.exists(os.path.join('watermarked', f'{image_id}_watermarked.png'))
+
+    response = client.post(
+        f"/api/session/{session['session_id']}/commit",
+        content_type='application/json',
+        data=json.dumps({'steps': steps})
+    )
+    assert response.status_code == 200
+    with Image.open(response.get_json()['watermarked_image_url']) as img:
+        assert img.size == (1600, 800)
+
+
+def test_closed_session(client: 'FlaskClient'):
+    """Test that closed sessions no longer render previews."""
+    image_id = upload_large_image(client)
+    session_id = client.post(
+        '/api/session',
+        content_type='application/json',
+        data=json.dumps({'image_id': image_id})
+    ).get_json()['session_id']
+
+    assert client.delete(f'/api/session/{session_id}').status_code == 200
+
+    response = client.post(
+        f'/api/session/{session_id}/preview',
+        content_type='application/json',
+        data=json.dumps({'steps': [{'type': 'watermark', 'watermark_text': 'Test'}]})
+    )
+    assert response.status_code == 404
+    assert client.delete(f'/api/session/{session_id}').status_code == 404
+
+
+def test_invalid_viewport_size(client: 'FlaskClient'):
+    """Test that viewport sizes that are not positive numbers are rejected."""
+    image_id = upload_large_image(client)
+
+    for viewport_width in ['wide', [600], -1]:
+        response = client.post(
+            '/api/session',
+            content_type='application/json',
+            data=json.dumps({'image_id': image_id, 'viewport_width': viewport_width, 'viewport_height': 600})
+        )
+        assert response.status_code == 400
+        assert response.get_json()['message'] == 'Invalid viewport size'
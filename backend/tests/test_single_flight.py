@@ -0,0 +1,72 @@
+import os
+import sys
+import threading
+import time
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from utils.single_flight import SingleFlight, coalesce
+
+
+def test_concurrent_calls_run_once():
+    """
+    Test that identical concurrent calls share the result of the first one
+    """
+    single_flight = SingleFlight()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'success': True}
+
+    def request():
+        results.append(single_flight.do('key', compute))
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert single_flight.stats() == {'in_flight': 0, 'executed': 1, 'coalesced': 3}
+
+    # Once the call finished, the next one computes again
+    single_flight.do('key', compute)
+    assert len(calls) == 2
+
+
+def test_coalesced_errors_and_results():
+    """
+    Test that errors reach every waiting caller and results are marked as shared
+    """
+    single_flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError('boom')
+
+    def request():
+        try:
+            single_flight.do('key', fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=request)
+    leader.start()
+    started.wait()
+    request()
+    leader.join()
+    assert errors == ['boom', 'boom']
+
+    assert coalesce('image', 'compress', {'quality': 0.5}, lambda: {'success': True}) == {
+        'success': True,
+        'coalesced': False
+    }
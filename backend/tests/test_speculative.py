@@ -0,0 +1,123 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from flask.testing import FlaskClient
+from PIL import Image
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from app import create_app
+from utils.cancellation import OperationCancelledError
+from utils.speculative import SpeculativePool, get_speculative_pool
+
+
+def test_speculative_pool_yields_to_foreground():
+    """
+    Test that foreground requests interrupt speculative tasks, which are retried once idle
+    """
+    pool = SpeculativePool(idle_delay=0.05)
+    started = threading.Event()
+    attempts = []
+
+    def task(cancel_token):
+        attempts.append(1)
+        if len(attempts) == 1:
+            started.set()
+            while not cancel_token.is_cancelled:
+                time.sleep(0.01)
+            raise OperationCancelledError('Operation was cancelled')
+        return 'output'
+
+    pool.submit('image', 'task', task)
+    assert started.wait(5)
+    pool.begin_foreground()
+    pool.end_foreground()
+    assert pool.join(5)
+
+    assert len(attempts) == 2
+    assert pool.record_hit('output') is True
+    assert pool.record_hit('output') is False
+
+    stats = pool.stats()
+    assert stats['completed'] == 1
+    assert stats['hit_ratio'] == 1.0
+    assert stats['waste_ratio'] == 0.0
+
+
+def test_speculative_pool_drops_oldest_pending_task():
+    """
+    Test that the pending tasks are capped, dropping the oldest ones
+    """
+    pool = SpeculativePool(idle_delay=0.05, max_pending=2)
+    ran = []
+
+    # Nothing runs while a foreground request is active
+    pool.begin_foreground()
+    for name in ['first', 'second', 'third']:
+        pool.submit('image', name, lambda cancel_token, name=name: ran.append(name))
+    assert pool.stats()['pending'] == 2
+    assert pool.stats()['dropped'] == 1
+
+    pool.end_foreground()
+    assert pool.join(5)
+    assert ran == ['second', 'third']
+
+
+def test_first_request_is_marked_as_foreground(monkeypatch):
+    """
+    Test that the one-time startup hook does not skip the foreground hook of the first request
+    """
+    pool = get_speculative_pool()
+    begin_foreground = pool.begin_foreground
+    calls = []
+
+    def counting_begin_foreground():
+        calls.append(1)
+        begin_foreground()
+
+    monkeypatch.setattr(pool, 'begin_foreground', counting_begin_foreground)
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        client.post('/api/session', content_type='application/json', data=json.dumps({}))
+        client.post('/api/session', content_type='application/json', data=json.dumps({}))
+
+    assert len(calls) == 2
+
+
+def test_upload_precompute_serves_compression(client: 'FlaskClient'):
+    """Test that a precomputed default compression is served from the cache."""
+    rng = np.random.default_rng()
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)).save(buffer, format='PNG')
+    buffer.seek(0)
+
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (buffer, 'test_image.png'), 'precompute': 'true'}
+    )
+    upload_json = upload_response.get_json()
+    assert upload_json['precomputing'] == ['compress:jpeg:0.8', 'compress:webp:0.8']
+
+    pool = get_speculative_pool()
+    hits = pool.stats()['hits']
+    assert pool.join(10)
+
+    response = client.post(
+        '/api/compress',
+        content_type='application/json',
+        data=json.dumps({
+            'image_id': upload_json['image_id'],
+            'compression_format': 'webp',
+            'compression_quality': 0.8
+        })
+    )
+    assert response.get_json()['cache_hit'] is True
+    assert pool.stats()['hits'] == hits + 1
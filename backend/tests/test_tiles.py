@@ -0,0 +1,60 @@
+import io
+import json
+
+from flask.testing import FlaskClient
+from PIL import Image
+
+
+def upload_image(client: 'FlaskClient', size: tuple) -> str:
+    """Helper function to upload an image of the given size and return its ID."""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color='green').save(buffer, format='PNG')
+    buffer.seek(0)
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (buffer, 'test_image.png')}
+    )
+    return upload_response.get_json()['image_id']
+
+
+def test_tile_pyramid(client: 'FlaskClient'):
+    """Test building a pyramid and serving its tiles with caching headers."""
+    image_id = upload_image(client, (600, 300))
+
+    response = client.post('/api/tiles', content_type='application/json', data=json.dumps({'image_id': image_id}))
+    assert response.status_code == 200
+    pyramid = response.get_json()
+    assert pyramid['max_level'] == 10
+    assert pyramid['tile_size'] == 256
+    assert pyramid['built'] is True
+
+    # The full-resolution level has 3x2 tiles, the last ones cut at the image edge
+    response = client.get(f'/api/tiles/{image_id}/10/2/1')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert 'immutable' in response.headers['Cache-Control']
+    with Image.open(io.BytesIO(response.data)) as img:
+        assert img.size == (600 - 512, 300 - 256)
+
+    # Level 0 is a single pixel
+    with Image.open(io.BytesIO(client.get(f'/api/tiles/{image_id}/0/0/0').data)) as img:
+        assert img.size == (1, 1)
+
+    response = client.get(f'/api/tiles/{image_id}/10/2/1', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+    assert client.get(f'/api/tiles/{image_id}/10/3/0').status_code == 404
+    assert client.post(
+        '/api/tiles', content_type='application/json', data=json.dumps({'image_id': image_id})
+    ).get_json()['built'] is False
+
+
+def test_tiles_built_on_demand(client: 'FlaskClient'):
+    """Test that the first tile request builds the pyramid."""
+    image_id = upload_image(client, (100, 100))
+
+    response = client.get(f'/api/tiles/{image_id}/7/0/0')
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.data)) as img:
+        assert img.size == (100, 100)
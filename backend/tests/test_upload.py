@@ -1,6 +1,11 @@
 import io
+import os
 
+import pytest
 from flask.testing import FlaskClient
+from PIL import Image, ImageFile
+
+from utils.image_metadata import read_image_header
 
 
 def test_upload_image(client: 'FlaskClient', temp_image: str):
@@ -39,3 +44,108 @@ def test_upload_invalid_file(client: 'FlaskClient'):
 
     assert json_response['success'] is False
     assert json_response['message'] == 'Invalid file type'
+
+
+def test_identical_uploads_share_storage(client: 'FlaskClient', temp_image: str):
+    """Test that identical uploads are stored once and kept until the last one is deleted."""
+    temp_bytes = temp_image.getvalue()
+    uploads = []
+    for _ in range(2):
+        response = client.post(
+            '/api/upload',
+            content_type='multipart/form-data',
+            data={'file': (io.BytesIO(temp_bytes), 'test_image.png')}
+        )
+        uploads.append(response.get_json())
+
+    assert uploads[0]['image_id'] != uploads[1]['image_id']
+    assert uploads[0]['content_hash'] == uploads[1]['content_hash']
+    assert uploads[1]['deduplicated'] is True
+    assert os.path.samefile(uploads[0]['original_image_url'], uploads[1]['original_image_url'])
+
+    blob_path = os.path.join('blobs', uploads[0]['content_hash'])
+    # Read-only files could not be removed on Windows
+    assert os.access(blob_path, os.W_OK)
+    client.delete(f"/api/delete/{uploads[0]['image_id']}")
+    assert os.path.exists(blob_path)
+    with open(uploads[1]['original_image_url'], 'rb') as f:
+        assert f.read() == temp_bytes
+
+    client.delete(f"/api/delete/{uploads[1]['image_id']}")
+    assert not os.path.exists(blob_path)
+
+
+def test_upload_without_hard_links(client: 'FlaskClient', temp_image: str, monkeypatch: 'pytest.MonkeyPatch'):
+    """Test that uploads are stored on filesystems without hard links, leaving no temporary file."""
+    def link(source, destination):
+        raise PermissionError(1, 'Operation not permitted')
+
+    monkeypatch.setattr(os, 'link', link)
+    temp_bytes = temp_image.getvalue()
+    response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (io.BytesIO(temp_bytes), 'test_image.png')}
+    )
+
+    assert response.status_code == 200
+    json_response = response.get_json()
+    with open(json_response['original_image_url'], 'rb') as f:
+        assert f.read() == temp_bytes
+    assert not any(name.endswith('.tmp') for name in os.listdir('blobs'))
+
+
+def test_upload_records_header_metadata(client: 'FlaskClient', temp_image: str):
+    """Test that uploads are identified from their header and the metadata is recorded."""
+    response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (temp_image, 'test_image.png')}
+    )
+    json_response = response.get_json()
+
+    assert json_response['metadata']['format'] == 'PNG'
+    assert (json_response['metadata']['width'], json_response['metadata']['height']) == (100, 100)
+    assert json_response['metadata']['frames'] == 1
+    assert os.path.exists(os.path.join('metadata', f"{json_response['image_id']}.json"))
+
+
+def test_upload_rejects_invalid_images(client: 'FlaskClient', monkeypatch):
+    """Test that corrupt, mislabeled and oversized images are rejected at upload."""
+    bmp = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(bmp, format='BMP')
+    large = io.BytesIO()
+    Image.new('L', (200, 200)).save(large, format='PNG')
+    monkeypatch.setattr('utils.image_metadata.MAX_UPLOAD_PIXELS', 100 * 100)
+
+    cases = [
+        (io.BytesIO(b'not an image at all'), 'Invalid or corrupt image file'),
+        (io.BytesIO(bmp.getvalue()), 'Unsupported image format'),
+        (io.BytesIO(large.getvalue()), 'Image exceeds the pixel limit')
+    ]
+    for file, message in cases:
+        response = client.post(
+            '/api/upload',
+            content_type='multipart/form-data',
+            data={'file': (file, 'image.png')}
+        )
+        json_response = response.get_json()
+        assert json_response['success'] is False
+        assert json_response['message'] == message
+
+
+def test_image_header_is_read_without_decoding(tmp_path, monkeypatch):
+    """Test that the header metadata, EXIF orientation included, never decodes the pixels."""
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    plain_path = str(tmp_path / 'plain.png')
+    rotated_path = str(tmp_path / 'rotated.png')
+    Image.new('RGB', (60, 40)).save(plain_path)
+    Image.new('RGB', (60, 40)).save(rotated_path, exif=exif)
+
+    def fail_load(self):
+        raise AssertionError('Pixels were decoded')
+
+    monkeypatch.setattr(ImageFile.ImageFile, 'load', fail_load)
+    assert read_image_header(plain_path)['orientation'] == 1
+    assert read_image_header(rotated_path)['orientation'] == 6
@@ -1,6 +1,10 @@
+import io
 import json
+import os
 
+import pytest
 from flask.testing import FlaskClient
+from PIL import Image
 
 
 def test_add_watermark(client: 'FlaskClient', temp_image: str):
@@ -64,3 +68,89 @@ def test_watermark_invalid_image(client: 'FlaskClient'):
     json_response = response.get_json()
     assert not json_response.get('success', True)
     assert 'not found' in json_response.get('message', '').lower()
+
+
+def test_pattern_watermark(client: 'FlaskClient', temp_image: str):
+    """Test watermarking with a repeating pattern."""
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (temp_image, 'test_image.png')}
+    )
+    image_id = upload_response.get_json()['image_id']
+
+    watermark_data = {
+        'image_id': image_id,
+        'watermark_text': 'Pattern',
+        'pattern': {'spacing': 20, 'angle': 45, 'stagger': True}
+    }
+
+    response = client.post(
+        '/api/watermark',
+        content_type='application/json',
+        data=json.dumps(watermark_data)
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
+
+
+def test_logo_watermark(client: 'FlaskClient', temp_image: str):
+    """Test uploading a logo and stamping it by ID."""
+    logo = io.BytesIO()
+    Image.new('RGBA', (40, 20), color=(255, 0, 0, 128)).save(logo, format='PNG')
+    logo.seek(0)
+
+    logo_response = client.post(
+        '/api/watermark/logo',
+        content_type='multipart/form-data',
+        data={'file': (logo, 'logo.png')}
+    )
+    logo_json = logo_response.get_json()
+    assert logo_json['success'] is True
+    assert (logo_json['width'], logo_json['height']) == (40, 20)
+
+    upload_response = client.post(
+        '/api/upload',
+        content_type='multipart/form-data',
+        data={'file': (temp_image, 'test_image.png')}
+    )
+    image_id = upload_response.get_json()['image_id']
+
+    response = client.post(
+        '/api/watermark',
+        content_type='application/json',
+        data=json.dumps({
+            'image_id': image_id,
+            'logo_id': logo_json['logo_id'],
+            'logoScale': 0.5,
+            'position': 'center',
+            'rotation': 15
+        })
+    )
+    assert response.get_json()['success'] is True
+
+    # Unknown logos are rejected before any work is done
+    response = client.post(
+        '/api/watermark',
+        content_type='application/json',
+        data=json.dumps({'image_id': image_id, 'logo_id': '0' * 32})
+    )
+    assert response.get_json()['message'] == 'Logo not found'
+
+
+def test_oversized_logo_is_rejected(client: 'FlaskClient', monkeypatch: 'pytest.MonkeyPatch'):
+    """Test that logos over the upload budgets are rejected from their header."""
+    monkeypatch.setattr('utils.image_metadata.MAX_UPLOAD_PIXELS', 100 * 100)
+    logo = io.BytesIO()
+    Image.new('RGBA', (200, 100)).save(logo, format='PNG')
+    logo.seek(0)
+
+    response = client.post(
+        '/api/watermark/logo',
+        content_type='multipart/form-data',
+        data={'file': (logo, 'logo.png')}
+    )
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Image exceeds the pixel limit'
+    assert not any(name.endswith('.tmp') for name in os.listdir('logos'))
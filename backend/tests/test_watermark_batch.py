@@ -0,0 +1,94 @@
+import io
+import json
+
+from flask.testing import FlaskClient
+
+
+def test_watermark_batch(client: 'FlaskClient', temp_image: str):
+    """Test batch watermarking with a shared configuration and per-item overrides."""
+    temp_bytes = temp_image.getvalue()
+    image_ids = []
+    for _ in range(3):
+        upload_response = client.post(
+            '/api/upload',
+            content_type='multipart/form-data',
+            data={'file': (io.BytesIO(temp_bytes), 'test_image.png')}
+        )
+        image_ids.append(upload_response.get_json()['image_id'])
+
+    batch_data = {
+        'items': [
+            {'image_id': image_ids[0]},
+            {'image_id': image_ids[1], 'position': 'top-left'},
+            {'image_id': image_ids[2], 'watermark_text': 'Other'},
+            {'image_id': 'non_existent_id'}
+        ],
+        'watermark_text': 'Agency',
+        'fontSize': 12,
+        'opacity': 0.5
+    }
+
+    response = client.post(
+        '/api/watermark/batch',
+        content_type='application/json',
+        data=json.dumps(batch_data)
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    results = {
+        result['index']: result
+        for result in map(json.loads, response.get_data(as_text=True).splitlines())
+    }
+    assert sorted(results) == [0, 1, 2, 3]
+
+    for index in range(3):
+        assert results[index]['success'] is True
+        assert results[index]['image_id'] == image_ids[index]
+        assert results[index]['watermarked_image_url'].endswith(f'{image_ids[index]}_watermarked.png')
+
+    assert results[3]['success'] is False
+    assert 'not found' in results[3]['message'].lower()
+
+
+def test_watermark_batch_without_images(client: 'FlaskClient'):
+    """Test batch watermarking without any image."""
+    response = client.post(
+        '/api/watermark/batch',
+        content_type='application/json',
+        data=json.dumps({'image_ids': [], 'watermark_text': 'Agency'})
+    )
+
+    assert response.status_code == 400
+
+
+def test_watermark_batch_with_duplicate_images(client: 'FlaskClient'):
+    """Test that an image cannot appear twice in one batch."""
+    response = client.post(
+        '/api/watermark/batch',
+        content_type='application/json',
+        data=json.dumps({
+            'items': [
+                {'image_id': 'image', 'watermark_text': 'First'},
+                {'image_id': 'image', 'watermark_text': 'Second'}
+            ],
+            'watermark_text': 'Agency'
+        })
+    )
+
+    assert response.status_code == 400
+    assert 'duplicate' in response.get_json()['message'].lower()
+
+
+def test_watermark_batch_with_invalid_items(client: 'FlaskClient'):
+    """Test that batch items which are not objects with an image ID are rejected."""
+    for items in [['image'], [{'image_id': ['image']}], {'image_id': 'image'}]:
+        response = client.post(
+            '/api/watermark/batch',
+            content_type='application/json',
+            data=json.dumps({'items': items, 'watermark_text': 'Agency'})
+        )
+
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
@@ -0,0 +1,168 @@
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+# Adjust a Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from utils.watermark_image import (
+    get_logo_overlay,
+    get_text_sprite,
+    logo_overlay_cache_stats,
+    pattern_layer_cache_stats,
+    text_sprite_cache_stats,
+    watermark_image,
+    watermark_logo
+)
+
+
+def test_text_sprite_is_reused():
+    """
+    Test that identical text and style render once and other styles render again
+    """
+    first = get_text_sprite('Sprite Cache', 40, (255, 255, 255, 200), -30)
+    hits = text_sprite_cache_stats()['hits']
+
+    assert get_text_sprite('Sprite Cache', 40, (255, 255, 255, 200), -30)[0] is first[0]
+    assert text_sprite_cache_stats()['hits'] == hits + 1
+
+    # Opacity and rotation are part of the key
+    assert get_text_sprite('Sprite Cache', 40, (255, 255, 255, 100), -30)[0] is not first[0]
+    assert get_text_sprite('Sprite Cache', 40, (255, 255, 255, 200), 0)[0] is not first[0]
+
+
+def test_cached_sprite_gives_same_watermark():
+    """
+    Test that watermarks rendered from a cached sprite match the first rendering
+    """
+    image = Image.new('RGB', (400, 300), color='blue')
+    config = {'fontSize': 30, 'rotation': 20, 'opacity': 0.6}
+
+    first = watermark_image(image, 'Repeated', 'bottom-left', config)
+    second = watermark_image(image, 'Repeated', 'bottom-left', config)
+
+    assert first.tobytes() == second.tobytes()
+    assert first.getbbox() is not None
+    assert first.tobytes() != image.tobytes()
+
+
+def test_watermark_only_touches_its_region():
+    """
+    Test that an RGB image keeps its mode and the pixels outside the text stay unchanged
+    """
+    image = Image.effect_noise((300, 200), 40).convert('RGB')
+
+    result = watermark_image(image, 'Corner', 'top-left', {'fontSize': 20})
+
+    assert result.mode == 'RGB'
+    assert result.crop((0, 100, 300, 200)).tobytes() == image.crop((0, 100, 300, 200)).tobytes()
+    assert result.crop((0, 0, 150, 100)).tobytes() != image.crop((0, 0, 150, 100)).tobytes()
+
+
+def test_watermark_converts_only_its_region(monkeypatch):
+    """
+    Test that a corner watermark never converts the whole frame to RGBA
+    """
+    image = Image.new('RGB', (2000, 1500), color='blue')
+    converted = []
+    convert = Image.Image.convert
+
+    def recording_convert(self, mode=None, *args, **kwargs):
+        if mode == 'RGBA':
+            converted.append(self.width * self.height)
+        return convert(self, mode, *args, **kwargs)
+
+    monkeypatch.setattr(Image.Image, 'convert', recording_convert)
+    watermark_image(image, 'Corner', 'bottom-right', {'fontSize': 40})
+
+    assert converted
+    assert max(converted) < image.width * image.height / 100
+
+
+def test_pattern_watermark_covers_image():
+    """
+    Test that pattern mode repeats the text over every part of the image
+    """
+    image = Image.new('RGB', (400, 400), color='black')
+
+    result = watermark_image(image, 'Tiled', 'center', {'fontSize': 20, 'pattern': {'spacing': 10, 'angle': 30}})
+
+    assert result.mode == 'RGB'
+    for box in [(0, 0, 200, 200), (200, 0, 400, 200), (0, 200, 200, 400), (200, 200, 400, 400)]:
+        assert result.crop(box).getbbox() is not None
+
+
+def test_pattern_angle_turns_like_rotation():
+    """
+    Test that the pattern angle uses the clockwise direction of the rotation setting
+    """
+    image = Image.new('RGB', (300, 300), color='black')
+
+    by_angle = watermark_image(image, 'Tiled', 'center', {'pattern': {'angle': 30}})
+    by_rotation = watermark_image(image, 'Tiled', 'center', {'rotation': 30, 'pattern': True})
+    counter_clockwise = watermark_image(image, 'Tiled', 'center', {'pattern': {'angle': -30}})
+
+    assert by_angle.tobytes() == by_rotation.tobytes()
+    assert by_angle.tobytes() != counter_clockwise.tobytes()
+
+
+def test_pattern_layer_is_reused_across_images():
+    """
+    Test that images of the same size share one pattern layer, with the same result
+    """
+    config = {'fontSize': 20, 'pattern': {'spacing': 10, 'angle': 30}}
+    first = watermark_image(Image.new('RGB', (320, 240), color='black'), 'Shared', 'center', config)
+    hits = pattern_layer_cache_stats()['hits']
+
+    second = watermark_image(Image.new('RGB', (320, 240), color='black'), 'Shared', 'center', config)
+    assert pattern_layer_cache_stats()['hits'] == hits + 1
+    assert second.tobytes() == first.tobytes()
+
+    # Another size needs its own layer
+    watermark_image(Image.new('RGB', (240, 320), color='black'), 'Shared', 'center', config)
+    assert pattern_layer_cache_stats()['hits'] == hits + 1
+
+
+def test_logo_overlay_is_premultiplied_and_reused(tmp_path):
+    """
+    Test that logo overlays are cached per scale and blend like a straight alpha composite
+    """
+    logo_path = str(tmp_path / 'logo.png')
+    Image.new('RGBA', (80, 40), color=(0, 255, 0, 128)).save(logo_path)
+
+    overlay, size = get_logo_overlay(logo_path, 40, 1.0, 0)
+    assert overlay.mode == 'RGBa'
+    assert size == (40, 20)
+    hits = logo_overlay_cache_stats()['hits']
+    assert get_logo_overlay(logo_path, 40, 1.0, 0)[0] is overlay
+    assert logo_overlay_cache_stats()['hits'] == hits + 1
+
+    image = Image.new('RGB', (200, 100), color=(255, 0, 0))
+    result = watermark_logo(image, logo_path, 'center', {'logoScale': 0.2, 'opacity': 1.0})
+    expected = image.convert('RGBA')
+    expected.alpha_composite(Image.new('RGBA', (40, 20), color=(0, 255, 0, 128)), (80, 40))
+
+    assert result.mode == 'RGB'
+    assert result.tobytes() == expected.convert('RGB').tobytes()
+
+
+def test_logo_resampling_overshoot_does_not_wrap(tmp_path):
+    """
+    Test that colors overshooting their alpha after resampling are clamped instead of wrapping
+    """
+    # Eight pixel wide stripes of white and black at half opacity
+    stripes = np.zeros((400, 400, 4), dtype=np.uint8)
+    stripes[:, (np.arange(400) // 8) % 2 == 0] = (255, 255, 255, 128)
+    stripes[:, (np.arange(400) // 8) % 2 == 1] = (0, 0, 0, 128)
+    logo_path = str(tmp_path / 'stripes.png')
+    Image.fromarray(stripes, 'RGBA').save(logo_path)
+
+    overlay = np.asarray(get_logo_overlay(logo_path, 80, 1.0, 30)[0])
+    assert (overlay[..., :3] <= overlay[..., 3:]).all()
+
+    image = Image.new('RGB', (400, 400), color=(250, 250, 250))
+    result = np.asarray(watermark_logo(image, logo_path, 'center', {'logoScale': 0.2, 'opacity': 1.0}))
+    # Half-transparent stripes over a light image can darken it to mid gray at most
+    assert result.min() >= 120
@@ -50,17 +50,47 @@ const PreviewImage = styled.img`
   border-radius: 4px;
 `;
 
+type LastOperation =
+  | 'compressWithWebp'
+  | 'compressWithJpeg'
+  | 'watermark'
+  | 'basicOperation'
+  | null;
+
 interface ImagePreviewAreaProps {
   images: ProcessedImage[];
   onDeleteImage: (imageId: string) => void;
-  lastOperation:
-    | 'compressWithWebp'
-    | 'compressWithJpeg'
-    | 'watermark'
-    | 'basicOperation'
-    | null;
+  lastOperation: LastOperation;
 }
 
+const getImageType = (lastOperation: LastOperation) => {
+  switch (lastOperation) {
+    case 'compressWithWebp':
+      return 'webp';
+    case 'compressWithJpeg':
+      return 'jpeg';
+    case 'watermark':
+      return 'watermarked';
+    case 'basicOperation':
+      return 'basicOperation';
+    default:
+      return 'original';
+  }
+};
+
+// Thumbnails use the small previews the backend generates after each upload or operation
+const fetchImageSrc = async (
+  imageId: string,
+  imageType: string,
+  size: 'preview' | 'full',
+) => {
+  const response = await axios.get(
+    `${BACKEND_API_URL}/api/image/${imageId}?type=${imageType}&size=${size}`,
+  );
+  if (!response.data.success) return null;
+  return `data:${response.data.mimetype};base64,${response.data.image_base64}`;
+};
+
 export const ImagePreviewArea: React.FC<ImagePreviewAreaProps> = ({
   images,
   onDeleteImage,
@@ -70,35 +100,16 @@ export const ImagePreviewArea: React.FC<ImagePreviewAreaProps> = ({
   const [previewOpen, setPreviewOpen] = useState(false);
   const [previewImage, setPreviewImage] = useState('');
 
+  const imageType = getImageType(lastOperation);
+
   useEffect(() => {
     const fetchImages = async () => {
       const updatedSrcs: Record<string, string> = {};
       for (const image of images) {
         try {
-          let imageType: string;
-          switch (lastOperation) {
-            case 'compressWithWebp':
-              imageType = 'webp';
-              break;
-            case 'compressWithJpeg':
-              imageType = 'jpeg';
-              break;
-            case 'watermark':
-              imageType = 'watermarked';
-              break;
-            case 'basicOperation':
-              imageType = 'basicOperation';
-              break;
-            default:
-              imageType = 'original';
-              break;
-          }
-          const response = await axios.get(
-            `${BACKEND_API_URL}/api/image/${image.imageId}?type=${imageType}`,
-          );
-          if (response.data.success) {
-            updatedSrcs[image.imageId] =
-              `data:image/png;base64,${response.data.image_base64}`;
+          const src = await fetchImageSrc(image.imageId, imageType, 'preview');
+          if (src) {
+            updatedSrcs[image.imageId] = src;
           }
         } catch (error) {
           console.error('Unable to retrieve image:', error);
@@ -108,7 +119,20 @@ export const ImagePreviewArea: React.FC<ImagePreviewAreaProps> = ({
     };
 
     void fetchImages();
-  }, [images, lastOperation]);
+  }, [images, imageType]);
+
+  // The full-resolution image is only fetched when it is opened
+  const openImage = async (imageId: string) => {
+    try {
+      const src = await fetchImageSrc(imageId, imageType, 'full');
+      if (src) {
+        setPreviewImage(src);
+        setPreviewOpen(true);
+      }
+    } catch (error) {
+      console.error('Unable to retrieve image:', error);
+    }
+  };
 
   if (images.length === 0) return null;
 
@@ -135,10 +159,7 @@ export const ImagePreviewArea: React.FC<ImagePreviewAreaProps> = ({
                   <PreviewImage
                     src={imageSrcs[image.imageId]}
                     alt={image.fileName}
-                    onClick={() => {
-                      setPreviewImage(imageSrcs[image.imageId]);
-                      setPreviewOpen(true);
-                    }}
+                    onClick={() => void openImage(image.imageId)}
                   />
                 ) : (
                   <p>Loading...</p>